@@ -0,0 +1,184 @@
+"""
+Prompt-eval benchmark of the Ollama message layout.
+
+For each LLM call site (query, search, rerank, summary) it sends the prompts of generated
+questions to one model in two layouts:
+    static_first     the layout the providers use: the call site's fixed instructions as
+                     the system message, the request's content in the user message after it;
+    variable_first   the request's content first, then the instructions, in one user message.
+Calls are sequential, so each can reuse the KV cache the previous call left, and ask for one
+token (num_predict=1), so their time is mostly prompt evaluation. It reports the
+prompt_eval_count and prompt_eval_duration Ollama returns per call site and layout, and how
+much of both the static_first layout saves. Calls go through the Ollama endpoint pool, so
+they carry the model's pinned num_ctx and keep_alive (config.OLLAMA_MODELS).
+
+Usage:
+    python -m app.bench.prompt_eval --host http://localhost:11434 --model llama3.1 --requests 20
+    python -m app.bench.prompt_eval --stubs --requests 20 --out bench_results/prompt_eval.json
+--stubs runs against the stand-in from app.bench.stubs, which imitates the KV cache.
+"""
+
+import argparse
+import json
+import os
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from app.bench.run import _summary, generate_questions, git_commit, start_stubs
+from app.bench.stubs import StubProfile, searxng_results
+from app.core.config import model_runtime
+from app.core.models import PerSourceResult, QuestionInput
+from app.providers.llm.ollama_pool import OllamaPool, ollama_hosts
+from app.providers.llm.prompts import static_prefix_hash
+from app.providers.query.ollama.query_provider import build_query_messages
+from app.providers.search.ollama.search_provider import build_search_messages
+from app.providers.search.searxng.ollama_ranker import build_rerank_messages
+from app.providers.summary.ollama.summary_provider import build_summary_messages
+
+Messages = List[Dict[str, str]]
+
+LAYOUTS = ("variable_first", "static_first")
+
+
+def call_sites() -> Dict[str, Callable[[Dict[str, Any]], Messages]]:
+    """
+    Call site -> builder of its messages for a generated question, with the providers' own
+    message builders.
+    """
+    def question_input(q: Dict[str, Any]) -> QuestionInput:
+        return QuestionInput(title=q["title"], body=q["body"], source=q["source"])
+
+    def results(q: Dict[str, Any]) -> List[Dict[str, Any]]:
+        return searxng_results(q["title"], 10)
+
+    def summary(q: Dict[str, Any]) -> Messages:
+        evidence = [
+            PerSourceResult(source="searxng", url=r["url"], title=r["title"], summary=r["content"])
+            for r in results(q)
+        ]
+        queries = {"keyword_query": q["title"], "sub_questions": []}
+        return build_summary_messages(q, queries, evidence)
+
+    return {
+        "query": lambda q: build_query_messages(question_input(q)),
+        "search": lambda q: build_search_messages(question_input(q), q["title"]),
+        "rerank": lambda q: build_rerank_messages(question_input(q), results(q), 3),
+        "summary": summary,
+    }
+
+
+SYSTEM_TEMPLATES = {
+    "query": "llm_query_prompt.txt",
+    "search": "llm_search_prompt.txt",
+    "rerank": "llm_rerank_prompt.txt",
+    "summary": "llm_summary_prompt.txt",
+}
+
+
+def variable_first(messages: Messages) -> Messages:
+    """
+    The same content with the request's part first, in one user message.
+    """
+    system = "\n\n".join(m["content"] for m in messages if m["role"] == "system")
+    user = "\n\n".join(m["content"] for m in messages if m["role"] != "system")
+    return [{"role": "user", "content": f"{user}\n\n{system}"}]
+
+
+def measure(
+    pool: OllamaPool,
+    model: str,
+    prompts: List[Messages],
+) -> Dict[str, Any]:
+    """
+    Sends the prompts one after another after one unmeasured call, so the first measured
+    call finds the cache the same way the others do.
+    """
+    counts: List[float] = []
+    durations: List[float] = []
+    loads = 0
+    for i, messages in enumerate(prompts):
+        response = pool.chat(model=model, messages=messages, options={"num_predict": 1})
+        if i == 0:
+            continue
+        counts.append(float(_field(response, "prompt_eval_count") or 0))
+        durations.append((_field(response, "prompt_eval_duration") or 0) / 1e6)
+        loads += 1 if (_field(response, "load_duration") or 0) > 1e8 else 0
+    return {
+        "prompt_eval_count": _summary(counts),
+        "prompt_eval_ms": _summary(durations),
+        "reloads": loads,
+    }
+
+
+def run(pool: OllamaPool, model: str, requests: int, seed: int) -> List[Dict[str, Any]]:
+    questions = generate_questions(requests + 1, seed)
+    results = []
+    for site, build in call_sites().items():
+        prompts = [build(q) for q in questions]
+        layouts = {
+            "variable_first": measure(pool, model, [variable_first(m) for m in prompts]),
+            "static_first": measure(pool, model, prompts),
+        }
+        before, after = (layouts[name]["prompt_eval_ms"].get("mean", 0.0) for name in LAYOUTS)
+        tokens_before, tokens_after = (layouts[name]["prompt_eval_count"].get("mean", 0.0) for name in LAYOUTS)
+        results.append({
+            "call_site": site,
+            "static_prefix_hash": static_prefix_hash(SYSTEM_TEMPLATES[site]),
+            "layouts": layouts,
+            "prompt_eval_ms_saved_pct": round((before - after) / before * 100, 1) if before else 0.0,
+            "prompt_tokens_saved_pct": round((tokens_before - tokens_after) / tokens_before * 100, 1)
+            if tokens_before else 0.0,
+        })
+        print(f"{site:<8} prompt tokens {tokens_before:>8.1f} -> {tokens_after:>8.1f}   "
+              f"prompt eval ms {before:>8.1f} -> {after:>8.1f}   "
+              f"saved {results[-1]['prompt_eval_ms_saved_pct']}%")
+    return results
+
+
+def _field(response: Any, name: str) -> Any:
+    getter = getattr(response, "get", None)
+    return getter(name) if getter is not None else None
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default=None, help="Ollama base URL. Defaults to OLLAMA_HOST.")
+    parser.add_argument("--model", default="llama3.1")
+    parser.add_argument("--requests", type=int, default=20, help="Measured calls per call site and layout.")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--stubs", action="store_true", help="Run against the local Ollama stand-in.")
+    parser.add_argument("--stub-ms-per-token", type=float, default=0.5,
+                        help="Prompt evaluation time per token of the stand-in.")
+    parser.add_argument("--out", default=None, help="Output JSON path. Nothing is written if omitted.")
+    args = parser.parse_args(argv)
+
+    server = None
+    host = args.host
+    if args.stubs:
+        host, server = start_stubs(StubProfile(prompt_eval_ms_per_token=args.stub_ms_per_token))
+    try:
+        results = run(OllamaPool([host] if host else ollama_hosts()), args.model, args.requests, args.seed)
+    finally:
+        if server is not None:
+            server.should_exit = True
+
+    if args.out:
+        runtime = model_runtime(args.model)
+        report = {
+            "commit": git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "host": "stubs" if args.stubs else host,
+            "model": args.model,
+            "num_ctx": runtime.num_ctx,
+            "keep_alive": runtime.keep_alive,
+            "requests": args.requests,
+            "results": results,
+        }
+        os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Wrote {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,326 @@
+"""
+Offline benchmark of the HTTP pipeline against local upstream stubs.
+
+Starts the stubs from app.bench.stubs in-process, starts the service with uvicorn in a
+subprocess pointed at them (OLLAMA_HOSTS, SEARXNG_BASE_URL, ARCTIC_SHIFT_BASE_URL) with a
+fresh cache directory, then drives each endpoint at each concurrency level with unique
+generated questions. Latency percentiles, requests per second and the per-stage breakdown
+from the Server-Timing header are written as JSON.
+
+Usage:
+    python -m app.bench.run --endpoints generate_queries,generate_search,generate_summary \
+        --concurrency 1,4,16 --requests 100 --out bench_results/run.json
+    python -m app.bench.run --compare bench_results/before.json bench_results/after.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+import numpy as np
+import uvicorn
+
+from app.bench.stubs import Latency, StubProfile, create_stub_app
+
+_TOPICS = (
+    "parking", "brunch", "apartments", "commute", "hiking", "coffee", "daycare", "dentists",
+    "mechanics", "farmers markets", "bike routes", "ferry schedule", "concert venues", "gyms",
+)
+_PLACES = ("downtown", "near the lake", "on the east side", "by the university", "up north")
+
+
+def generate_questions(count: int, seed: int) -> List[Dict[str, Any]]:
+    """
+    Unique questions, so caches only hit where a real workload would hit them.
+    """
+    rng = random.Random(seed)
+    return [
+        {
+            "title": f"Best {rng.choice(_TOPICS)} {rng.choice(_PLACES)}? (#{i})",
+            "body": f"Looking for recommendations, question {i}.",
+            "source": rng.choice(("seattle", "sandiego")),
+        }
+        for i in range(count)
+    ]
+
+
+def parse_server_timing(header: str) -> Dict[str, float]:
+    """
+    Parses "stage;dur=12.3, other;dur=4.5;desc=..." into {stage: milliseconds}.
+    """
+    stages: Dict[str, float] = {}
+    for entry in filter(None, (part.strip() for part in header.split(","))):
+        name, *params = entry.split(";")
+        for param in params:
+            key, _, value = param.partition("=")
+            if key.strip() == "dur":
+                stages[name.strip()] = float(value)
+    return stages
+
+
+async def drive(
+    base_url: str,
+    endpoint: str,
+    questions: List[Dict[str, Any]],
+    concurrency: int,
+    timeout: float,
+) -> Dict[str, Any]:
+    """
+    Sends every question to the endpoint with at most `concurrency` requests in flight.
+    """
+    latencies: List[float] = []
+    stages: Dict[str, List[float]] = {}
+    errors: Dict[str, int] = {}
+    pending = iter(questions)
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=timeout) as client:
+        async def worker() -> None:
+            for question in pending:
+                started = time.perf_counter()
+                try:
+                    response = await client.post(f"/{endpoint}", json=question)
+                    elapsed = time.perf_counter() - started
+                    if response.status_code != 200:
+                        errors[str(response.status_code)] = errors.get(str(response.status_code), 0) + 1
+                        continue
+                except httpx.HTTPError as e:
+                    errors[type(e).__name__] = errors.get(type(e).__name__, 0) + 1
+                    continue
+                latencies.append(elapsed * 1000)
+                for stage, ms in parse_server_timing(response.headers.get("server-timing", "")).items():
+                    stages.setdefault(stage, []).append(ms)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        wall = time.perf_counter() - started
+
+    return {
+        "endpoint": endpoint,
+        "concurrency": concurrency,
+        "requests": len(questions),
+        "ok": len(latencies),
+        "errors": errors,
+        "wall_seconds": round(wall, 3),
+        "rps": round(len(latencies) / wall, 3) if wall else 0.0,
+        "latency_ms": _summary(latencies),
+        "stages_ms": {stage: _summary(values) for stage, values in sorted(stages.items())},
+    }
+
+
+def _summary(values: List[float]) -> Dict[str, float]:
+    if not values:
+        return {}
+    data = np.asarray(values)
+    p50, p95, p99 = np.percentile(data, [50, 95, 99])
+    return {
+        "mean": round(float(data.mean()), 2),
+        "p50": round(float(p50), 2),
+        "p95": round(float(p95), 2),
+        "p99": round(float(p99), 2),
+        "max": round(float(data.max()), 2),
+    }
+
+
+def start_stubs(profile: StubProfile) -> Tuple[str, uvicorn.Server]:
+    port = _free_port()
+    config = uvicorn.Config(create_stub_app(profile), host="127.0.0.1", port=port, log_level="warning")
+    server = uvicorn.Server(config)
+    threading.Thread(target=server.run, daemon=True).start()
+    _wait_until_up(f"http://127.0.0.1:{port}/search?format=json", 15.0)
+    return f"http://127.0.0.1:{port}", server
+
+
+def start_service(
+    stub_url: str,
+    ollama_urls: List[str],
+    cache_dir: str,
+    extra_env: Dict[str, str],
+) -> Tuple[str, subprocess.Popen]:
+    port = _free_port()
+    env = dict(os.environ)
+    env.update({
+        "OLLAMA_HOST": stub_url,
+        "OLLAMA_HOSTS": ",".join(ollama_urls),
+        "SEARXNG_BASE_URL": stub_url,
+        "ARCTIC_SHIFT_BASE_URL": f"{stub_url}/api",
+        "CACHE_DIR": cache_dir,
+        "LOG_LEVEL": "WARNING",
+    })
+    env.update(extra_env)
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning"],
+        env=env,
+        cwd=os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+    )
+    try:
+        _wait_until_up(f"http://127.0.0.1:{port}/health", 60.0)
+    except Exception:
+        process.terminate()
+        raise
+    return f"http://127.0.0.1:{port}", process
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(before_path: str, after_path: str) -> None:
+    """
+    Prints the p50/p95 latency and RPS change for every (endpoint, concurrency) in both files.
+    """
+    with open(before_path, "r", encoding="utf-8") as f:
+        before = {(r["endpoint"], r["concurrency"]): r for r in json.load(f)["results"]}
+    with open(after_path, "r", encoding="utf-8") as f:
+        after = {(r["endpoint"], r["concurrency"]): r for r in json.load(f)["results"]}
+
+    print(f"{'endpoint':<20} {'conc':>4} {'p50 ms':>18} {'p95 ms':>18} {'rps':>16}")
+    for key in sorted(before.keys() & after.keys()):
+        old, new = before[key], after[key]
+        cells = [
+            _delta(old["latency_ms"].get(p, 0.0), new["latency_ms"].get(p, 0.0)) for p in ("p50", "p95")
+        ]
+        cells.append(_delta(old["rps"], new["rps"]))
+        print(f"{key[0]:<20} {key[1]:>4} {cells[0]:>18} {cells[1]:>18} {cells[2]:>16}")
+
+
+def _delta(old: float, new: float) -> str:
+    change = (new - old) / old * 100 if old else 0.0
+    return f"{new:.1f} ({change:+.0f}%)"
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _wait_until_up(url: str, timeout: float) -> None:
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            if httpx.get(url, timeout=1.0).status_code < 500:
+                return
+        except httpx.HTTPError:
+            pass
+        if time.monotonic() > deadline:
+            raise RuntimeError(f"{url} did not come up within {timeout}s")
+        time.sleep(0.2)
+
+
+def _latency(value: str) -> Latency:
+    median, _, sigma = value.partition(":")
+    return Latency(float(median), float(sigma) if sigma else 0.25)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--endpoints", default="generate_queries,generate_search,generate_summary")
+    parser.add_argument("--concurrency", default="1,4,16", help="Comma separated concurrency levels.")
+    parser.add_argument("--requests", type=int, default=50, help="Requests per endpoint and concurrency level.")
+    parser.add_argument("--warmup", type=int, default=3, help="Unmeasured requests before each level.")
+    parser.add_argument("--timeout", type=float, default=300.0, help="Client timeout per request in seconds.")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--out", default=None, help="Output JSON path. Defaults to bench_results/<time>-<commit>.json.")
+    parser.add_argument("--chat-latency", type=_latency, default=Latency(800.0, 0.35),
+                        help="Ollama /api/chat latency as median_ms[:sigma].")
+    parser.add_argument("--embed-latency", type=_latency, default=Latency(30.0, 0.2))
+    parser.add_argument("--searxng-latency", type=_latency, default=Latency(400.0, 0.4))
+    parser.add_argument("--comments-latency", type=_latency, default=Latency(250.0, 0.5))
+    parser.add_argument("--chat-words", type=int, default=120)
+    parser.add_argument("--searxng-results", type=int, default=10)
+    parser.add_argument("--comments-per-thread", type=int, default=25)
+    parser.add_argument("--comment-chars", type=int, default=300)
+    parser.add_argument("--prompt-eval-ms-per-token", type=float, default=0.0,
+                        help="Stub Ollama prompt evaluation time per token not in its KV cache.")
+    parser.add_argument("--runner-load-ms", type=float, default=0.0,
+                        help="Stub Ollama model reload time when a call changes num_ctx.")
+    parser.add_argument("--ollama-hosts", type=int, default=1,
+                        help="Number of stub Ollama endpoints the service balances across.")
+    parser.add_argument("--env", action="append", default=[], metavar="NAME=VALUE",
+                        help="Extra environment for the service, e.g. --env SEARCH_FANOUT=sequential.")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"), help="Compare two result files and exit.")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    profile = StubProfile(
+        chat_latency=args.chat_latency,
+        embed_latency=args.embed_latency,
+        searxng_latency=args.searxng_latency,
+        comments_latency=args.comments_latency,
+        chat_words=args.chat_words,
+        searxng_results=args.searxng_results,
+        comments_per_thread=args.comments_per_thread,
+        comment_chars=args.comment_chars,
+        prompt_eval_ms_per_token=args.prompt_eval_ms_per_token,
+        runner_load_ms=args.runner_load_ms,
+        seed=args.seed,
+    )
+    extra_env = dict(item.split("=", 1) for item in args.env)
+    endpoints = [e.strip().strip("/") for e in args.endpoints.split(",") if e.strip()]
+    levels = [int(c) for c in args.concurrency.split(",")]
+
+    stub_url, stub_server = start_stubs(profile)
+    extra_stubs = [start_stubs(profile) for _ in range(args.ollama_hosts - 1)]
+    ollama_urls = [stub_url] + [url for url, _ in extra_stubs]
+    cache_dir = tempfile.mkdtemp(prefix="bench-cache-")
+    service_url, service = start_service(stub_url, ollama_urls, cache_dir, extra_env)
+
+    results = []
+    try:
+        batch = 0
+        for endpoint in endpoints:
+            for level in levels:
+                batch += 1
+                questions = generate_questions(args.warmup + args.requests, args.seed * 1000 + batch)
+                asyncio.run(drive(service_url, endpoint, questions[:args.warmup], 1, args.timeout))
+                result = asyncio.run(drive(service_url, endpoint, questions[args.warmup:], level, args.timeout))
+                results.append(result)
+                latency = result["latency_ms"]
+                print(f"{endpoint:<20} c={level:<3} rps={result['rps']:<8} "
+                      f"p50={latency.get('p50')} p95={latency.get('p95')} p99={latency.get('p99')} "
+                      f"errors={sum(result['errors'].values())}")
+    finally:
+        service.terminate()
+        service.wait(timeout=10)
+        stub_server.should_exit = True
+        for _, server in extra_stubs:
+            server.should_exit = True
+
+    commit = git_commit()
+    report = {
+        "commit": commit,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "stub_profile": profile.as_dict(),
+        "service_env": extra_env,
+        "ollama_hosts": args.ollama_hosts,
+        "requests_per_level": args.requests,
+        "results": results,
+    }
+    out = args.out or os.path.join("bench_results", f"{time.strftime('%Y%m%d-%H%M%S')}-{commit or 'nogit'}.json")
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {out}")
+
+
+if __name__ == "__main__":
+    main()
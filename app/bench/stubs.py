@@ -0,0 +1,298 @@
+"""
+Local stand-ins for Ollama, SearXNG and ArcticShift, used by the benchmark harness.
+
+One FastAPI app serves all three upstreams on different paths:
+    POST /api/chat               Ollama chat (plain or streamed NDJSON)
+    POST /api/embed              Ollama embeddings
+    GET  /api/ps                 Ollama loaded models (health check)
+    GET  /search?format=json     SearXNG
+    GET  /api/comments/search    ArcticShift (base URL <stub>/api)
+
+Every route sleeps for a latency drawn from a log-normal distribution around a configured
+median, and the payload sizes are configurable, so runs are repeatable for a given seed.
+
+/api/chat also imitates Ollama's KV cache: per model it remembers the last prompt's tokens
+(words and punctuation of the messages in order) and evaluates only the tokens after the
+prefix shared with it, at prompt_eval_ms_per_token each. A call with a different num_ctx
+than the last one reloads the model (runner_load_ms) and starts with an empty cache. The
+counts and durations are reported like Ollama does (prompt_eval_count, load_duration, ...).
+
+Usage (standalone, e.g. to point a manually started server at it):
+    python -m app.bench.stubs --port 9100
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import math
+import random
+import re
+from dataclasses import asdict, dataclass, field
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+
+_WORDS = (
+    "parking downtown rent apartment commute bus train hike trail coffee brunch pizza taco "
+    "neighborhood school doctor dentist mechanic weekend festival museum beach park ferry "
+    "traffic weather rain snow bike route ticket concert market grocery gym yoga dog cat"
+).split()
+
+
+@dataclass(frozen=True)
+class Latency:
+    """
+    Log-normal latency: median_ms scaled by exp(sigma * N(0, 1)).
+    """
+    median_ms: float
+    sigma: float = 0.25
+
+    def sample(self, rng: random.Random) -> float:
+        if self.median_ms <= 0:
+            return 0.0
+        return self.median_ms * math.exp(self.sigma * rng.gauss(0.0, 1.0)) / 1000.0
+
+
+@dataclass(frozen=True)
+class StubProfile:
+    chat_latency: Latency = field(default_factory=lambda: Latency(800.0, 0.35))
+    embed_latency: Latency = field(default_factory=lambda: Latency(30.0, 0.2))
+    searxng_latency: Latency = field(default_factory=lambda: Latency(400.0, 0.4))
+    comments_latency: Latency = field(default_factory=lambda: Latency(250.0, 0.5))
+    chat_words: int = 120
+    embedding_dim: int = 768
+    searxng_results: int = 10
+    comments_per_thread: int = 25
+    comment_chars: int = 300
+    prompt_eval_ms_per_token: float = 0.0
+    runner_load_ms: float = 0.0
+    seed: int = 7
+
+    def as_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+def create_stub_app(profile: StubProfile) -> FastAPI:
+    app = FastAPI(title="Benchmark upstream stubs")
+    rng = random.Random(profile.seed)
+
+    async def delay(latency: Latency) -> None:
+        seconds = latency.sample(rng)
+        if seconds:
+            await asyncio.sleep(seconds)
+
+    kv_cache = KvCache()
+
+    @app.post("/api/chat")
+    async def chat(request: Request):
+        body = await request.json()
+        model = body.get("model", "")
+        messages = body.get("messages", [])
+        num_ctx = (body.get("options") or {}).get("num_ctx")
+        prompt_stats = kv_cache.evaluate(model, num_ctx, messages, profile)
+        await delay(Latency(prompt_stats["load_ms"] + prompt_stats["prompt_eval_ms"], 0.0))
+        content = chat_content(messages, profile.chat_words, rng, body.get("format"))
+        if not body.get("stream", True):
+            await delay(profile.chat_latency)
+            return chat_chunk(model, content, done=True, words=profile.chat_words, prompt_stats=prompt_stats)
+        return StreamingResponse(
+            _stream_chat(model, content, profile, delay, prompt_stats),
+            media_type="application/x-ndjson",
+        )
+
+    @app.post("/api/embed")
+    async def embed(request: Request):
+        body = await request.json()
+        texts = body.get("input", [])
+        if isinstance(texts, str):
+            texts = [texts]
+        await delay(profile.embed_latency)
+        return {
+            "model": body.get("model", ""),
+            "embeddings": [text_vector(text, profile.embedding_dim) for text in texts],
+        }
+
+    @app.get("/api/ps")
+    async def ps():
+        return {"models": []}
+
+    @app.get("/search")
+    async def searxng(q: str = ""):
+        await delay(profile.searxng_latency)
+        return {"query": q, "results": searxng_results(q, profile.searxng_results)}
+
+    @app.get("/api/comments/search")
+    async def comments(link_id: str = "", limit: int = 100):
+        await delay(profile.comments_latency)
+        count = min(limit, profile.comments_per_thread)
+        return {"data": thread_comments(link_id, count, profile.comment_chars)}
+
+    return app
+
+
+class KvCache:
+    """
+    The prompt tokens and num_ctx of the last call per model, as one Ollama runner slot
+    would keep them.
+    """
+
+    def __init__(self):
+        self._last: Dict[str, Tuple[Optional[int], List[str]]] = {}
+
+    def evaluate(
+        self,
+        model: str,
+        num_ctx: Optional[int],
+        messages: List[Dict[str, Any]],
+        profile: "StubProfile",
+    ) -> Dict[str, float]:
+        tokens = prompt_tokens(messages)
+        last_ctx, last_tokens = self._last.get(model, (num_ctx, []))
+        reloaded = model in self._last and last_ctx != num_ctx
+        cached = 0
+        if not reloaded:
+            for old, new in zip(last_tokens, tokens):
+                if old != new:
+                    break
+                cached += 1
+        self._last[model] = (num_ctx, tokens)
+        evaluated = len(tokens) - cached
+        return {
+            "prompt_eval_count": evaluated,
+            "prompt_eval_ms": evaluated * profile.prompt_eval_ms_per_token,
+            "load_ms": profile.runner_load_ms if reloaded else 0.0,
+        }
+
+
+def prompt_tokens(messages: List[Dict[str, Any]]) -> List[str]:
+    tokens: List[str] = []
+    for message in messages:
+        tokens.append(f"<{message.get('role', '')}>")
+        tokens.extend(re.findall(r"\w+|[^\w\s]", str(message.get("content", ""))))
+    return tokens
+
+
+def chat_content(
+    messages: List[Dict[str, Any]],
+    words: int,
+    rng: random.Random,
+    schema: Any = None,
+) -> str:
+    """
+    Picks a response shape from the prompt: rerank indices, query JSON, or prose. A JSON
+    schema (structured output) is answered with an object of its properties, with number
+    lists for array properties and prose for the rest.
+    """
+    if isinstance(schema, dict) and schema.get("properties"):
+        prose = " ".join(rng.choice(_WORDS) for _ in range(words)) + "."
+        return json.dumps({
+            name: [1, 2, 3] if spec.get("type") == "array" else prose
+            for name, spec in schema["properties"].items()
+        })
+    prompt = "\n".join(str(m.get("content", "")) for m in messages)
+    if "reranking" in prompt:
+        return json.dumps([1, 2, 3])
+    if "sub-questions" in prompt:
+        keywords = " ".join(rng.sample(_WORDS, 4))
+        return json.dumps({
+            "keyword_query": keywords,
+            "sub_questions": [f"What about {w}?" for w in rng.sample(_WORDS, 2)],
+        })
+    return " ".join(rng.choice(_WORDS) for _ in range(words)) + "."
+
+
+def chat_chunk(
+    model: str,
+    content: str,
+    done: bool,
+    words: int = 0,
+    prompt_stats: Optional[Dict[str, float]] = None,
+) -> Dict[str, Any]:
+    chunk: Dict[str, Any] = {
+        "model": model,
+        "created_at": "2024-01-01T00:00:00Z",
+        "message": {"role": "assistant", "content": content},
+        "done": done,
+    }
+    if done:
+        prompt_stats = prompt_stats or {"prompt_eval_count": 600, "prompt_eval_ms": 0.0, "load_ms": 0.0}
+        chunk.update({
+            "done_reason": "stop",
+            "prompt_eval_count": prompt_stats["prompt_eval_count"],
+            "prompt_eval_duration": int(prompt_stats["prompt_eval_ms"] * 1e6),
+            "load_duration": int(prompt_stats["load_ms"] * 1e6),
+            "eval_count": words,
+        })
+    return chunk
+
+
+async def _stream_chat(
+    model: str,
+    content: str,
+    profile: StubProfile,
+    delay,
+    prompt_stats: Dict[str, float],
+) -> AsyncIterator[str]:
+    # Time to first token is a fifth of the latency; the rest is spread over the pieces.
+    pieces = content.split(" ")
+    per_piece = Latency(profile.chat_latency.median_ms * 0.8 / max(len(pieces), 1), 0.0)
+    await delay(Latency(profile.chat_latency.median_ms * 0.2, profile.chat_latency.sigma))
+    for i, piece in enumerate(pieces):
+        text = piece if i == 0 else " " + piece
+        yield json.dumps(chat_chunk(model, text, done=False)) + "\n"
+        await delay(per_piece)
+    yield json.dumps(chat_chunk(model, "", done=True, words=len(pieces), prompt_stats=prompt_stats)) + "\n"
+
+
+def text_vector(text: str, dim: int) -> List[float]:
+    """
+    A deterministic pseudo-embedding, so identical texts get identical vectors.
+    """
+    seeded = random.Random(hashlib.sha256(text.encode("utf-8")).digest())
+    return [seeded.uniform(-1.0, 1.0) for _ in range(dim)]
+
+
+def searxng_results(query: str, count: int) -> List[Dict[str, Any]]:
+    digest = hashlib.sha1(query.encode("utf-8")).hexdigest()
+    results = []
+    for i in range(count):
+        post_id = f"{digest[:5]}{i:02d}"
+        results.append({
+            "url": f"https://www.reddit.com/r/bench/comments/{post_id}/{query.replace(' ', '_')}/",
+            "title": f"{query} ({i + 1})",
+            "content": f"Snippet {i + 1} about {query}.",
+        })
+    return results
+
+
+def thread_comments(link_id: str, count: int, chars: int) -> List[Dict[str, Any]]:
+    seeded = random.Random(link_id)
+    comments = []
+    for i in range(count):
+        words = []
+        while sum(len(w) + 1 for w in words) < chars:
+            words.append(seeded.choice(_WORDS))
+        comments.append({
+            "id": f"c{i}",
+            "parent_id": link_id,
+            "link_id": link_id,
+            "body": " ".join(words),
+            "score": seeded.randint(0, 500),
+            "created_utc": 1_700_000_000 + i,
+        })
+    return comments
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    args = parser.parse_args()
+    uvicorn.run(create_stub_app(StubProfile()), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+"""
+Admission control for LLM-bound work.
+
+Every LLM stage (query, search_llm, rerank, summary) has admission_slots concurrent calls
+and a bounded queue in front of them. Waiting calls get a slot by priority class
+(interactive before batch), then in arrival order. A call is shed with Overloaded:
+    - at once with 429 when the stage's queue is full. Batch calls may only fill half of
+      it, so interactive calls always find room;
+    - at once with 503 when its expected wait, from its queue position and the stage's
+      recent call durations, is longer than the priority's maximum wait;
+    - with 503 when it has waited its maximum wait without getting a slot.
+Overloaded carries a retry_after hint in seconds, which the HTTP layer sends as Retry-After.
+
+The priority of a call is taken from the request it serves (see set_priority), or for
+work shared by several requests from the highest priority among them (SharedPriority).
+Calls answered by the LLM call cache never queue.
+"""
+
+import asyncio
+import contextvars
+import heapq
+import itertools
+import math
+import time
+from contextlib import asynccontextmanager
+from enum import IntEnum
+from typing import AsyncIterator, Dict, List, Optional, Tuple, Union
+
+from app.core.config import PIPELINE_SETTINGS
+from app.core.telemetry import (record_admission_shed, record_admission_wait,
+                                set_admission_queue_depth)
+
+
+class Priority(IntEnum):
+    INTERACTIVE = 0
+    BATCH = 1
+
+    @property
+    def label(self) -> str:
+        return self.name.lower()
+
+
+class SharedPriority:
+    """
+    The priority of work shared by several requests: the highest priority of the requests
+    that joined it so far. Calls already queued keep the priority they queued with.
+    """
+
+    def __init__(self, priority: Priority = Priority.BATCH):
+        self.priority = priority
+
+    def join(self, priority: Priority) -> None:
+        self.priority = min(self.priority, priority)
+
+
+class Overloaded(Exception):
+    """
+    A call was shed by admission control. status_code is 429 or 503.
+    """
+
+    def __init__(self, stage: str, status_code: int, retry_after: float, reason: str):
+        super().__init__(f"The {stage} stage is overloaded ({reason}); retry in {math.ceil(retry_after)}s.")
+        self.stage = stage
+        self.status_code = status_code
+        self.retry_after = max(1, math.ceil(retry_after))
+        self.reason = reason
+
+
+class StageQueue:
+    """
+    Slots and priority queue of one stage. Used from the server's event loop only.
+    """
+
+    def __init__(self, stage: str, slots: int, queue_size: int):
+        self.stage = stage
+        self.slots = max(1, slots)
+        self.queue_size = max(0, queue_size)
+        self.in_use = 0
+        # Moving average of the time a call holds a slot; seeds the wait estimate.
+        self.service_seconds = 1.0
+        self._waiters: List[Tuple[int, int, "asyncio.Future[None]"]] = []
+        self._order = itertools.count()
+
+    def expected_wait(self, ahead: int) -> float:
+        return (ahead // self.slots + 1) * self.service_seconds
+
+    async def acquire(self, priority: Priority, max_wait: float) -> None:
+        if self.in_use < self.slots and not self._waiters:
+            self.in_use += 1
+            return
+
+        limit = self.queue_size if priority == Priority.INTERACTIVE else self.queue_size // 2
+        if len(self._waiters) >= limit:
+            self._shed(priority, 429, self.expected_wait(len(self._waiters)), "queue_full")
+
+        ahead = sum(1 for p, _, _ in self._waiters if p <= priority)
+        expected = self.expected_wait(ahead)
+        if expected > max_wait:
+            self._shed(priority, 503, expected, "deadline")
+
+        entry = (int(priority), next(self._order), asyncio.get_running_loop().create_future())
+        heapq.heappush(self._waiters, entry)
+        self._publish_depth()
+        try:
+            await asyncio.wait_for(entry[2], max_wait)
+        except asyncio.TimeoutError:
+            self._remove(entry)
+            self._shed(priority, 503, self.expected_wait(ahead), "timeout")
+        except asyncio.CancelledError:
+            if entry[2].done() and not entry[2].cancelled():
+                # The slot was handed over just as the caller went away.
+                self.release(None)
+            else:
+                self._remove(entry)
+            raise
+
+    def release(self, held_seconds: Optional[float]) -> None:
+        """
+        Frees a slot, handing it straight to the best waiter if there is one.
+        """
+        if held_seconds is not None:
+            self.service_seconds = 0.8 * self.service_seconds + 0.2 * held_seconds
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                future.set_result(None)
+                self._publish_depth()
+                return
+        self.in_use -= 1
+        self._publish_depth()
+
+    def depth(self, priority: Priority) -> int:
+        return sum(1 for p, _, future in self._waiters if p == priority and not future.done())
+
+    def _remove(self, entry: Tuple[int, int, "asyncio.Future[None]"]) -> None:
+        if entry in self._waiters:
+            self._waiters.remove(entry)
+            heapq.heapify(self._waiters)
+        self._publish_depth()
+
+    def _shed(self, priority: Priority, status_code: int, retry_after: float, reason: str) -> None:
+        record_admission_shed(self.stage, priority.label, reason)
+        raise Overloaded(self.stage, status_code, retry_after, reason)
+
+    def _publish_depth(self) -> None:
+        for priority in Priority:
+            set_admission_queue_depth(self.stage, priority.label, self.depth(priority))
+
+
+_priority: contextvars.ContextVar[Union[Priority, SharedPriority]] = contextvars.ContextVar(
+    "admission_priority", default=Priority.INTERACTIVE)
+_queues: Dict[str, StageQueue] = {}
+
+
+def set_priority(priority: Union[Priority, SharedPriority]) -> None:
+    """
+    Sets the priority of the LLM calls made on behalf of the current request.
+    """
+    _priority.set(priority)
+
+
+def current_priority() -> Priority:
+    priority = _priority.get()
+    return priority.priority if isinstance(priority, SharedPriority) else priority
+
+
+def priority_for_request(path: str, header: Optional[str]) -> Priority:
+    """
+    The X-Priority header ("interactive" or "batch") if given, else batch for the /batch
+    endpoints and interactive for the rest.
+    """
+    if header:
+        try:
+            return Priority[header.strip().upper()]
+        except KeyError:
+            pass
+    return Priority.BATCH if path.rstrip("/").endswith("/batch") else Priority.INTERACTIVE
+
+
+def max_wait(priority: Priority) -> float:
+    if priority == Priority.BATCH:
+        return PIPELINE_SETTINGS.admission_batch_max_wait_seconds
+    return PIPELINE_SETTINGS.admission_max_wait_seconds
+
+
+@asynccontextmanager
+async def admit(stage: Optional[str]) -> AsyncIterator[None]:
+    """
+    Holds a slot of the stage for the enclosed LLM call. A None stage, or admission
+    control turned off, admits at once.
+    """
+    if stage is None or not PIPELINE_SETTINGS.admission_enabled:
+        yield
+        return
+
+    queue = stage_queue(stage)
+    priority = current_priority()
+    started = time.perf_counter()
+    await queue.acquire(priority, max_wait(priority))
+    admitted = time.perf_counter()
+    record_admission_wait(stage, priority.label, admitted - started)
+    try:
+        yield
+    finally:
+        queue.release(time.perf_counter() - admitted)
+
+
+def stage_queue(stage: str) -> StageQueue:
+    queue = _queues.get(stage)
+    if queue is None:
+        queue = _queues[stage] = StageQueue(
+            stage,
+            PIPELINE_SETTINGS.admission_slots,
+            PIPELINE_SETTINGS.admission_queue_size,
+        )
+    return queue
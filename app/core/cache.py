@@ -0,0 +1,119 @@
+"""
+Small cache building blocks shared by the providers.
+
+LRUCache is a bounded in-process map with per-entry expiry. SqliteCache is an on-disk
+key/value store with the same interface, so the two can be layered with the LRU in front.
+Values must be JSON serializable for the SQLite store.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional, Tuple
+
+
+class LRUCache:
+    """
+    Thread-safe least-recently-used cache with an optional TTL per entry.
+    """
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[Any, Optional[float]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any, ttl_seconds: Optional[float] = None) -> None:
+        expires_at = time.time() + ttl_seconds if ttl_seconds is not None else None
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SqliteCache:
+    """
+    Persistent key/value store backed by a single SQLite table.
+
+    Expired rows are ignored on read and removed by purge_expired().
+    """
+
+    def __init__(self, path: str, table: str = "cache"):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.path = path
+        self.table = table
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {table} ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL)"
+        )
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[Any]:
+        entry = self.get_with_expiry(key)
+        return entry[0] if entry is not None else None
+
+    def get_with_expiry(self, key: str) -> Optional[Tuple[Any, Optional[float]]]:
+        """
+        Returns (value, expires_at) so a caller can warm a faster cache with the remaining TTL.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT value, expires_at FROM {self.table} WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        value, expires_at = row
+        if expires_at is not None and expires_at <= time.time():
+            return None
+        return json.loads(value), expires_at
+
+    def set(self, key: str, value: Any, ttl_seconds: Optional[float] = None) -> None:
+        expires_at = time.time() + ttl_seconds if ttl_seconds is not None else None
+        with self._lock:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value), expires_at),
+            )
+            self._conn.commit()
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+            self._conn.commit()
+
+    def purge_expired(self) -> int:
+        with self._lock:
+            cursor = self._conn.execute(
+                f"DELETE FROM {self.table} WHERE expires_at IS NOT NULL AND expires_at <= ?",
+                (time.time(),),
+            )
+            self._conn.commit()
+        return cursor.rowcount
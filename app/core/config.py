@@ -1,6 +1,7 @@
-from dataclasses import dataclass, field
+import os
+from dataclasses import dataclass, field, fields
 from enum import Enum
-from typing import Dict, List, Optional, Union
+from typing import Dict, List, Optional, Tuple, Union
 
 #############################################################
 ########## Data classes for provider configuration ##########
@@ -38,6 +39,19 @@ class ProviderInfo:
         default_model:
             - The model id used if the caller does not override it.
             - Can be None for non model based providers.
+        timeout_seconds:
+            - Deadline for a single call to this provider when it is run concurrently with others.
+            - None falls back to PIPELINE_SETTINGS.search_timeout_seconds.
+        llm_cache:
+            - Whether identical LLM calls made by this provider are answered from the shared LLM call cache.
+            - Only meaningful for providers that call an LLM.
+        endpoints:
+            - Base URLs of the Ollama hosts serving this provider's models, load balanced with failover.
+            - Empty uses PIPELINE_SETTINGS.ollama_hosts, or OLLAMA_HOST if that is empty too.
+        entry_point:
+            - "module:Class" of the provider's implementation, imported when the provider is first built.
+        async_entry_point:
+            - "module:Class" of the async implementation used by the server.
     """
     id: str
     type: str
@@ -45,6 +59,11 @@ class ProviderInfo:
     description: str
     models: Dict[str, ProviderModel] = field(default_factory=dict)
     default_model: Optional[str] = None
+    timeout_seconds: Optional[float] = None
+    llm_cache: bool = False
+    endpoints: List[str] = field(default_factory=list)
+    entry_point: str = ""
+    async_entry_point: str = ""
 
 
 class SectionName(Enum):
@@ -58,6 +77,7 @@ class SectionName(Enum):
     QUERY = ("query", False)
     SEARCH = ("search", True)
     SUMMARY = ("summary", False)
+    EMBEDDING = ("embedding", False)
 
     def __init__(self, text: str, is_multi: bool):
         self.text = text
@@ -125,8 +145,25 @@ QUERY_PROVIDERS = ProviderSection(
                     friendly_name="Llama 3.1",
                     description="Default for query generation.",
                 ),
+                "llama3.2": ProviderModel(
+                    id="llama3.2",
+                    friendly_name="Llama 3.2 3B",
+                    description="Small and fast, for latency-sensitive traffic.",
+                ),
             },
             default_model="llama3.1",
+            llm_cache=True,
+            entry_point="app.providers.query.ollama.query_provider:OllamaQueryProvider",
+            async_entry_point="app.providers.query.ollama.async_query_provider:AsyncOllamaQueryProvider",
+        ),
+        # No LLM call: stopword removal, phrase extraction and TF-IDF against the local corpus.
+        "lexical": ProviderInfo(
+            id="lexical",
+            type="local",
+            friendly_name="Lexical (keyword extraction)",
+            description="Builds the keyword query from the question's own words without an LLM call.",
+            entry_point="app.providers.query.lexical.query_provider:LexicalQueryProvider",
+            async_entry_point="app.providers.query.lexical.query_provider:AsyncLexicalQueryProvider",
         ),
     },
     default_selection="ollama_query",
@@ -136,6 +173,24 @@ SEARCH_PROVIDERS = ProviderSection(
     name=SectionName.SEARCH,
     description="Searches for an answer. Can be API or LLM.",
     providers={
+        # Runs before the others and skips them when it finds a strong match.
+        "history": ProviderInfo(
+            id="history",
+            type="local",
+            friendly_name="Answer history",
+            description="Local index of previously answered questions.",
+            models={
+                "nomic-embed-text": ProviderModel(
+                    id="nomic-embed-text",
+                    friendly_name="Nomic Embed Text",
+                    description="Embedding model used to match past questions.",
+                ),
+            },
+            default_model="nomic-embed-text",
+            timeout_seconds=5.0,
+            entry_point="app.providers.search.history.search_provider:HistorySearchProvider",
+            async_entry_point="app.providers.search.history.search_provider:AsyncHistorySearchProvider",
+        ),
         "ollama_search": ProviderInfo(
             id="ollama_search",
             type="ollama",
@@ -147,8 +202,17 @@ SEARCH_PROVIDERS = ProviderSection(
                     friendly_name="Llama 3.1",
                     description="Default for LLM search generation.",
                 ),
+                "llama3.2": ProviderModel(
+                    id="llama3.2",
+                    friendly_name="Llama 3.2 3B",
+                    description="Small and fast, for latency-sensitive traffic.",
+                ),
             },
             default_model="llama3.1",
+            timeout_seconds=60.0,
+            llm_cache=True,
+            entry_point="app.providers.search.ollama.search_provider:OllamaLlmSearchProvider",
+            async_entry_point="app.providers.search.ollama.async_search_provider:AsyncOllamaLlmSearchProvider",
         ),
         # Has an additional dependency on a running Ollama instance.
         "searxng": ProviderInfo(
@@ -156,9 +220,65 @@ SEARCH_PROVIDERS = ProviderSection(
             type="http",
             friendly_name="SearXNG",
             description="Meta search engine (self hosted).",
+            # The model and cache apply to the Ollama rerank call.
+            models={
+                "llama3.1": ProviderModel(
+                    id="llama3.1",
+                    friendly_name="Llama 3.1",
+                    description="Picks the most relevant results.",
+                ),
+                "llama3.2": ProviderModel(
+                    id="llama3.2",
+                    friendly_name="Llama 3.2 3B",
+                    description="Small and fast reranker.",
+                ),
+            },
+            default_model="llama3.1",
+            timeout_seconds=90.0,
+            llm_cache=True,
+            entry_point="app.providers.search.searxng.search_provider:SearXNGSearchProvider",
+            async_entry_point="app.providers.search.searxng.async_search_provider:AsyncSearXNGSearchProvider",
+        ),
+        # Requires a store built with `python -m app.corpus.ingest`.
+        "corpus": ProviderInfo(
+            id="corpus",
+            type="local",
+            friendly_name="Local Reddit corpus",
+            description="Keyword search over a local store built from ArcticShift dumps.",
+            timeout_seconds=5.0,
+            entry_point="app.providers.search.corpus.search_provider:CorpusSearchProvider",
+            async_entry_point="app.providers.search.corpus.search_provider:AsyncCorpusSearchProvider",
+        ),
+        # Built from the corpus store on first use, or with `python -m app.corpus.bm25`.
+        "bm25": ProviderInfo(
+            id="bm25",
+            type="local",
+            friendly_name="Local Reddit corpus (BM25)",
+            description="BM25 ranking over titles, selftexts and top comments of the local corpus.",
+            timeout_seconds=5.0,
+            entry_point="app.providers.search.bm25.search_provider:BM25SearchProvider",
+            async_entry_point="app.providers.search.bm25.search_provider:AsyncBM25SearchProvider",
+        ),
+        # Same as "searxng", but reranks with an Ollama embedding model instead of an LLM call.
+        "searxng_embedding": ProviderInfo(
+            id="searxng_embedding",
+            type="http",
+            friendly_name="SearXNG (embedding rerank)",
+            description="Meta search engine (self hosted), reranked by embedding similarity.",
+            models={
+                "nomic-embed-text": ProviderModel(
+                    id="nomic-embed-text",
+                    friendly_name="Nomic Embed Text",
+                    description="Embedding model used to rerank results.",
+                ),
+            },
+            default_model="nomic-embed-text",
+            timeout_seconds=60.0,
+            entry_point="app.providers.search.searxng.search_provider:SearXNGSearchProvider",
+            async_entry_point="app.providers.search.searxng.async_search_provider:AsyncSearXNGSearchProvider",
         ),
     },
-    default_selection=["ollama_search", "searxng"],
+    default_selection=["history", "ollama_search", "searxng"],
 )
 
 SUMMARY_PROVIDERS = ProviderSection(
@@ -176,24 +296,331 @@ SUMMARY_PROVIDERS = ProviderSection(
                     friendly_name="Llama 3.1",
                     description="Fast summarizer.",
                 ),
+                "llama3.2": ProviderModel(
+                    id="llama3.2",
+                    friendly_name="Llama 3.2 3B",
+                    description="Small and fast, for latency-sensitive traffic.",
+                ),
+                "llama3.3": ProviderModel(
+                    id="llama3.3",
+                    friendly_name="Llama 3.3 70B",
+                    description="Large summarizer for backfills that can wait.",
+                ),
             },
             default_model="llama3.1",
+            llm_cache=True,
+            entry_point="app.providers.summary.ollama.summary_provider:OllamaSummaryProvider",
+            async_entry_point="app.providers.summary.ollama.async_summary_provider:AsyncOllamaSummaryProvider",
         ),
     },
     default_selection="ollama_summary",
 )
 
+EMBEDDING_PROVIDERS = ProviderSection(
+    name=SectionName.EMBEDDING,
+    description="Models that turn text into vectors for similarity lookups.",
+    providers={
+        "ollama_embedding": ProviderInfo(
+            id="ollama_embedding",
+            type="ollama",
+            friendly_name="Ollama (embedding)",
+            description="Local embedding model via Ollama.",
+            models={
+                "nomic-embed-text": ProviderModel(
+                    id="nomic-embed-text",
+                    friendly_name="Nomic Embed Text",
+                    description="Default for question similarity.",
+                ),
+            },
+            default_model="nomic-embed-text",
+            entry_point="app.providers.embedding.ollama.embedding_provider:OllamaEmbeddingProvider",
+            async_entry_point="app.providers.embedding.ollama.async_embedding_provider:AsyncOllamaEmbeddingProvider",
+        ),
+    },
+    default_selection="ollama_embedding",
+)
+
 SECTIONS: Dict[str, ProviderSection] = {
     SectionName.QUERY.name: QUERY_PROVIDERS,
     SectionName.SEARCH.name: SEARCH_PROVIDERS,
     SectionName.SUMMARY.name: SUMMARY_PROVIDERS,
+    SectionName.EMBEDDING.name: EMBEDDING_PROVIDERS,
+}
+
+#############################################################
+################ Ollama model runtime options ###############
+#############################################################
+
+
+@dataclass(frozen=True)
+class ModelRuntime:
+    """
+    How Ollama runs a model. Ollama loads a new runner when a call asks for a different
+    context size, and unloads a model after its keep_alive, so both are pinned per model
+    and sent with every call to it, whichever provider makes it.
+
+    Attributes:
+        num_ctx: Context window in tokens. None uses PIPELINE_SETTINGS.ollama_num_ctx.
+        keep_alive: How long the model stays loaded after a call, e.g. "30m".
+            None uses PIPELINE_SETTINGS.ollama_keep_alive.
+    """
+    num_ctx: Optional[int] = None
+    keep_alive: Optional[str] = None
+
+
+# Models not listed use the defaults of both attributes.
+OLLAMA_MODELS: Dict[str, ModelRuntime] = {
+    "llama3.1": ModelRuntime(num_ctx=8192),
+    "llama3.2": ModelRuntime(num_ctx=8192),
+    # Large; let it unload sooner so it does not hold the GPU between backfills.
+    "llama3.3": ModelRuntime(num_ctx=8192, keep_alive="10m"),
+    "nomic-embed-text": ModelRuntime(num_ctx=2048),
 }
 
+#############################################################
+############### Runtime pipeline settings ###################
+#############################################################
+
+
+@dataclass(frozen=True)
+class PipelineSettings:
+    """
+    Runtime settings for the request pipeline.
+
+    Every attribute can be overridden with an environment variable of the same name in
+    upper case, for example SEARCH_FANOUT=sequential.
+
+    Attributes:
+        search_fanout:
+            - "concurrent" runs all search providers in parallel, each with its own deadline.
+            - "sequential" runs them one after another with no deadline.
+        search_timeout_seconds: Default deadline for a search provider without its own timeout_seconds.
+        search_max_workers: Size of the thread pool used for concurrent search fan-out.
+        comment_max_in_flight: Maximum concurrent ArcticShift requests per comment batch.
+        comment_request_timeout_seconds: Timeout for a single ArcticShift request.
+        comment_batch_timeout_seconds: Deadline for a whole batch of comment fetches.
+        cache_dir: Directory for on-disk caches. Empty means app/.cache.
+        comment_cache_enabled: Whether ArcticShift comment threads are cached.
+        comment_cache_max_entries: Size of the in-process LRU in front of the SQLite comment store.
+        semantic_cache_enabled: Whether /generate_summary answers are reused for similar questions.
+        semantic_cache_threshold: Minimum cosine similarity for a semantic cache hit.
+        semantic_cache_max_entries: Maximum cached answers per source subreddit.
+        semantic_cache_max_age_seconds: How long a cached answer is served.
+        llm_cache_max_entries: Size of the in-process LRU of LLM call results.
+        llm_cache_ttl_seconds: How long a cached LLM call result is reused.
+        llm_cache_persist: Whether LLM call results are also stored in SQLite and survive restarts.
+        history_record: Whether answered questions are added to the local history index. Only the
+            first worker process to open the index writes it; see app/README.md.
+        history_match_threshold: Minimum cosine similarity for the history provider to short-circuit search.
+        batch_max_items: Maximum number of questions accepted by a batch endpoint.
+        batch_max_concurrency: Default number of batch items processed at once.
+        batch_dedup_threshold: Minimum cosine similarity for two batch items to share one pipeline run.
+        request_coalescing: Whether concurrent requests for the same question share one pipeline run.
+        query_mode: "single" waits for the default query provider before searching. "speculative"
+            starts searching with the lexical query at once, runs the default provider's query
+            alongside, and merges in its results if it arrives within speculative_query_wait_seconds.
+        speculative_query_wait_seconds: How long speculative mode waits for the default query provider.
+        summary_token_budget: Estimated tokens of search evidence put in the summary prompt; 0 means no limit.
+        summary_mode: "separate" reranks SearXNG results with one LLM call and summarizes with
+            another. "fused" skips the rerank call and passes the top candidates to a single
+            structured-output call that selects the sources and writes the summary.
+            /generate_summary/stream always uses "separate".
+        fused_max_candidates: SearXNG results, with their comments, passed to the fused call.
+        fused_top_k: Maximum Reddit posts the fused call keeps as sources.
+        corpus_dir: Directory of the local Reddit corpus built by app.corpus.ingest. Empty means app/data/corpus.
+        bm25_dir: Directory of the BM25 snapshot. Empty means app/data/bm25.
+        bm25_sharded: Whether the BM25 index keeps one shard per subreddit.
+        telemetry_enabled: Whether stage timings and LLM usage are recorded for /metrics and Server-Timing.
+        log_level: Level of the "app" logger.
+        log_format: "text" or "json" (one object per line).
+        searxng_base_url: Base URL of the SearXNG instance.
+        arctic_shift_base_url: Base URL of the ArcticShift API. The default Ollama host comes from
+            OLLAMA_HOST (see ollama_hosts).
+        http_timeout_seconds: Default timeout of an outbound SearXNG or ArcticShift request.
+        http_connect_timeout_seconds: Timeout for opening a connection to an upstream host.
+        http_max_per_host: Maximum outbound requests (and pooled connections) per upstream host.
+        http2: Whether HTTP/2 is used for upstream hosts when the h2 package is installed.
+        http_retries: Maximum retries of a failed idempotent request.
+        http_retry_backoff_seconds: Base of the exponential retry backoff.
+        http_retry_budget: Retries allowed per upstream host as a fraction of its requests.
+        http_breaker_failures: Consecutive failures that open a host's circuit breaker; 0 disables it.
+        http_breaker_reset_seconds: How long an open breaker rejects requests before a trial request.
+        ollama_hosts: Comma separated Ollama base URLs for providers without their own endpoints.
+            Empty means OLLAMA_HOST, or http://127.0.0.1:11434 when that is unset too.
+        ollama_max_per_endpoint: Maximum concurrent calls per Ollama endpoint; more wait for a free slot.
+        ollama_keep_alive: keep_alive sent with every Ollama call, e.g. "30m"; "-1m" keeps models loaded.
+            OLLAMA_MODELS can set it per model.
+        ollama_num_ctx: num_ctx sent with every Ollama call; 0 leaves it to Ollama.
+            OLLAMA_MODELS can set it per model.
+        ollama_health_interval_seconds: How often the server checks every Ollama endpoint; 0 disables it.
+        ollama_down_seconds: How long a failed Ollama endpoint is skipped before it is tried again.
+        admission_enabled: Whether LLM calls queue for a slot of their stage (query, search_llm,
+            rerank, summary) and are shed with 429/503 under overload.
+        admission_slots: Concurrent LLM calls per stage.
+        admission_queue_size: Calls that may wait per stage; batch calls may fill half of it.
+        admission_max_wait_seconds: Longest an interactive call waits for a slot before it is shed.
+        admission_batch_max_wait_seconds: Longest a batch call waits for a slot before it is shed.
+        provider_warm_up: Whether the server builds the default providers and preloads their
+            Ollama models in the background at startup. /health/ready reports when this is done.
+        provider_warm_up_timeout_seconds: Deadline for preloading one provider's model.
+        provider_cache_max_entries: Providers built for per-request selections kept per section;
+            the least recently used is dropped first. Default providers are always kept.
+        template_reload_interval_seconds: How often the server checks app/templates for changed
+            prompt templates and reloads them; 0 turns reloading off.
+    """
+    search_fanout: str = "concurrent"
+    search_timeout_seconds: float = 60.0
+    search_max_workers: int = 8
+    comment_max_in_flight: int = 5
+    comment_request_timeout_seconds: float = 15.0
+    comment_batch_timeout_seconds: float = 20.0
+    cache_dir: str = ""
+    comment_cache_enabled: bool = True
+    comment_cache_max_entries: int = 2048
+    semantic_cache_enabled: bool = True
+    semantic_cache_threshold: float = 0.95
+    semantic_cache_max_entries: int = 5000
+    semantic_cache_max_age_seconds: float = 86400.0
+    llm_cache_max_entries: int = 1024
+    llm_cache_ttl_seconds: float = 86400.0
+    llm_cache_persist: bool = False
+    history_record: bool = True
+    history_match_threshold: float = 0.92
+    batch_max_items: int = 500
+    batch_max_concurrency: int = 4
+    batch_dedup_threshold: float = 0.97
+    request_coalescing: bool = True
+    query_mode: str = "single"
+    speculative_query_wait_seconds: float = 3.0
+    summary_token_budget: int = 1500
+    summary_mode: str = "separate"
+    fused_max_candidates: int = 8
+    fused_top_k: int = 3
+    corpus_dir: str = ""
+    bm25_dir: str = ""
+    bm25_sharded: bool = True
+    telemetry_enabled: bool = True
+    log_level: str = "INFO"
+    log_format: str = "text"
+    searxng_base_url: str = "http://localhost:8888"
+    arctic_shift_base_url: str = "https://arctic-shift.photon-reddit.com/api"
+    http_timeout_seconds: float = 15.0
+    http_connect_timeout_seconds: float = 3.0
+    http_max_per_host: int = 20
+    http2: bool = True
+    http_retries: int = 2
+    http_retry_backoff_seconds: float = 0.2
+    http_retry_budget: float = 0.2
+    http_breaker_failures: int = 5
+    http_breaker_reset_seconds: float = 30.0
+    ollama_hosts: str = ""
+    ollama_max_per_endpoint: int = 4
+    ollama_keep_alive: str = "30m"
+    ollama_num_ctx: int = 0
+    ollama_health_interval_seconds: float = 15.0
+    ollama_down_seconds: float = 10.0
+    admission_enabled: bool = True
+    admission_slots: int = 4
+    admission_queue_size: int = 64
+    admission_max_wait_seconds: float = 20.0
+    admission_batch_max_wait_seconds: float = 120.0
+    provider_warm_up: bool = True
+    provider_warm_up_timeout_seconds: float = 120.0
+    provider_cache_max_entries: int = 16
+    template_reload_interval_seconds: float = 2.0
+
+    @classmethod
+    def from_env(cls) -> "PipelineSettings":
+        overrides = {}
+        for f in fields(cls):
+            raw = os.getenv(f.name.upper())
+            if raw is None:
+                continue
+            default = f.default
+            if isinstance(default, bool):
+                overrides[f.name] = raw.strip().lower() in ("1", "true", "yes", "on")
+            elif isinstance(default, (int, float, str)):
+                overrides[f.name] = type(default)(raw)
+            else:
+                overrides[f.name] = raw
+        return cls(**overrides)
+
+
+PIPELINE_SETTINGS = PipelineSettings.from_env()
+
+
+def get_cache_path(filename: str) -> str:
+    """
+    Returns the absolute path of an on-disk cache file inside PIPELINE_SETTINGS.cache_dir.
+    """
+    cache_dir = PIPELINE_SETTINGS.cache_dir or os.path.join(
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache")
+    return os.path.join(cache_dir, filename)
+
+
+def get_corpus_dir() -> str:
+    """
+    Returns the absolute path of the local Reddit corpus store.
+    """
+    return PIPELINE_SETTINGS.corpus_dir or os.path.join(
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "corpus")
+
+
+def get_bm25_dir() -> str:
+    """
+    Returns the absolute path of the BM25 snapshot directory.
+    """
+    return PIPELINE_SETTINGS.bm25_dir or os.path.join(
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "bm25")
+
+
+def model_runtime(model: str) -> ModelRuntime:
+    """
+    Returns the runtime options of an Ollama model, with the settings' defaults filled in.
+    """
+    runtime = OLLAMA_MODELS.get(model, ModelRuntime())
+    return ModelRuntime(
+        num_ctx=runtime.num_ctx or PIPELINE_SETTINGS.ollama_num_ctx or None,
+        keep_alive=runtime.keep_alive or PIPELINE_SETTINGS.ollama_keep_alive or None,
+    )
+
+
 #############################################################
 ########## Helper functions for provider config #############
 #############################################################
 
 
+def get_provider_info(section_name: SectionName, provider_id: str) -> ProviderInfo:
+    """
+    Returns the ProviderInfo for a provider id within a section.
+    """
+    return SECTIONS[section_name.name].providers[provider_id]
+
+
+def check_provider_choice(
+    section_name: SectionName,
+    provider_id: str,
+    model: Optional[str] = None,
+) -> Tuple[str, Optional[str]]:
+    """
+    Returns (provider_id, model) with the provider's default model filled in.
+    Raises ValueError if the section has no such provider or the provider no such model.
+    """
+    section = SECTIONS[section_name.name]
+    pinfo = section.providers.get(provider_id)
+    if pinfo is None:
+        raise ValueError(
+            f"Unknown {section_name.text} provider '{provider_id}'. "
+            f"Available: {', '.join(section.providers)}."
+        )
+    if model is None:
+        return provider_id, pinfo.default_model
+    if model not in pinfo.models:
+        available = ", ".join(pinfo.models) or "none"
+        raise ValueError(f"Unknown model '{model}' for {section_name.text} provider '{provider_id}'. Available: {available}.")
+    return provider_id, model
+
+
 def get_default_query_provider():
     """
     Returns the (provider_id, default_model) tuple for the default query provider.
@@ -204,6 +631,17 @@ def get_default_query_provider():
     return pid, pinfo.default_model
 
 
+def get_search_provider_timeout(provider_id: str) -> float:
+    """
+    Returns the deadline in seconds for a single call to the given search provider.
+    """
+    section = SECTIONS[SectionName.SEARCH.name]
+    pinfo = section.providers.get(provider_id)
+    if pinfo is not None and pinfo.timeout_seconds is not None:
+        return pinfo.timeout_seconds
+    return PIPELINE_SETTINGS.search_timeout_seconds
+
+
 def get_default_search_providers():
     """
     Returns a list of (provider_id, default_model) tuples for the default search providers.
@@ -230,3 +668,13 @@ def get_default_summary_provider():
     pid = section.default_selection
     pinfo = section.providers[pid]
     return pid, pinfo.default_model
+
+
+def get_default_embedding_provider():
+    """
+    Returns the (provider_id, default_model) tuple for the default embedding provider.
+    """
+    section = SECTIONS[SectionName.EMBEDDING.name]
+    pid = section.default_selection
+    pinfo = section.providers[pid]
+    return pid, pinfo.default_model
@@ -0,0 +1,361 @@
+"""
+Shared, pooled HTTP clients for the network providers (SearXNG, ArcticShift).
+
+Every upstream host gets one keep-alive httpx client per flavour (sync and async) for the
+life of the process, shared by all providers that talk to it. Per host:
+    - at most http_max_per_host requests are in flight; further requests wait for a slot,
+      up to the pool timeout;
+    - HTTP/2 is used when http2 is on and the h2 package is installed;
+    - idempotent requests that fail with a transport error, a timeout or a 429/502/503/504
+      are retried up to http_retries times with exponential backoff and jitter, as long as
+      the host's retry budget allows (retries may add at most http_retry_budget of the
+      traffic, so a struggling host is not hit harder);
+    - a circuit breaker opens after http_breaker_failures consecutive failures and rejects
+      requests at once with CircuitOpenError for http_breaker_reset_seconds. After that one
+      trial request is let through, and its outcome closes or re-opens the breaker.
+"""
+
+import asyncio
+import importlib.util
+import random
+import threading
+import time
+from typing import Any, Dict, Optional
+from urllib.parse import urlsplit
+
+import httpx
+
+from app.core.config import PIPELINE_SETTINGS
+from app.core.telemetry import record_upstream_request
+
+RETRY_STATUSES = frozenset({429, 502, 503, 504})
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE"})
+MAX_BACKOFF_SECONDS = 5.0
+
+
+class CircuitOpenError(httpx.TransportError):
+    """
+    Raised without sending a request while the host's circuit breaker is open.
+    """
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure breaker: closed -> open after failure_threshold failures,
+    open -> half open after reset_seconds, half open -> closed or open on the trial's outcome.
+    A failure_threshold of 0 or less never opens.
+    """
+
+    def __init__(self, failure_threshold: int, reset_seconds: float):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        # A trial that never reports back (e.g. a cancelled caller) expires after reset_seconds.
+        self._trial_started: Optional[float] = None
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if time.monotonic() - self._opened_at < self.reset_seconds:
+                return "open"
+            return "half_open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            now = time.monotonic()
+            if now - self._opened_at < self.reset_seconds:
+                return False
+            if self._trial_started is not None and now - self._trial_started < self.reset_seconds:
+                return False
+            self._trial_started = now
+            return True
+
+    def is_open(self) -> bool:
+        with self._lock:
+            return self._opened_at is not None
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_started = None
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            trial_failed = self._trial_started is not None
+            self._trial_started = None
+            if self.failure_threshold > 0 and (trial_failed or self._failures >= self.failure_threshold):
+                self._opened_at = time.monotonic()
+
+
+class RetryBudget:
+    """
+    Token bucket limiting retries to a fraction of requests: each request deposits ratio
+    tokens, each retry withdraws one. Starts full so a quiet host can still retry.
+    """
+
+    def __init__(self, ratio: float, max_tokens: float = 10.0):
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+        self._tokens = max_tokens
+        self._lock = threading.Lock()
+
+    def deposit(self) -> None:
+        with self._lock:
+            self._tokens = min(self.max_tokens, self._tokens + self.ratio)
+
+    def withdraw(self) -> bool:
+        with self._lock:
+            if self._tokens < 1.0:
+                return False
+            self._tokens -= 1.0
+            return True
+
+
+class _Host:
+    """
+    Breaker, retry budget and retry decisions of one upstream host, shared by the sync and
+    async clients.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.breaker = CircuitBreaker(
+            PIPELINE_SETTINGS.http_breaker_failures,
+            PIPELINE_SETTINGS.http_breaker_reset_seconds,
+        )
+        self.budget = RetryBudget(PIPELINE_SETTINGS.http_retry_budget)
+
+    def admit(self) -> None:
+        if not self.breaker.allow():
+            record_upstream_request(self.name, "circuit_open")
+            raise CircuitOpenError(f"Circuit breaker for {self.name} is open.")
+        self.budget.deposit()
+
+    def retry_delay(
+        self,
+        method: str,
+        attempt: int,
+        response: Optional[httpx.Response] = None,
+        error: Optional[Exception] = None,
+    ) -> Optional[float]:
+        """
+        Records the outcome of an attempt and returns how long to wait before retrying it,
+        or None if the response or error is final.
+        """
+        if error is None and response is not None and response.status_code not in RETRY_STATUSES:
+            # Every 5xx counts against the breaker, even the ones that are not retried.
+            if response.status_code >= 500:
+                self.breaker.record_failure()
+                record_upstream_request(self.name, "error")
+            else:
+                self.breaker.record_success()
+                record_upstream_request(self.name, "ok")
+            return None
+
+        self.breaker.record_failure()
+        if (
+            attempt >= PIPELINE_SETTINGS.http_retries
+            or method.upper() not in IDEMPOTENT_METHODS
+            or self.breaker.is_open()
+            or not self.budget.withdraw()
+        ):
+            record_upstream_request(self.name, "error")
+            return None
+
+        record_upstream_request(self.name, "retry")
+        return _backoff(attempt, response)
+
+
+_hosts: Dict[str, _Host] = {}
+_hosts_lock = threading.Lock()
+
+
+def host_state(url: str) -> _Host:
+    key = _host_key(url)
+    with _hosts_lock:
+        host = _hosts.get(key)
+        if host is None:
+            host = _hosts[key] = _Host(key)
+        return host
+
+
+class HttpClient:
+    """
+    Thread-safe sync client with one httpx.Client per host.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._clients: Dict[str, httpx.Client] = {}
+        self._slots: Dict[str, threading.BoundedSemaphore] = {}
+
+    def get(self, url: str, **kwargs: Any) -> httpx.Response:
+        return self.request("GET", url, **kwargs)
+
+    def request(self, method: str, url: str, **kwargs: Any) -> httpx.Response:
+        host = host_state(url)
+        host.admit()
+        client, slots = self._client(host.name)
+
+        attempt = 0
+        while True:
+            if not slots.acquire(timeout=PIPELINE_SETTINGS.http_timeout_seconds):
+                raise httpx.PoolTimeout(f"No free request slot for {host.name}.")
+            try:
+                response = client.request(method, url, **kwargs)
+            except httpx.TransportError as e:
+                delay = host.retry_delay(method, attempt, error=e)
+                if delay is None:
+                    raise
+            else:
+                delay = host.retry_delay(method, attempt, response=response)
+                if delay is None:
+                    return response
+                response.close()
+            finally:
+                slots.release()
+            time.sleep(delay)
+            attempt += 1
+
+    def close(self) -> None:
+        with self._lock:
+            for client in self._clients.values():
+                client.close()
+            self._clients.clear()
+
+    def _client(self, host: str):
+        with self._lock:
+            client = self._clients.get(host)
+            if client is None:
+                client = self._clients[host] = httpx.Client(**_client_options())
+                self._slots[host] = threading.BoundedSemaphore(PIPELINE_SETTINGS.http_max_per_host)
+            return client, self._slots[host]
+
+
+class AsyncHttpClient:
+    """
+    Asyncio client with one httpx.AsyncClient per host. Used from the server's event loop.
+    """
+
+    def __init__(self):
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+        self._slots: Dict[str, asyncio.Semaphore] = {}
+
+    async def get(self, url: str, **kwargs: Any) -> httpx.Response:
+        return await self.request("GET", url, **kwargs)
+
+    async def request(self, method: str, url: str, **kwargs: Any) -> httpx.Response:
+        host = host_state(url)
+        host.admit()
+        client, slots = self._client(host.name)
+
+        attempt = 0
+        while True:
+            try:
+                await asyncio.wait_for(slots.acquire(), PIPELINE_SETTINGS.http_timeout_seconds)
+            except asyncio.TimeoutError:
+                raise httpx.PoolTimeout(f"No free request slot for {host.name}.") from None
+            try:
+                response = await client.request(method, url, **kwargs)
+            except httpx.TransportError as e:
+                delay = host.retry_delay(method, attempt, error=e)
+                if delay is None:
+                    raise
+            else:
+                delay = host.retry_delay(method, attempt, response=response)
+                if delay is None:
+                    return response
+                await response.aclose()
+            finally:
+                slots.release()
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def aclose(self) -> None:
+        clients = list(self._clients.values())
+        self._clients.clear()
+        for client in clients:
+            await client.aclose()
+
+    def _client(self, host: str):
+        client = self._clients.get(host)
+        if client is None:
+            client = self._clients[host] = httpx.AsyncClient(**_client_options())
+            self._slots[host] = asyncio.Semaphore(PIPELINE_SETTINGS.http_max_per_host)
+        return client, self._slots[host]
+
+
+_http_client: Optional[HttpClient] = None
+_async_http_client: Optional[AsyncHttpClient] = None
+_singleton_lock = threading.Lock()
+
+
+def get_http_client() -> HttpClient:
+    global _http_client
+    with _singleton_lock:
+        if _http_client is None:
+            _http_client = HttpClient()
+        return _http_client
+
+
+def get_async_http_client() -> AsyncHttpClient:
+    global _async_http_client
+    with _singleton_lock:
+        if _async_http_client is None:
+            _async_http_client = AsyncHttpClient()
+        return _async_http_client
+
+
+async def close_http_clients() -> None:
+    """
+    Closes the shared clients; called on server shutdown.
+    """
+    if _http_client is not None:
+        _http_client.close()
+    if _async_http_client is not None:
+        await _async_http_client.aclose()
+
+
+def http2_available() -> bool:
+    return PIPELINE_SETTINGS.http2 and importlib.util.find_spec("h2") is not None
+
+
+def _client_options() -> Dict[str, Any]:
+    limit = PIPELINE_SETTINGS.http_max_per_host
+    return {
+        "timeout": httpx.Timeout(
+            PIPELINE_SETTINGS.http_timeout_seconds,
+            connect=PIPELINE_SETTINGS.http_connect_timeout_seconds,
+        ),
+        "limits": httpx.Limits(max_connections=limit, max_keepalive_connections=limit),
+        "http2": http2_available(),
+    }
+
+
+def _host_key(url: str) -> str:
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+def _backoff(attempt: int, response: Optional[httpx.Response]) -> float:
+    """
+    Full-jitter exponential backoff, or the server's Retry-After if it is shorter than the cap.
+    """
+    if response is not None:
+        retry_after = response.headers.get("retry-after", "")
+        try:
+            seconds = float(retry_after)
+        except ValueError:
+            seconds = -1.0
+        if 0.0 <= seconds <= MAX_BACKOFF_SECONDS:
+            return seconds
+    ceiling = min(MAX_BACKOFF_SECONDS, PIPELINE_SETTINGS.http_retry_backoff_seconds * 2 ** attempt)
+    return random.uniform(0.0, ceiling)
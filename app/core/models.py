@@ -2,8 +2,54 @@
 Data models for question input and aggregated answers.
 """
 
-from pydantic import BaseModel
-from typing import Optional, List
+from pydantic import BaseModel, model_validator
+from typing import List, Optional, Union
+
+from app.core.config import (SectionName, check_provider_choice,
+                             get_default_query_provider,
+                             get_default_summary_provider)
+
+
+class ProviderChoice(BaseModel):
+    """
+    A provider and model chosen by a request. None keeps the configured default.
+    """
+    provider: Optional[str] = None
+    model: Optional[str] = None
+
+
+class ProviderSelection(BaseModel):
+    """
+    Per-request choice of providers, validated against SECTIONS. Sections left out use
+    their default selection.
+    """
+    query: Optional[ProviderChoice] = None
+    search: Optional[List[ProviderChoice]] = None
+    summary: Optional[ProviderChoice] = None
+
+    @model_validator(mode="after")
+    def check_choices(self) -> "ProviderSelection":
+        if self.query is not None:
+            provider = self.query.provider or get_default_query_provider()[0]
+            check_provider_choice(SectionName.QUERY, provider, self.query.model)
+        if self.search is not None:
+            if not self.search:
+                raise ValueError("search must name at least one provider.")
+            for choice in self.search:
+                if choice.provider is None:
+                    raise ValueError("Every search choice must name a provider.")
+                check_provider_choice(SectionName.SEARCH, choice.provider, choice.model)
+        if self.summary is not None:
+            provider = self.summary.provider or get_default_summary_provider()[0]
+            check_provider_choice(SectionName.SUMMARY, provider, self.summary.model)
+        return self
+
+    def key(self) -> str:
+        """
+        Identifies the selection in coalescing and deduplication keys.
+        """
+        return self.model_dump_json(exclude_none=True)
+
 
 class QuestionInput(BaseModel):
     """
@@ -13,6 +59,8 @@ class QuestionInput(BaseModel):
     body: Optional[str] = None
     source: Optional[str] = None
     url: Optional[str] = None
+    # Overrides the configured providers for this request.
+    providers: Optional[ProviderSelection] = None
 
 
 class PerSourceResult(BaseModel):
@@ -30,3 +78,23 @@ class AggregatedAnswer(BaseModel):
     """
     final_summary: str
     per_source_results: List[PerSourceResult]
+
+
+class FusedAnswer(AggregatedAnswer):
+    """
+    Data model for the answer of the fused rerank and summary call. per_source_results
+    keeps the Reddit posts the model selected; selected_sources are their numbers in the
+    prompt's evidence, best first.
+    """
+    selected_sources: List[int] = []
+
+
+class BatchItemResult(BaseModel):
+    """
+    Data model for one line of a batch NDJSON response.
+    """
+    index: int
+    status: str
+    duplicate_of: Optional[int] = None
+    result: Optional[Union[AggregatedAnswer, List[PerSourceResult]]] = None
+    detail: Optional[str] = None
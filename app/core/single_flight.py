@@ -0,0 +1,135 @@
+"""
+Single-flight call coalescing.
+
+Concurrent calls with the same key share one execution: the first caller starts it, later
+callers wait for the same result (or exception). Once it finishes the key is released, so
+the next call starts a fresh execution. Results are not cached beyond that.
+"""
+
+import asyncio
+import contextvars
+import threading
+from concurrent.futures import Future
+from typing import Awaitable, Callable, Dict, Generic, Hashable, TypeVar
+
+from app.core.admission import SharedPriority, current_priority, set_priority
+from app.core.telemetry import (RequestTimings, current_request_timings,
+                                set_request_timings)
+
+T = TypeVar("T")
+
+
+class SingleFlight(Generic[T]):
+    """
+    Thread-based variant: the first caller runs fn in its own thread, others block on it.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._in_flight: Dict[Hashable, "Future[T]"] = {}
+
+    def do(self, key: Hashable, fn: Callable[[], T]) -> T:
+        with self._lock:
+            future = self._in_flight.get(key)
+            leader = future is None
+            if leader:
+                future = self._in_flight[key] = Future()
+        if not leader:
+            return future.result()
+
+        try:
+            result = fn()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self._in_flight)
+
+
+class AsyncSingleFlight(Generic[T]):
+    """
+    Asyncio variant: the shared execution is a task, so it keeps running when a waiting
+    caller is cancelled and still delivers its result to the others.
+
+    By default the task runs in a copy of the first caller's context. With isolated=True it
+    runs in a fresh context of its own instead (see _SharedContext): its LLM calls are
+    admitted at the highest priority among the callers that joined it, and its stage
+    timings are added to the Server-Timing of every caller.
+    """
+
+    def __init__(self, isolated: bool = False):
+        self.isolated = isolated
+        self._in_flight: Dict[Hashable, "asyncio.Task[T]"] = {}
+        self._contexts: Dict[Hashable, _SharedContext] = {}
+
+    def task(self, key: Hashable, factory: Callable[[], Awaitable[T]]) -> "asyncio.Task[T]":
+        """
+        Returns the in-flight task for key, starting factory() if there is none.
+        """
+        task = self._in_flight.get(key)
+        if task is None:
+            task = self._start(key, factory)
+        if self.isolated:
+            self._contexts[key].join()
+        return task
+
+    async def do(self, key: Hashable, factory: Callable[[], Awaitable[T]]) -> T:
+        task = self.task(key, factory)
+        shared = self._contexts.get(key)
+        try:
+            return await asyncio.shield(task)
+        finally:
+            if shared is not None:
+                shared.report()
+
+    def _start(self, key: Hashable, factory: Callable[[], Awaitable[T]]) -> "asyncio.Task[T]":
+        if self.isolated:
+            shared = self._contexts[key] = _SharedContext()
+            task = shared.context.run(asyncio.ensure_future, factory())
+        else:
+            task = asyncio.ensure_future(factory())
+        self._in_flight[key] = task
+
+        def release(finished: "asyncio.Task[T]") -> None:
+            if self._in_flight.get(key) is finished:
+                del self._in_flight[key]
+                self._contexts.pop(key, None)
+            # Callers that awaited the task got its exception; this keeps asyncio from
+            # logging it as never retrieved when they were all cancelled first.
+            if not finished.cancelled():
+                finished.exception()
+
+        task.add_done_callback(release)
+        return task
+
+    def __len__(self) -> int:
+        return len(self._in_flight)
+
+
+class _SharedContext:
+    """
+    The context of an isolated execution: a SharedPriority raised by every caller that
+    joins, and a RequestTimings whose stages are added to each caller's own.
+    """
+
+    def __init__(self):
+        self.priority = SharedPriority()
+        self.timings = RequestTimings()
+        self.context = contextvars.Context()
+        self.context.run(set_priority, self.priority)
+        self.context.run(set_request_timings, self.timings)
+
+    def join(self) -> None:
+        self.priority.join(current_priority())
+
+    def report(self) -> None:
+        timings = current_request_timings()
+        if timings is not None:
+            timings.merge(self.timings)
@@ -0,0 +1,317 @@
+"""
+Latency and LLM usage instrumentation.
+
+Metrics live in a small in-process registry of counters and histograms and are rendered
+in the Prometheus text format by render_metrics(). Per-request timings are collected in a
+ContextVar installed by start_request(); timed() records a stage into both the stage
+histogram and the current request, which the HTTP layer reports as a Server-Timing header.
+
+With PIPELINE_SETTINGS.telemetry_enabled off, timed() and the record_* helpers return
+immediately.
+"""
+
+import contextvars
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from app.core.config import PIPELINE_SETTINGS
+
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_registry: List["_Metric"] = []
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def _label_key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.label_names)
+
+    def _format_labels(self, key: Tuple[str, ...], extra: Optional[Tuple[str, str]] = None) -> str:
+        pairs = list(zip(self.label_names, key))
+        if extra is not None:
+            pairs.append(extra)
+        if not pairs:
+            return ""
+        inner = ",".join(f'{name}="{_escape(value)}"' for name, value in pairs)
+        return "{" + inner + "}"
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str] = ()):
+        super().__init__(name, help_text, label_names)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{self._format_labels(key)} {_number(value)}")
+        return lines
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float, **labels: str) -> None:
+        key = self._label_key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help_text: str,
+        label_names: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ):
+        super().__init__(name, help_text, label_names)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        """
+        Each series is [count per bucket..., +Inf count, sum].
+        """
+        key = self._label_key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0.0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += 1
+            series[-1] += value
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                for bound, count in zip(self.buckets, series):
+                    labels = self._format_labels(key, ("le", _number(bound)))
+                    lines.append(f"{self.name}_bucket{labels} {_number(count)}")
+                lines.append(f"{self.name}_bucket{self._format_labels(key, ('le', '+Inf'))} {_number(series[-2])}")
+                lines.append(f"{self.name}_count{self._format_labels(key)} {_number(series[-2])}")
+                lines.append(f"{self.name}_sum{self._format_labels(key)} {series[-1]}")
+        return lines
+
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_seconds", "Time to the first response byte, by path and status.", ("path", "status"))
+STAGE_SECONDS = Histogram(
+    "pipeline_stage_seconds", "Duration of each pipeline stage.", ("stage",))
+SEARCH_PROVIDER_SECONDS = Histogram(
+    "search_provider_seconds", "Duration of each search provider call, by outcome.", ("provider", "outcome"))
+LLM_CALLS = Counter(
+    "llm_calls_total", "LLM chat calls, by model and whether the call cache answered them.", ("model", "cache"))
+LLM_TOKENS = Counter(
+    "ollama_tokens_total", "Tokens reported by Ollama, by model and kind (prompt or completion).", ("model", "kind"))
+LLM_DURATION_SECONDS = Histogram(
+    "ollama_duration_seconds", "Durations reported by Ollama, by model and phase.", ("model", "phase"))
+ADMISSION_QUEUE_DEPTH = Gauge(
+    "admission_queue_depth", "Calls waiting for an LLM slot, by stage and priority.", ("stage", "priority"))
+ADMISSION_WAIT_SECONDS = Histogram(
+    "admission_wait_seconds", "Time calls waited for an LLM slot, by stage and priority.", ("stage", "priority"))
+ADMISSION_SHED = Counter(
+    "admission_shed_total", "Calls rejected by admission control, by stage, priority and reason.",
+    ("stage", "priority", "reason"))
+UPSTREAM_REQUESTS = Counter(
+    "upstream_requests_total",
+    "Outbound HTTP attempts, by host and outcome (ok, retry, failover, error, circuit_open).", ("host", "outcome"))
+
+
+class RequestTimings:
+    """
+    Stage durations of one request. Repeated stages (e.g. batch items) are summed.
+    """
+
+    def __init__(self):
+        self._entries: Dict[str, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            entry = self._entries.setdefault(stage, [0.0, 0])
+            entry[0] += seconds
+            entry[1] += 1
+
+    def merge(self, other: "RequestTimings") -> None:
+        """
+        Adds the stages of other, e.g. of a run shared with other requests.
+        """
+        with other._lock:
+            entries = [(stage, seconds, count) for stage, (seconds, count) in other._entries.items()]
+        with self._lock:
+            for stage, seconds, count in entries:
+                entry = self._entries.setdefault(stage, [0.0, 0])
+                entry[0] += seconds
+                entry[1] += count
+
+    def server_timing(self) -> str:
+        """
+        Renders the timings as a Server-Timing header value, durations in milliseconds.
+        """
+        with self._lock:
+            parts = []
+            for stage, (seconds, count) in self._entries.items():
+                name = stage.replace(".", "_").replace(":", "_")
+                desc = f';desc="{count}x"' if count > 1 else ""
+                parts.append(f"{name};dur={seconds * 1000:.1f}{desc}")
+            return ", ".join(parts)
+
+
+_request_timings: contextvars.ContextVar[Optional[RequestTimings]] = contextvars.ContextVar(
+    "request_timings", default=None)
+
+
+def start_request() -> RequestTimings:
+    """
+    Installs a fresh RequestTimings for the current context and returns it.
+    """
+    timings = RequestTimings()
+    _request_timings.set(timings)
+    return timings
+
+
+def current_request_timings() -> Optional[RequestTimings]:
+    return _request_timings.get()
+
+
+def set_request_timings(timings: Optional[RequestTimings]) -> None:
+    """
+    Installs timings for the current context, e.g. those of a run shared by several requests.
+    """
+    _request_timings.set(timings)
+
+
+@contextmanager
+def timed(stage: str) -> Iterator[None]:
+    """
+    Times the enclosed block as a pipeline stage. Works in sync and async code.
+    """
+    if not PIPELINE_SETTINGS.telemetry_enabled:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(stage, time.perf_counter() - started)
+
+
+def record_stage(stage: str, seconds: float) -> None:
+    if not PIPELINE_SETTINGS.telemetry_enabled:
+        return
+    STAGE_SECONDS.observe(seconds, stage=stage)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings.record(stage, seconds)
+
+
+def record_search_provider(provider: str, outcome: str, seconds: float) -> None:
+    if not PIPELINE_SETTINGS.telemetry_enabled:
+        return
+    SEARCH_PROVIDER_SECONDS.observe(seconds, provider=provider, outcome=outcome)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings.record(f"search.{provider}", seconds)
+
+
+def record_upstream_request(host: str, outcome: str) -> None:
+    if not PIPELINE_SETTINGS.telemetry_enabled:
+        return
+    UPSTREAM_REQUESTS.inc(host=host, outcome=outcome)
+
+
+def record_admission_wait(stage: str, priority: str, seconds: float) -> None:
+    if not PIPELINE_SETTINGS.telemetry_enabled:
+        return
+    ADMISSION_WAIT_SECONDS.observe(seconds, stage=stage, priority=priority)
+    if seconds > 0:
+        record_stage(f"queue.{stage}", seconds)
+
+
+def record_admission_shed(stage: str, priority: str, reason: str) -> None:
+    if not PIPELINE_SETTINGS.telemetry_enabled:
+        return
+    ADMISSION_SHED.inc(stage=stage, priority=priority, reason=reason)
+
+
+def set_admission_queue_depth(stage: str, priority: str, depth: int) -> None:
+    if not PIPELINE_SETTINGS.telemetry_enabled:
+        return
+    ADMISSION_QUEUE_DEPTH.set(depth, stage=stage, priority=priority)
+
+
+def record_llm_response(model: str, response: Any, cached: bool = False) -> None:
+    """
+    Counts an LLM call and, for a fresh Ollama response (or final stream chunk), the token
+    counts and durations it reports.
+    """
+    if not PIPELINE_SETTINGS.telemetry_enabled:
+        return
+    LLM_CALLS.inc(model=model, cache="hit" if cached else "miss")
+    if cached:
+        return
+
+    for field, kind in (("prompt_eval_count", "prompt"), ("eval_count", "completion")):
+        count = _field(response, field)
+        if count:
+            LLM_TOKENS.inc(count, model=model, kind=kind)
+    for field, phase in (
+        ("load_duration", "load"),
+        ("prompt_eval_duration", "prompt_eval"),
+        ("eval_duration", "eval"),
+        ("total_duration", "total"),
+    ):
+        nanoseconds = _field(response, field)
+        if nanoseconds:
+            LLM_DURATION_SECONDS.observe(nanoseconds / 1e9, model=model, phase=phase)
+
+
+def render_metrics() -> str:
+    lines: List[str] = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+def _field(response: Any, name: str) -> Any:
+    # Both ollama's response models and plain dicts support .get().
+    getter = getattr(response, "get", None)
+    return getter(name) if getter is not None else None
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _number(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf"
+    return str(int(value)) if float(value).is_integer() else repr(value)
@@ -1,20 +1,228 @@
+"""
+Prompt templates from app/templates, loaded once and kept in memory.
+
+The first lookup reads every template into an immutable TemplateSet. Each Template is
+split once into its static text and {fields}, so render() only joins strings instead of
+parsing the format string on every call. static_prefix is the text before the first field,
+the part every rendered prompt starts with. prefix_hash identifies it in the debug log and
+in app.bench.prompt_eval reports, so a change to a call site's fixed instructions (which
+invalidates Ollama's KV cache of them) shows up there. Nothing keys a cache on it. Templates
+whose braces are not format fields (such as a literal JSON example) are used as plain text
+and cannot be rendered.
+
+reload_templates() swaps in a freshly loaded TemplateSet when a file in the directory has
+changed. Readers see either the old or the new set, never a mix. A file that cannot be
+read keeps its previous version. The server runs it every template_reload_interval_seconds
+(see run_template_watcher), so edits apply without restarting workers.
+"""
+
+import asyncio
+import hashlib
+import logging
 import os
+import string
+import threading
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Any, Dict, Mapping, Optional, Tuple
+
+from app.core.config import PIPELINE_SETTINGS
+
+logger = logging.getLogger(__name__)
+
+TEMPLATES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "templates")
+
+# (literal text, field name or None, conversion or None, format spec)
+Segment = Tuple[str, Optional[str], Optional[str], str]
+
+
+@dataclass(frozen=True)
+class Template:
+    """
+    A compiled template.
+
+    Attributes:
+        name: File name within app/templates. example: "llm_rerank_prompt.txt"
+        text: The file contents.
+        segments: The template split into literal text and fields; None if it is plain text.
+        static_prefix: Text before the first field, as rendered (escaped braces undoubled); the
+            whole text for plain text templates.
+        prefix_hash: Hex SHA-256 of static_prefix.
+    """
+    name: str
+    text: str
+    segments: Optional[Tuple[Segment, ...]]
+    static_prefix: str
+    prefix_hash: str
+
+    @classmethod
+    def compile(cls, name: str, text: str) -> "Template":
+        segments = _split(text)
+        static_prefix = text if segments is None else _static_prefix(segments)
+        return cls(
+            name=name,
+            text=text,
+            segments=segments,
+            static_prefix=static_prefix,
+            prefix_hash=hashlib.sha256(static_prefix.encode("utf-8")).hexdigest(),
+        )
+
+    @property
+    def has_fields(self) -> bool:
+        return self.segments is not None and any(field_name is not None for _, field_name, _, _ in self.segments)
+
+    def render(self, **values: Any) -> str:
+        """
+        Same result as text.format(**values).
+        """
+        if self.segments is None:
+            raise ValueError(f"Template {self.name} has no format fields to render.")
+        parts = []
+        for literal, field_name, conversion, spec in self.segments:
+            parts.append(literal)
+            if field_name is None:
+                continue
+            value = values[field_name]
+            if conversion == "r":
+                value = repr(value)
+            elif conversion == "s":
+                value = str(value)
+            elif conversion == "a":
+                value = ascii(value)
+            parts.append(value if type(value) is str and not spec else format(value, spec))
+        return "".join(parts)
+
+
+@dataclass(frozen=True)
+class TemplateSet:
+    templates: Mapping[str, Template]
+    # File name -> modification time, used to detect changes.
+    mtimes: Mapping[str, float]
+
+
+def get_template(filename: str) -> Template:
+    """
+    Returns a compiled template from the in-memory set.
+
+    Usage:
+        get_template("llm_rerank_prompt.txt").render(question_text=..., items_text=..., top_k=3)
+    """
+    template = _current_set().templates.get(filename)
+    if template is None:
+        raise FileNotFoundError(f"Template file not found: {os.path.join(TEMPLATES_DIR, filename)}")
+    return template
+
 
 def load_template(filename: str) -> str:
     """
-    Loads a template text file from the /templates folder.
+    Returns the text of a template from the in-memory set.
 
     Usage:
-        load_template("query_gen_prompt.txt")
+        load_template("llm_query_prompt.txt")
+    """
+    return get_template(filename).text
+
+
+def reload_templates() -> bool:
+    """
+    Loads the templates again if a file was added, changed or removed. Returns whether
+    the set was replaced.
     """
-    # Determine absolute path to the templates directory
-    base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    templates_dir = os.path.join(base_dir, "templates")
+    global _templates
+    with _reload_lock:
+        current = _templates
+        mtimes = _scan()
+        if current is not None and mtimes == dict(current.mtimes):
+            return False
+        _templates = _load(mtimes, current)
+    if current is not None:
+        logger.info("Reloaded templates from %s", TEMPLATES_DIR)
+    return True
+
+
+async def run_template_watcher(
+    interval_seconds: float = PIPELINE_SETTINGS.template_reload_interval_seconds,
+) -> None:
+    """
+    Checks the templates directory forever, every interval_seconds. Started by the server
+    on startup and cancelled on shutdown.
+    """
+    while True:
+        try:
+            await asyncio.to_thread(reload_templates)
+        except Exception as e:
+            logger.warning("Reloading templates failed: %s", e)
+        await asyncio.sleep(interval_seconds)
+
+
+_templates: Optional[TemplateSet] = None
+_reload_lock = threading.Lock()
 
-    full_path = os.path.join(templates_dir, filename)
 
-    if not os.path.exists(full_path):
-        raise FileNotFoundError(f"Template file not found: {full_path}")
+def _current_set() -> TemplateSet:
+    if _templates is None:
+        reload_templates()
+    return _templates
 
-    with open(full_path, "r", encoding="utf-8") as f:
-        return f.read()
+
+def _scan() -> Dict[str, float]:
+    mtimes = {}
+    for entry in os.scandir(TEMPLATES_DIR):
+        if entry.is_file():
+            mtimes[entry.name] = entry.stat().st_mtime
+    return mtimes
+
+
+def _load(mtimes: Dict[str, float], previous: Optional[TemplateSet]) -> TemplateSet:
+    templates: Dict[str, Template] = {}
+    loaded_mtimes: Dict[str, float] = {}
+    for name, mtime in mtimes.items():
+        old = previous.templates.get(name) if previous is not None else None
+        if old is not None and previous.mtimes.get(name) == mtime:
+            templates[name], loaded_mtimes[name] = old, mtime
+            continue
+        try:
+            with open(os.path.join(TEMPLATES_DIR, name), "r", encoding="utf-8") as f:
+                text = f.read()
+        except OSError as e:
+            if old is None:
+                raise
+            logger.warning("Keeping the previous version of template %s: %s", name, e)
+            templates[name], loaded_mtimes[name] = old, previous.mtimes[name]
+            continue
+        templates[name] = Template.compile(name, text)
+        loaded_mtimes[name] = mtime
+        logger.debug("Loaded template %s (prefix %s)", name, templates[name].prefix_hash[:12])
+    return TemplateSet(templates=MappingProxyType(templates), mtimes=MappingProxyType(loaded_mtimes))
+
+
+def _static_prefix(segments: Tuple[Segment, ...]) -> str:
+    """
+    The literal text up to the first field. Formatter.parse also splits the literal at every
+    escaped brace, so the prefix can span several segments.
+    """
+    literals = []
+    for literal, field_name, _, _ in segments:
+        literals.append(literal)
+        if field_name is not None:
+            break
+    return "".join(literals)
+
+
+def _split(text: str) -> Optional[Tuple[Segment, ...]]:
+    """
+    Splits a format string into segments, or returns None if it is not one whose fields
+    are all plain names.
+    """
+    try:
+        parsed = list(string.Formatter().parse(text))
+    except ValueError:
+        return None
+    segments = []
+    for literal, field_name, spec, conversion in parsed:
+        if field_name is not None and not field_name.isidentifier():
+            return None
+        segments.append((literal, field_name, conversion, spec or ""))
+    if not segments:
+        segments.append(("", None, None, ""))
+    return tuple(segments)
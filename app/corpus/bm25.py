@@ -0,0 +1,372 @@
+"""
+BM25 inverted index over Reddit posts, with incremental updates and mmap snapshots.
+
+Each shard holds a read-only base segment loaded from a snapshot and an in-memory delta
+segment for documents added since. Posting lists are parallel int32 arrays of document
+slots and term frequencies. Deletes are tombstones; save() compacts the base, the delta
+and the tombstones into a new snapshot.
+
+Snapshot layout of one shard directory:
+    meta.json                     k1, b and the document count
+    vocab.json                    term -> [start, length] into the postings arrays
+    postings.docs.npy / .tfs.npy  concatenated posting lists
+    doc_len.npy                   token count of each document
+    keys.bin / payloads.bin       document keys and JSON payloads as string columns
+
+BM25Index keeps one shard per subreddit when sharded, otherwise a single "_all" shard.
+
+Usage (build a snapshot from a corpus store):
+    python -m app.corpus.bm25 --corpus app/data/corpus --out app/data/bm25
+"""
+
+import argparse
+import json
+import math
+import os
+import shutil
+import threading
+from array import array
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.core.config import get_bm25_dir, get_corpus_dir
+from app.corpus.store import CorpusStore, StringColumn, StringColumnWriter
+from app.corpus.text import index_terms
+
+ALL_SHARD = "_all"
+
+
+class BM25Shard:
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+
+        self._base_vocab: Dict[str, Tuple[int, int]] = {}
+        self._base_docs = np.zeros(0, dtype=np.int32)
+        self._base_tfs = np.zeros(0, dtype=np.int32)
+        self._base_keys: Optional[StringColumn] = None
+        self._base_payloads: Optional[StringColumn] = None
+        self._base_count = 0
+
+        self._delta_postings: Dict[str, Tuple[array, array]] = {}
+        self._delta_keys: List[str] = []
+        self._delta_payloads: List[str] = []
+
+        self._doc_len = np.zeros(0, dtype=np.int32)
+        self._alive = np.zeros(0, dtype=bool)
+        self._slot_count = 0
+        self._slots_by_key: Optional[Dict[str, int]] = None
+
+        self.live_count = 0
+        self.total_len = 0
+
+    def add(self, key: str, text: str, payload: Dict[str, Any]) -> None:
+        """
+        Adds a document, replacing any document with the same key.
+        """
+        self.delete(key)
+        terms = Counter(index_terms(text))
+        slot = self._slot_count
+        self._grow(slot + 1)
+        self._slot_count += 1
+
+        for term, tf in terms.items():
+            postings = self._delta_postings.get(term)
+            if postings is None:
+                postings = self._delta_postings[term] = (array("i"), array("i"))
+            postings[0].append(slot)
+            postings[1].append(tf)
+
+        length = sum(terms.values())
+        self._doc_len[slot] = length
+        self._alive[slot] = True
+        self._delta_keys.append(key)
+        self._delta_payloads.append(json.dumps(payload))
+        self._keys()[key] = slot
+        self.live_count += 1
+        self.total_len += length
+
+    def delete(self, key: str) -> bool:
+        slot = self._keys().pop(key, None)
+        if slot is None:
+            return False
+        self._alive[slot] = False
+        self.live_count -= 1
+        self.total_len -= int(self._doc_len[slot])
+        return True
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._keys()
+
+    def search(self, query: str, k: int = 10) -> List[Tuple[Dict[str, Any], float]]:
+        """
+        Returns up to k (payload, score) pairs, best first.
+        """
+        if self.live_count == 0:
+            return []
+
+        avg_len = self.total_len / self.live_count
+        doc_parts = []
+        score_parts = []
+        for term in set(index_terms(query)):
+            docs, tfs = self._postings(term)
+            if docs.size == 0:
+                continue
+            alive = self._alive[docs]
+            docs, tfs = docs[alive], tfs[alive]
+            df = docs.size
+            if df == 0:
+                continue
+            idf = math.log(1 + (self.live_count - df + 0.5) / (df + 0.5))
+            norm = self.k1 * (1 - self.b + self.b * self._doc_len[docs] / avg_len)
+            doc_parts.append(docs)
+            score_parts.append(idf * tfs * (self.k1 + 1) / (tfs + norm))
+        if not doc_parts:
+            return []
+
+        unique_docs, inverse = np.unique(np.concatenate(doc_parts), return_inverse=True)
+        scores = np.bincount(inverse, weights=np.concatenate(score_parts))
+        if scores.size > k:
+            top = np.argpartition(-scores, k)[:k]
+            top = top[np.argsort(-scores[top], kind="stable")]
+        else:
+            top = np.argsort(-scores, kind="stable")
+        return [(self._payload(int(unique_docs[i])), float(scores[i])) for i in top]
+
+    def save(self, directory: str) -> None:
+        """
+        Writes a compacted snapshot. The directory is replaced atomically.
+        """
+        staging = directory.rstrip("/\\") + ".tmp"
+        shutil.rmtree(staging, ignore_errors=True)
+        os.makedirs(staging)
+
+        live_slots = np.flatnonzero(self._alive[: self._slot_count])
+        remap = np.full(self._slot_count, -1, dtype=np.int64)
+        remap[live_slots] = np.arange(live_slots.size)
+
+        vocab: Dict[str, List[int]] = {}
+        doc_parts, tf_parts = [], []
+        offset = 0
+        for term in sorted(set(self._base_vocab) | set(self._delta_postings)):
+            docs, tfs = self._postings(term)
+            keep = self._alive[docs]
+            docs, tfs = remap[docs[keep]], tfs[keep]
+            if docs.size == 0:
+                continue
+            vocab[term] = [offset, int(docs.size)]
+            offset += docs.size
+            doc_parts.append(docs.astype(np.int32))
+            tf_parts.append(tfs.astype(np.int32))
+
+        np.save(os.path.join(staging, "postings.docs.npy"),
+                np.concatenate(doc_parts) if doc_parts else np.zeros(0, dtype=np.int32))
+        np.save(os.path.join(staging, "postings.tfs.npy"),
+                np.concatenate(tf_parts) if tf_parts else np.zeros(0, dtype=np.int32))
+        np.save(os.path.join(staging, "doc_len.npy"), self._doc_len[live_slots])
+
+        keys = StringColumnWriter(staging, "keys")
+        payloads = StringColumnWriter(staging, "payloads")
+        for slot in live_slots:
+            keys.append(self._key(int(slot)))
+            payloads.append(self._payload_text(int(slot)))
+        keys.close()
+        payloads.close()
+
+        with open(os.path.join(staging, "vocab.json"), "w", encoding="utf-8") as f:
+            json.dump(vocab, f)
+        with open(os.path.join(staging, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump({"k1": self.k1, "b": self.b, "doc_count": int(live_slots.size)}, f)
+
+        retired = directory.rstrip("/\\") + ".old"
+        shutil.rmtree(retired, ignore_errors=True)
+        if os.path.exists(directory):
+            os.replace(directory, retired)
+        os.replace(staging, directory)
+        shutil.rmtree(retired, ignore_errors=True)
+
+    @classmethod
+    def load(cls, directory: str) -> "BM25Shard":
+        with open(os.path.join(directory, "meta.json"), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        with open(os.path.join(directory, "vocab.json"), "r", encoding="utf-8") as f:
+            vocab = json.load(f)
+
+        shard = cls(k1=meta["k1"], b=meta["b"])
+        shard._base_vocab = {term: (start, length) for term, (start, length) in vocab.items()}
+        shard._base_docs = np.load(os.path.join(directory, "postings.docs.npy"), mmap_mode="r")
+        shard._base_tfs = np.load(os.path.join(directory, "postings.tfs.npy"), mmap_mode="r")
+        shard._base_keys = StringColumn(directory, "keys")
+        shard._base_payloads = StringColumn(directory, "payloads")
+        shard._base_count = meta["doc_count"]
+
+        doc_len = np.load(os.path.join(directory, "doc_len.npy"))
+        shard._grow(shard._base_count)
+        shard._doc_len[: shard._base_count] = doc_len
+        shard._alive[: shard._base_count] = True
+        shard._slot_count = shard._base_count
+        shard.live_count = shard._base_count
+        shard.total_len = int(doc_len.sum())
+        return shard
+
+    def _postings(self, term: str) -> Tuple[np.ndarray, np.ndarray]:
+        base = self._base_vocab.get(term)
+        delta = self._delta_postings.get(term)
+        if base is not None:
+            start, length = base
+            base_docs = np.asarray(self._base_docs[start:start + length])
+            base_tfs = np.asarray(self._base_tfs[start:start + length])
+            if delta is None:
+                return base_docs, base_tfs
+            return (
+                np.concatenate([base_docs, np.frombuffer(delta[0], dtype=np.int32)]),
+                np.concatenate([base_tfs, np.frombuffer(delta[1], dtype=np.int32)]),
+            )
+        if delta is not None:
+            return np.frombuffer(delta[0], dtype=np.int32), np.frombuffer(delta[1], dtype=np.int32)
+        return np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.int32)
+
+    def _grow(self, needed: int) -> None:
+        capacity = self._doc_len.size
+        if needed <= capacity:
+            return
+        capacity = max(needed, capacity * 2, 64)
+        doc_len = np.zeros(capacity, dtype=np.int32)
+        alive = np.zeros(capacity, dtype=bool)
+        doc_len[: self._doc_len.size] = self._doc_len
+        alive[: self._alive.size] = self._alive
+        self._doc_len, self._alive = doc_len, alive
+
+    def _keys(self) -> Dict[str, int]:
+        if self._slots_by_key is None:
+            self._slots_by_key = {}
+            for slot in range(self._slot_count):
+                if self._alive[slot]:
+                    self._slots_by_key[self._key(slot)] = slot
+        return self._slots_by_key
+
+    def _key(self, slot: int) -> str:
+        if slot < self._base_count:
+            return self._base_keys[slot]
+        return self._delta_keys[slot - self._base_count]
+
+    def _payload_text(self, slot: int) -> str:
+        if slot < self._base_count:
+            return self._base_payloads[slot]
+        return self._delta_payloads[slot - self._base_count]
+
+    def _payload(self, slot: int) -> Dict[str, Any]:
+        return json.loads(self._payload_text(slot))
+
+
+class BM25Index:
+    """
+    A set of BM25 shards keyed by subreddit (or a single shard when not sharded).
+    All public methods are thread-safe.
+    """
+
+    def __init__(self, sharded: bool = True):
+        self.sharded = sharded
+        self.shards: Dict[str, BM25Shard] = {}
+        self._lock = threading.RLock()
+
+    def add(self, key: str, subreddit: str, text: str, payload: Dict[str, Any]) -> None:
+        name = self._shard_name(subreddit)
+        with self._lock:
+            for other_name, shard in self.shards.items():
+                if other_name != name:
+                    shard.delete(key)
+            self.shards.setdefault(name, BM25Shard()).add(key, text, payload)
+
+    def delete(self, key: str) -> bool:
+        with self._lock:
+            return any([shard.delete(key) for shard in self.shards.values()])
+
+    def search(
+        self,
+        query: str,
+        k: int = 10,
+        subreddit: Optional[str] = None,
+    ) -> List[Tuple[Dict[str, Any], float]]:
+        """
+        Searches the subreddit's shard when there is one, otherwise every shard.
+        """
+        with self._lock:
+            shard = self.shards.get(self._shard_name(subreddit)) if subreddit else None
+            if shard is not None:
+                return shard.search(query, k)
+
+            merged: List[Tuple[Dict[str, Any], float]] = []
+            for shard in self.shards.values():
+                merged.extend(shard.search(query, k))
+            merged.sort(key=lambda pair: pair[1], reverse=True)
+            return merged[:k]
+
+    def __len__(self) -> int:
+        return sum(shard.live_count for shard in self.shards.values())
+
+    def save(self, directory: str) -> None:
+        with self._lock:
+            os.makedirs(directory, exist_ok=True)
+            for name, shard in self.shards.items():
+                shard.save(os.path.join(directory, name))
+            with open(os.path.join(directory, "shards.json"), "w", encoding="utf-8") as f:
+                json.dump({"sharded": self.sharded, "shards": sorted(self.shards)}, f)
+
+    @classmethod
+    def load(cls, directory: str) -> "BM25Index":
+        with open(os.path.join(directory, "shards.json"), "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        index = cls(sharded=manifest["sharded"])
+        for name in manifest["shards"]:
+            index.shards[name] = BM25Shard.load(os.path.join(directory, name))
+        return index
+
+    def _shard_name(self, subreddit: Optional[str]) -> str:
+        if not self.sharded:
+            return ALL_SHARD
+        return (subreddit or "").strip().lower() or ALL_SHARD
+
+
+def build_from_corpus(store: CorpusStore, sharded: bool = True) -> BM25Index:
+    """
+    Indexes every post of a corpus store: title, selftext and kept top comments.
+    """
+    index = BM25Index(sharded=sharded)
+    for row in range(len(store)):
+        post = store.post(row)
+        comments = store.top_comments(row)
+        text = "\n".join([post["title"], post["selftext"]] + [c["body"] for c in comments])
+        index.add(post["fullname"], post["subreddit"], text, corpus_payload(post, comments))
+    return index
+
+
+def corpus_payload(post: Dict[str, Any], comments: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    What a search hit returns: enough to build a PerSourceResult without the corpus store.
+    """
+    return {
+        "fullname": post["fullname"],
+        "title": post["title"],
+        "url": post["url"],
+        "selftext": post["selftext"][:1000],
+        "comments": comments,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", default=get_corpus_dir(), help="Corpus store built by app.corpus.ingest.")
+    parser.add_argument("--out", default=get_bm25_dir(), help="Output directory for the BM25 snapshot.")
+    parser.add_argument("--no-shards", action="store_true", help="Build a single shard instead of one per subreddit.")
+    args = parser.parse_args(argv)
+
+    index = build_from_corpus(CorpusStore(args.corpus), sharded=not args.no_shards)
+    index.save(args.out)
+    print(f"Indexed {len(index)} posts in {len(index.shards)} shards to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
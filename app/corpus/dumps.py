@@ -0,0 +1,43 @@
+"""
+Streams records from ArcticShift / Pushshift style dumps one line at a time.
+
+Supported files are newline-delimited JSON, plain (.ndjson, .jsonl, .json) or compressed
+with zstandard (.zst). Nothing is loaded into memory beyond the current line.
+"""
+
+import io
+import json
+from typing import Any, Dict, Iterator
+
+# Pushshift dumps are compressed with a long window and need a matching decoder limit.
+ZSTD_MAX_WINDOW_SIZE = 2 ** 31
+
+
+def iter_dump_records(path: str) -> Iterator[Dict[str, Any]]:
+    """
+    Yields each JSON object in the dump. Blank and malformed lines are skipped.
+    """
+    with _open_text(path) as lines:
+        for line in lines:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if isinstance(record, dict):
+                yield record
+
+
+def _open_text(path: str) -> io.TextIOBase:
+    if path.endswith(".zst"):
+        # Only needed for compressed dumps, so the API server does not require it.
+        import zstandard
+
+        raw = open(path, "rb")
+        decompressor = zstandard.ZstdDecompressor(max_window_size=ZSTD_MAX_WINDOW_SIZE)
+        reader = decompressor.stream_reader(raw, closefd=True)
+        return io.TextIOWrapper(reader, encoding="utf-8", errors="replace")
+
+    return open(path, "r", encoding="utf-8", errors="replace")
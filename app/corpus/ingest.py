@@ -0,0 +1,87 @@
+"""
+Builds a local corpus store from ArcticShift / Pushshift style dumps.
+
+Usage:
+    python -m app.corpus.ingest --submissions RS_seattle.zst --comments RC_seattle.zst \
+        --subreddit seattle --out app/data/corpus
+
+Submission files are read before comment files, one line at a time. The output directory
+is replaced only once the new store has been fully written.
+"""
+
+import argparse
+import os
+import shutil
+import time
+from typing import Iterable, List, Optional
+
+from app.core.config import get_corpus_dir
+from app.corpus.dumps import iter_dump_records
+from app.corpus.store import CorpusWriter
+
+
+def ingest(
+    submissions: Iterable[str],
+    comments: Iterable[str],
+    out_dir: str,
+    subreddits: Optional[List[str]] = None,
+    top_comments: int = 5,
+    progress_every: int = 100_000,
+) -> dict:
+    """
+    Streams the dump files into a new store at out_dir and returns its manifest.
+    """
+    staging_dir = out_dir.rstrip("/\\") + ".tmp"
+    shutil.rmtree(staging_dir, ignore_errors=True)
+    writer = CorpusWriter(staging_dir, subreddits=subreddits, top_comments=top_comments)
+
+    started = time.monotonic()
+    for path in submissions:
+        seen = kept = 0
+        for record in iter_dump_records(path):
+            seen += 1
+            if writer.add_post(record) is not None:
+                kept += 1
+            if seen % progress_every == 0:
+                print(f"{path}: {seen} submissions read, {kept} kept")
+        print(f"{path}: {seen} submissions read, {kept} kept")
+
+    for path in comments:
+        seen = kept = 0
+        for record in iter_dump_records(path):
+            seen += 1
+            if writer.add_comment(record):
+                kept += 1
+            if seen % progress_every == 0:
+                print(f"{path}: {seen} comments read, {kept} kept so far")
+        print(f"{path}: {seen} comments read, {kept} kept so far")
+
+    manifest = writer.close()
+
+    shutil.rmtree(out_dir, ignore_errors=True)
+    os.replace(staging_dir, out_dir)
+    print(
+        f"Wrote {manifest['post_count']} posts and {manifest['comment_count']} comments "
+        f"to {out_dir} in {time.monotonic() - started:.1f}s"
+    )
+    return manifest
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--submissions", nargs="*", default=[], help="Submission dump files (.ndjson or .zst).")
+    parser.add_argument("--comments", nargs="*", default=[], help="Comment dump files (.ndjson or .zst).")
+    parser.add_argument("--subreddit", action="append", dest="subreddits",
+                        help="Keep only this subreddit. Repeat for several. Default keeps all.")
+    parser.add_argument("--top-comments", type=int, default=5, help="Top-level comments kept per post.")
+    parser.add_argument("--out", default=get_corpus_dir(), help="Output directory for the store.")
+    args = parser.parse_args(argv)
+
+    if not args.submissions:
+        parser.error("at least one --submissions file is required")
+
+    ingest(args.submissions, args.comments, args.out, args.subreddits, args.top_comments)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Inverted keyword index over the titles and selftexts of a corpus store.
+
+Files written next to the store columns:
+    keywords.vocab.json    term -> [start, length] into the postings array
+    keywords.postings.npy  int32 post rows, grouped by term and ascending within a term
+
+Matches are ranked by the summed inverse document frequency of the query terms they contain.
+"""
+
+import json
+import math
+import os
+from array import array
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.corpus.text import index_terms
+
+
+class KeywordIndexWriter:
+    def __init__(self):
+        self._postings: Dict[str, array] = {}
+
+    def add(self, row: int, text: str) -> None:
+        for term in set(index_terms(text)):
+            postings = self._postings.get(term)
+            if postings is None:
+                postings = self._postings[term] = array("i")
+            postings.append(row)
+
+    def save(self, directory: str) -> None:
+        vocab: Dict[str, List[int]] = {}
+        flat = array("i")
+        for term in sorted(self._postings):
+            postings = self._postings[term]
+            vocab[term] = [len(flat), len(postings)]
+            flat.extend(postings)
+
+        np.save(os.path.join(directory, "keywords.postings.npy"), np.asarray(flat, dtype=np.int32))
+        with open(os.path.join(directory, "keywords.vocab.json"), "w", encoding="utf-8") as f:
+            json.dump(vocab, f)
+
+
+class KeywordIndex:
+    def __init__(self, directory: str, document_count: int):
+        with open(os.path.join(directory, "keywords.vocab.json"), "r", encoding="utf-8") as f:
+            self._vocab: Dict[str, List[int]] = json.load(f)
+        self._postings = np.load(os.path.join(directory, "keywords.postings.npy"), mmap_mode="r")
+        self.document_count = document_count
+
+    def document_frequency(self, term: str, mask: Optional[np.ndarray] = None) -> int:
+        """
+        Number of posts containing term, counting only rows in mask when one is given.
+        """
+        entry = self._vocab.get(term)
+        if entry is None:
+            return 0
+        start, length = entry
+        if mask is None:
+            return length
+        return int(np.count_nonzero(mask[np.asarray(self._postings[start:start + length])]))
+
+    def search(
+        self,
+        query: str,
+        k: int = 10,
+        mask: Optional[np.ndarray] = None,
+    ) -> List[Tuple[int, float]]:
+        """
+        Returns up to k (row, score) pairs, best first. A boolean mask restricts the rows.
+        """
+        rows_per_term = []
+        weights = []
+        for term in set(index_terms(query)):
+            entry = self._vocab.get(term)
+            if entry is None:
+                continue
+            start, length = entry
+            rows_per_term.append(np.asarray(self._postings[start:start + length]))
+            weights.append(math.log(1 + self.document_count / length))
+        if not rows_per_term:
+            return []
+
+        rows = np.concatenate(rows_per_term)
+        row_weights = np.concatenate([np.full(len(r), w) for r, w in zip(rows_per_term, weights)])
+        if mask is not None:
+            keep = mask[rows]
+            rows, row_weights = rows[keep], row_weights[keep]
+            if rows.size == 0:
+                return []
+
+        unique_rows, inverse = np.unique(rows, return_inverse=True)
+        scores = np.bincount(inverse, weights=row_weights)
+        order = np.argsort(-scores, kind="stable")[:k]
+        return [(int(unique_rows[i]), float(scores[i])) for i in order]
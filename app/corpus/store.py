@@ -0,0 +1,275 @@
+"""
+Compact columnar store of Reddit submissions and their top comments.
+
+Each column is its own file in the store directory so readers can memory-map only what
+they touch:
+    posts.<name>.npy                 fixed-width numeric columns
+    posts.<name>.bin / .offsets.npy  variable-width UTF-8 string columns
+    posts.comment_offsets.npy        range of each post's rows in the comment columns
+    comments.<name>...               the same layout for the kept comments
+    subreddits.json                  subreddit names indexed by posts.subreddit_code
+    manifest.json                    row counts and format version
+
+Only the top N top-level comments of each post are kept, ordered best score first.
+"""
+
+import heapq
+import json
+import os
+from array import array
+from typing import Any, BinaryIO, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from app.corpus.keyword_index import KeywordIndexWriter
+
+FORMAT_VERSION = 1
+DELETED_BODIES = ("", "[deleted]", "[removed]")
+
+
+class StringColumnWriter:
+    def __init__(self, directory: str, name: str):
+        self._path = os.path.join(directory, name)
+        self._file: BinaryIO = open(self._path + ".bin", "wb")
+        self._offsets = array("q", [0])
+
+    def append(self, value: str) -> None:
+        data = value.encode("utf-8")
+        self._file.write(data)
+        self._offsets.append(self._offsets[-1] + len(data))
+
+    def close(self) -> None:
+        self._file.close()
+        np.save(self._path + ".offsets.npy", np.frombuffer(self._offsets, dtype=np.int64))
+
+
+class StringColumn:
+    def __init__(self, directory: str, name: str):
+        path = os.path.join(directory, name)
+        self._offsets = np.load(path + ".offsets.npy", mmap_mode="r")
+        if os.path.getsize(path + ".bin") > 0:
+            self._data = np.memmap(path + ".bin", dtype=np.uint8, mode="r")
+        else:
+            self._data = np.zeros(0, dtype=np.uint8)
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, index: int) -> str:
+        start, end = int(self._offsets[index]), int(self._offsets[index + 1])
+        return self._data[start:end].tobytes().decode("utf-8", errors="replace")
+
+
+class CorpusWriter:
+    """
+    Builds a store from streamed submission and comment records.
+
+    Submissions must be added before the comments that belong to them. Comment bodies
+    are held in a bounded heap per post until close() writes the comment columns.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        subreddits: Optional[Iterable[str]] = None,
+        top_comments: int = 5,
+    ):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.subreddits = {s.lower() for s in subreddits} if subreddits else None
+        self.top_comments = top_comments
+
+        self._post_ids: Dict[str, int] = {}
+        self._subreddit_codes: Dict[str, int] = {}
+        self._strings = {
+            name: StringColumnWriter(directory, f"posts.{name}")
+            for name in ("id", "title", "selftext", "permalink")
+        }
+        self._created = array("q")
+        self._score = array("i")
+        self._subreddit = array("i")
+        self._comments: Dict[int, List[Tuple[int, int, str, int]]] = {}
+        self._comment_seq = 0
+        self._keywords = KeywordIndexWriter()
+
+    def add_post(self, record: Dict[str, Any]) -> Optional[int]:
+        """
+        Adds a submission and returns its row, or None if it is filtered out or a duplicate.
+        """
+        post_id = record.get("id")
+        subreddit = (record.get("subreddit") or "").lower()
+        if not post_id or post_id in self._post_ids:
+            return None
+        if self.subreddits is not None and subreddit not in self.subreddits:
+            return None
+
+        row = len(self._post_ids)
+        self._post_ids[post_id] = row
+
+        title = record.get("title") or ""
+        selftext = record.get("selftext") or ""
+        if selftext in DELETED_BODIES:
+            selftext = ""
+
+        self._strings["id"].append(post_id)
+        self._strings["title"].append(title)
+        self._strings["selftext"].append(selftext)
+        self._strings["permalink"].append(record.get("permalink") or "")
+        self._created.append(int(record.get("created_utc") or 0))
+        self._score.append(int(record.get("score") or 0))
+        self._subreddit.append(self._subreddit_codes.setdefault(subreddit, len(self._subreddit_codes)))
+        self._keywords.add(row, f"{title}\n{selftext}")
+        return row
+
+    def add_comment(self, record: Dict[str, Any]) -> bool:
+        """
+        Offers a comment; keeps it only if it is a live top-level comment of a stored post
+        and among the best scored so far for that post.
+        """
+        link_id = record.get("link_id") or ""
+        if not link_id.startswith("t3_") or record.get("parent_id") != link_id:
+            return False
+        row = self._post_ids.get(link_id[3:])
+        if row is None:
+            return False
+        body = (record.get("body") or "").strip()
+        if body in DELETED_BODIES:
+            return False
+
+        heap = self._comments.setdefault(row, [])
+        self._comment_seq += 1
+        entry = (int(record.get("score") or 0), -self._comment_seq, body, int(record.get("created_utc") or 0))
+        if len(heap) < self.top_comments:
+            heapq.heappush(heap, entry)
+            return True
+        if entry > heap[0]:
+            heapq.heapreplace(heap, entry)
+            return True
+        return False
+
+    def close(self) -> Dict[str, Any]:
+        for column in self._strings.values():
+            column.close()
+        post_count = len(self._post_ids)
+        self._save("posts.created_utc", self._created, np.int64)
+        self._save("posts.score", self._score, np.int32)
+        self._save("posts.subreddit_code", self._subreddit, np.int32)
+
+        comment_bodies = StringColumnWriter(self.directory, "comments.body")
+        comment_scores = array("i")
+        comment_created = array("q")
+        offsets = array("q", [0])
+        for row in range(post_count):
+            kept = sorted(self._comments.get(row, ()), reverse=True)
+            for score, _, body, created in kept:
+                comment_bodies.append(body)
+                comment_scores.append(score)
+                comment_created.append(created)
+            offsets.append(offsets[-1] + len(kept))
+        comment_bodies.close()
+        self._save("comments.score", comment_scores, np.int32)
+        self._save("comments.created_utc", comment_created, np.int64)
+        self._save("posts.comment_offsets", offsets, np.int64)
+
+        subreddits = sorted(self._subreddit_codes, key=self._subreddit_codes.get)
+        with open(os.path.join(self.directory, "subreddits.json"), "w", encoding="utf-8") as f:
+            json.dump(subreddits, f)
+
+        self._keywords.save(self.directory)
+
+        manifest = {
+            "version": FORMAT_VERSION,
+            "post_count": post_count,
+            "comment_count": len(comment_scores),
+        }
+        with open(os.path.join(self.directory, "manifest.json"), "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+        return manifest
+
+    def _save(self, name: str, values: array, dtype: Any) -> None:
+        np.save(os.path.join(self.directory, f"{name}.npy"), np.asarray(values, dtype=dtype))
+
+
+class CorpusStore:
+    """
+    Read-only view of a store built by CorpusWriter. Columns are memory-mapped.
+    """
+
+    def __init__(self, directory: str):
+        with open(os.path.join(directory, "manifest.json"), "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        if manifest.get("version") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported corpus format version: {manifest.get('version')}")
+        with open(os.path.join(directory, "subreddits.json"), "r", encoding="utf-8") as f:
+            self.subreddits: List[str] = json.load(f)
+
+        self.directory = directory
+        self.post_count: int = manifest["post_count"]
+        self._ids = StringColumn(directory, "posts.id")
+        self._titles = StringColumn(directory, "posts.title")
+        self._selftexts = StringColumn(directory, "posts.selftext")
+        self._permalinks = StringColumn(directory, "posts.permalink")
+        self.created_utc = self._load("posts.created_utc")
+        self.score = self._load("posts.score")
+        self.subreddit_code = self._load("posts.subreddit_code")
+        self._comment_offsets = self._load("posts.comment_offsets")
+        self._comment_bodies = StringColumn(directory, "comments.body")
+        self._comment_scores = self._load("comments.score")
+        self._comment_created = self._load("comments.created_utc")
+        self._rows_by_id: Optional[Dict[str, int]] = None
+
+    def __len__(self) -> int:
+        return self.post_count
+
+    def post(self, row: int) -> Dict[str, Any]:
+        post_id = self._ids[row]
+        permalink = self._permalinks[row]
+        return {
+            "id": post_id,
+            "fullname": f"t3_{post_id}",
+            "subreddit": self.subreddits[int(self.subreddit_code[row])],
+            "title": self._titles[row],
+            "selftext": self._selftexts[row],
+            "url": f"https://www.reddit.com{permalink}" if permalink else f"https://redd.it/{post_id}",
+            "created_utc": int(self.created_utc[row]),
+            "score": int(self.score[row]),
+        }
+
+    def top_comments(self, row: int) -> List[Dict[str, Any]]:
+        """
+        The kept top-level comments of a post, best first, in the shape build_comments_block reads.
+        """
+        fullname = f"t3_{self._ids[row]}"
+        start, end = int(self._comment_offsets[row]), int(self._comment_offsets[row + 1])
+        return [
+            {
+                "parent_id": fullname,
+                "body": self._comment_bodies[i],
+                "score": int(self._comment_scores[i]),
+                "created_utc": int(self._comment_created[i]),
+            }
+            for i in range(start, end)
+        ]
+
+    def find(self, post_id: str) -> Optional[int]:
+        """
+        Returns the row of a post by base36 id (with or without the t3_ prefix).
+        """
+        if self._rows_by_id is None:
+            self._rows_by_id = {self._ids[row]: row for row in range(self.post_count)}
+        if post_id.startswith("t3_"):
+            post_id = post_id[3:]
+        return self._rows_by_id.get(post_id)
+
+    def subreddit_mask(self, subreddit: str) -> Optional[np.ndarray]:
+        """
+        Boolean mask of posts in a subreddit, or None if the subreddit is not in the store.
+        """
+        try:
+            code = self.subreddits.index(subreddit.lower())
+        except ValueError:
+            return None
+        return np.asarray(self.subreddit_code) == code
+
+    def _load(self, name: str) -> np.ndarray:
+        return np.load(os.path.join(self.directory, f"{name}.npy"), mmap_mode="r")
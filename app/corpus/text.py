@@ -0,0 +1,58 @@
+"""
+Text normalization shared by the local corpus, its indexes and lexical query generation.
+"""
+
+import re
+from typing import List
+
+_TOKEN = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+_CLAUSE_BREAK = re.compile(r"[.,;:!?()\[\]\"\n]+")
+
+STOPWORDS = frozenset("""
+a about above after again against all am an and any are aren't as at be because been
+before being below between both but by can can't cannot could couldn't did didn't do does
+doesn't doing don't down during each few for from further get got had hadn't has hasn't
+have haven't having he he'd he'll he's her here here's hers herself him himself his how
+how's i i'd i'll i'm i've if in into is isn't it it's its itself just know let's like me
+more most mustn't my myself need no nor not of off on once only or other ought our ours
+ourselves out over own really same shan't she she'd she'll she's should shouldn't so some
+such than that that's the their theirs them themselves then there there's these they
+they'd they'll they're they've this those through to too under until up very want was
+wasn't we we'd we'll we're we've were weren't what what's when when's where where's which
+while who who's whom why why's will with won't would wouldn't you you'd you'll you're
+you've your yours yourself yourselves anyone anybody anything someone something thanks
+thank please help question guys hi hello
+""".split())
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lowercases text and returns its word tokens, including stopwords.
+    """
+    return _TOKEN.findall(text.lower())
+
+
+def index_terms(text: str) -> List[str]:
+    """
+    Tokens worth indexing: no stopwords, no single characters.
+    """
+    return [t for t in tokenize(text) if len(t) > 1 and t not in STOPWORDS]
+
+
+def phrase_candidates(text: str, max_words: int = 3) -> List[List[str]]:
+    """
+    Splits text into runs of content words, breaking at punctuation and stopwords. This
+    approximates noun phrases without a tagger: "cheap parking by the stadium?" gives
+    ["cheap", "parking"] and ["stadium"]. Runs longer than max_words are split.
+    """
+    phrases: List[List[str]] = []
+    for clause in _CLAUSE_BREAK.split(text.lower()):
+        run: List[str] = []
+        for token in _TOKEN.findall(clause) + [""]:
+            if token and len(token) > 1 and token not in STOPWORDS:
+                run.append(token)
+                continue
+            for start in range(0, len(run), max_words):
+                phrases.append(run[start:start + max_words])
+            run = []
+    return phrases
@@ -4,15 +4,45 @@ Main application entry point for the QA Retrieval Service.
 Defines API endpoints for health checks, query generation, and searching with queries.
 """
 
-from typing import List
+import asyncio
+import json
+import logging
+import time
+from contextlib import aclosing
+from typing import Any, AsyncIterator, Dict, List, Optional
 
-from fastapi import FastAPI
+import anyio
+import numpy as np
+
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import (JSONResponse, PlainTextResponse,
+                               StreamingResponse)
+from pydantic import ValidationError
+
+from app.core.admission import Overloaded, priority_for_request, set_priority
+from app.core.config import PIPELINE_SETTINGS
+from app.core.http_client import close_http_clients
+from app.core.log import configure_logging
+from app.core.models import (AggregatedAnswer, PerSourceResult,
+                             ProviderChoice, ProviderSelection, QuestionInput)
+from app.core.telemetry import (HTTP_REQUEST_SECONDS, render_metrics,
+                                start_request, timed)
+from app.core.template_loader import run_template_watcher
+from app.providers.registry import readiness, warm_up_providers
+from app.services.batch import stream_batch
+from app.services.history import record_answer_async
+from app.services.pipeline import (generate_queries_and_search,
+                                   question_dict, run_search_pipeline,
+                                   run_summary_pipeline, summary_choice)
+from app.services.query import generate_queries_async
+from app.services.semantic_cache import (lookup_cached_summary,
+                                         store_cached_summary)
+from app.services.summary import generate_summary_stream
 
-from app.core.models import AggregatedAnswer, PerSourceResult, QuestionInput
-from app.services.query import generate_queries
-from app.services.search import search_across_providers
-from app.services.summary import generate_summary
+configure_logging()
+logger = logging.getLogger(__name__)
 
 app = FastAPI(
     title="Reddit Duplicate Question Service",
@@ -26,57 +56,283 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing", "Retry-After"],
 )
 
 
+_background_tasks: List["asyncio.Task[None]"] = []
+
+
+@app.on_event("startup")
+async def start_background_tasks() -> None:
+    """
+    Warms up the providers and starts the Ollama health checks and the template watcher
+    without delaying startup.
+    """
+    if PIPELINE_SETTINGS.provider_warm_up:
+        _background_tasks.append(asyncio.create_task(warm_up_providers()))
+    if PIPELINE_SETTINGS.ollama_health_interval_seconds > 0:
+        # Imported here so importing the app does not import ollama.
+        from app.providers.llm.ollama_pool import run_health_checks
+        _background_tasks.append(asyncio.create_task(run_health_checks()))
+    if PIPELINE_SETTINGS.template_reload_interval_seconds > 0:
+        _background_tasks.append(asyncio.create_task(run_template_watcher()))
+
+
+@app.on_event("shutdown")
+async def close_upstream_clients() -> None:
+    for task in _background_tasks:
+        task.cancel()
+    await close_http_clients()
+
+
+@app.exception_handler(Overloaded)
+async def overloaded_handler(request: Request, exc: Overloaded) -> JSONResponse:
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
+@app.middleware("http")
+async def priority_middleware(request: Request, call_next):
+    """
+    Sets the admission priority of the request's LLM calls from X-Priority or the path.
+    """
+    set_priority(priority_for_request(request.url.path, request.headers.get("x-priority")))
+    return await call_next(request)
+
+
+@app.middleware("http")
+async def timing_middleware(request: Request, call_next):
+    """
+    Collects stage timings for the request and returns them in a Server-Timing header.
+    Streaming responses report the stages that finished before the first byte.
+    """
+    if not PIPELINE_SETTINGS.telemetry_enabled or request.url.path == "/metrics":
+        return await call_next(request)
+
+    timings = start_request()
+    started = time.perf_counter()
+    response = await call_next(request)
+    elapsed = time.perf_counter() - started
+
+    timings.record("total", elapsed)
+    HTTP_REQUEST_SECONDS.observe(elapsed, path=request.url.path, status=str(response.status_code))
+    response.headers["Server-Timing"] = timings.server_timing()
+    return response
+
+
 @app.get("/health")
-def health_check():
-    return {"status": "ok"}
+async def health_check():
+    """
+    Liveness: the process is serving requests. "ready" mirrors /health/ready.
+    """
+    return {"status": "ok", "ready": readiness()["ready"]}
+
+
+@app.get("/health/ready")
+async def readiness_check() -> JSONResponse:
+    """
+    Readiness: 200 once the providers are built and warmed up and every Ollama pool has
+    an endpoint that is up, otherwise 503. The body lists the state of each.
+    """
+    state = readiness()
+    return JSONResponse(status_code=200 if state["ready"] else 503, content=state)
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics() -> PlainTextResponse:
+    """
+    Stage latencies, search provider latencies, upstream request outcomes and Ollama token
+    usage in Prometheus text format.
+    """
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
 
 
 @app.post("/generate_queries")
-def generate_queries_endpoint(question: QuestionInput):
-    queries = generate_queries(question)
-    print("Generated queries:", queries)
+async def generate_queries_endpoint(question: QuestionInput, request: Request):
+    question = _with_header_selection(question, request)
+    with timed("query"):
+        queries = await generate_queries_async(question)
+    logger.info("Generated queries: %s", queries)
     return queries
 
 
 @app.post("/generate_search", response_model=List[PerSourceResult])
-def generate_search_endpoint(question: QuestionInput) -> List[PerSourceResult]:
-    queries = generate_queries(question)
-    print("Generated queries:", queries)
+async def generate_search_endpoint(question: QuestionInput, request: Request) -> List[PerSourceResult]:
+    return await run_search_pipeline(_with_header_selection(question, request))
 
-    per_source_results: List[PerSourceResult] = search_across_providers(
-        question,
-        queries.get("keyword_query", ""),
-    )
-    print("Returning search results:", len(per_source_results))
 
-    return per_source_results
+@app.post("/generate_summary", response_model=AggregatedAnswer)
+async def generate_summary_endpoint(question: QuestionInput, request: Request) -> AggregatedAnswer:
+    return await run_summary_pipeline(_with_header_selection(question, request))
 
 
-@app.post("/generate_summary", response_model=AggregatedAnswer)
-def generate_summary_endpoint(question: QuestionInput) -> AggregatedAnswer:
+@app.post("/generate_search/batch")
+async def generate_search_batch_endpoint(
+    questions: List[QuestionInput],
+    request: Request,
+    max_concurrency: Optional[int] = Query(default=None, ge=1),
+) -> StreamingResponse:
+    """
+    Runs /generate_search for every question and streams one NDJSON BatchItemResult per
+    question as it completes. Duplicate questions share a single run.
+    """
+    _check_batch_size(questions)
+    questions = [_with_header_selection(q, request) for q in questions]
+    return StreamingResponse(
+        stream_batch(questions, run_search_pipeline, max_concurrency),
+        media_type="application/x-ndjson",
+    )
 
-    queries = generate_queries(question)
-    print("Generated queries:", queries)
 
-    # Whatever this returns, ensure it is List[PerSourceResult]
-    per_source_results: List[PerSourceResult] = search_across_providers(
-        question,
-        queries.get("keyword_query", ""),
+@app.post("/generate_summary/batch")
+async def generate_summary_batch_endpoint(
+    questions: List[QuestionInput],
+    request: Request,
+    max_concurrency: Optional[int] = Query(default=None, ge=1),
+) -> StreamingResponse:
+    """
+    Runs /generate_summary for every question and streams one NDJSON BatchItemResult per
+    question as it completes. Duplicate questions share a single run.
+    """
+    _check_batch_size(questions)
+    questions = [_with_header_selection(q, request) for q in questions]
+    return StreamingResponse(
+        stream_batch(questions, run_summary_pipeline, max_concurrency),
+        media_type="application/x-ndjson",
     )
-    print("Returning search results:", len(per_source_results))
-
-    question_dict = {
-        "title": question.title,
-        "body": question.body,
-    }
-    aggregated: AggregatedAnswer = generate_summary(
-        question=question_dict,
-        queries=queries,
-        per_source_results=per_source_results,
+
+
+@app.post("/generate_summary/stream")
+async def generate_summary_stream_endpoint(question: QuestionInput, request: Request) -> StreamingResponse:
+    """
+    Server-Sent Events version of /generate_summary.
+
+    The semantic cache lookup, query generation and search run before the response
+    starts, so a request shed by admission control in them gets a 429 or 503 with
+    Retry-After, like /generate_summary. Then events, in order:
+      - queries: the queries used for search
+      - sources: the PerSourceResult list
+      - token: {"text": ...} for each piece of the summary as Ollama generates it
+      - done: the complete AggregatedAnswer
+    An error event {"detail": ...} ends the stream early if the summary fails; when its
+    call was shed by admission control it also carries "status" and "retry_after".
+    """
+    question = _with_header_selection(question, request)
+    with timed("semantic_cache"):
+        cached, question_vector = await lookup_cached_summary(question)
+    if cached is not None:
+        events = _cached_summary_events(cached)
+    else:
+        queries, per_source_results = await generate_queries_and_search(question)
+        events = _summary_events(question, question_vector, queries, per_source_results)
+    return _ClosingStreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
-    print("Returning aggregated answer:", aggregated)
 
-    return aggregated
+
+class _ClosingStreamingResponse(StreamingResponse):
+    """
+    Closes its event generator when the stream ends, also when the client disconnects,
+    so the summary's admission slot and Ollama stream are released at once.
+    """
+
+    async def stream_response(self, send) -> None:
+        try:
+            await super().stream_response(send)
+        finally:
+            with anyio.CancelScope(shield=True):
+                await self.body_iterator.aclose()
+
+
+async def _cached_summary_events(cached: AggregatedAnswer) -> AsyncIterator[str]:
+    yield _sse("sources", [r.model_dump(mode="json") for r in cached.per_source_results])
+    yield _sse("token", {"text": cached.final_summary})
+    yield _sse("done", cached.model_dump(mode="json"))
+
+
+async def _summary_events(
+    question: QuestionInput,
+    question_vector: Optional[np.ndarray],
+    queries: Dict[str, Any],
+    per_source_results: List[PerSourceResult],
+) -> AsyncIterator[str]:
+    try:
+        yield _sse("queries", queries)
+        yield _sse("sources", [r.model_dump(mode="json") for r in per_source_results])
+
+        pieces: List[str] = []
+        stream = generate_summary_stream(
+            question=question_dict(question),
+            queries=queries,
+            per_source_results=per_source_results,
+            provider=summary_choice(question),
+        )
+        with timed("summary"):
+            async with aclosing(stream):
+                async for piece in stream:
+                    pieces.append(piece)
+                    yield _sse("token", {"text": piece})
+
+        aggregated = AggregatedAnswer(
+            final_summary="".join(pieces),
+            per_source_results=per_source_results,
+        )
+        store_cached_summary(question, question_vector, aggregated)
+        await record_answer_async(question, aggregated, question_vector)
+        yield _sse("done", aggregated.model_dump(mode="json"))
+
+    except Overloaded as e:
+        logger.warning("Streaming summary shed: %s", e)
+        yield _sse("error", {"detail": str(e), "status": e.status_code, "retry_after": e.retry_after})
+    except Exception as e:
+        logger.exception("Streaming summary failed: %s", e)
+        yield _sse("error", {"detail": str(e)})
+
+
+def _check_batch_size(questions: List[QuestionInput]) -> None:
+    if len(questions) > PIPELINE_SETTINGS.batch_max_items:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch has {len(questions)} questions; the limit is {PIPELINE_SETTINGS.batch_max_items}.",
+        )
+
+
+def _with_header_selection(question: QuestionInput, request: Request) -> QuestionInput:
+    """
+    Fills the sections question.providers leaves out from the X-Query-Provider,
+    X-Query-Model, X-Search-Providers (comma separated), X-Summary-Provider and
+    X-Summary-Model headers. An unknown provider or model is a 422, as in the body.
+    """
+    headers = request.headers
+    search_ids = [p.strip() for p in headers.get("x-search-providers", "").split(",") if p.strip()]
+    try:
+        query = _header_choice(headers.get("x-query-provider"), headers.get("x-query-model"))
+        summary = _header_choice(headers.get("x-summary-provider"), headers.get("x-summary-model"))
+        if query is None and summary is None and not search_ids:
+            return question
+
+        current = question.providers or ProviderSelection()
+        selection = ProviderSelection(
+            query=current.query or query,
+            search=current.search or [ProviderChoice(provider=p) for p in search_ids] or None,
+            summary=current.summary or summary,
+        )
+    except ValidationError as e:
+        raise RequestValidationError([{**error, "loc": ("header", *error["loc"])} for error in e.errors()]) from None
+    return question.model_copy(update={"providers": selection})
+
+
+def _header_choice(provider: Optional[str], model: Optional[str]) -> Optional[ProviderChoice]:
+    if not provider and not model:
+        return None
+    return ProviderChoice(provider=provider or None, model=model or None)
+
+
+def _sse(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
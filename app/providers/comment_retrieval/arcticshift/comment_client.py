@@ -0,0 +1,193 @@
+"""
+Pooled ArcticShift clients that fetch the comments of several Reddit posts at once.
+
+Both clients send their requests through the shared HTTP clients in app.core.http_client
+(keep-alive pools, retries and a circuit breaker per host), cap the number of requests a
+client has in flight, and stop waiting once the batch deadline has passed.
+Posts whose comments could not be fetched in time map to an empty list. Threads found
+in the CommentCache are served without a request, and fetched threads are stored in it.
+Concurrent batches that ask for the same thread share one in-flight request.
+"""
+
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from app.core.config import PIPELINE_SETTINGS
+from app.core.http_client import get_async_http_client, get_http_client
+from app.core.single_flight import AsyncSingleFlight, SingleFlight
+from app.providers.comment_retrieval.arcticshift.comment_provider import (
+    ARCTIC_SHIFT_BASE, comment_search_params, comments_from_payload)
+from app.providers.comment_retrieval.comment_cache import (CommentCache,
+                                                           shared_comment_cache)
+
+logger = logging.getLogger(__name__)
+
+
+class ArcticShiftCommentClient:
+    """
+    Thread based client on the shared sync HTTP client.
+    """
+
+    def __init__(
+        self,
+        max_in_flight: int = PIPELINE_SETTINGS.comment_max_in_flight,
+        request_timeout: float = PIPELINE_SETTINGS.comment_request_timeout_seconds,
+        cache: Optional[CommentCache] = None,
+    ):
+        self.request_timeout = request_timeout
+        self._cache = cache or shared_comment_cache()
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_in_flight,
+            thread_name_prefix="arcticshift",
+        )
+        self._flights: SingleFlight[List[Dict[str, Any]]] = SingleFlight()
+
+    def fetch(self, link_fullname: str, limit: int = 10) -> List[Dict[str, Any]]:
+        resp = get_http_client().get(
+            f"{ARCTIC_SHIFT_BASE}/comments/search",
+            params=comment_search_params(link_fullname, limit),
+            timeout=self.request_timeout,
+        )
+        resp.raise_for_status()
+
+        return comments_from_payload(resp.json())
+
+    def fetch_many(
+        self,
+        link_fullnames: Iterable[str],
+        limit: int = 10,
+        deadline_seconds: Optional[float] = None,
+    ) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Fetches every link concurrently and returns link_fullname -> comments.
+        """
+        if deadline_seconds is None:
+            deadline_seconds = PIPELINE_SETTINGS.comment_batch_timeout_seconds
+
+        comments_by_link, misses = _lookup_cached(self._cache, link_fullnames)
+        if not misses:
+            return comments_by_link
+
+        futures = {
+            link_fullname: self._executor.submit(self._shared_fetch, link_fullname, limit)
+            for link_fullname in misses
+        }
+        _, pending = wait(futures.values(), timeout=deadline_seconds)
+        for future in pending:
+            future.cancel()
+
+        _collect_fetched(self._cache, futures, comments_by_link)
+        return comments_by_link
+
+    def _shared_fetch(self, link_fullname: str, limit: int) -> List[Dict[str, Any]]:
+        return self._flights.do((link_fullname, limit), lambda: self.fetch(link_fullname, limit))
+
+
+class AsyncArcticShiftCommentClient:
+    """
+    Asyncio client on the shared async HTTP client.
+
+    A fetch that misses a batch deadline is left running, so its result still reaches the
+    cache and any other batch waiting on it.
+    """
+
+    def __init__(
+        self,
+        max_in_flight: int = PIPELINE_SETTINGS.comment_max_in_flight,
+        request_timeout: float = PIPELINE_SETTINGS.comment_request_timeout_seconds,
+        cache: Optional[CommentCache] = None,
+    ):
+        self.request_timeout = request_timeout
+        self._cache = cache or shared_comment_cache()
+        self._semaphore = asyncio.Semaphore(max_in_flight)
+        self._flights: AsyncSingleFlight[List[Dict[str, Any]]] = AsyncSingleFlight()
+
+    async def fetch(self, link_fullname: str, limit: int = 10) -> List[Dict[str, Any]]:
+        async with self._semaphore:
+            resp = await get_async_http_client().get(
+                f"{ARCTIC_SHIFT_BASE}/comments/search",
+                params=comment_search_params(link_fullname, limit),
+                timeout=self.request_timeout,
+            )
+        resp.raise_for_status()
+
+        return comments_from_payload(resp.json())
+
+    async def fetch_many(
+        self,
+        link_fullnames: Iterable[str],
+        limit: int = 10,
+        deadline_seconds: Optional[float] = None,
+    ) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Fetches every link concurrently and returns link_fullname -> comments.
+        """
+        if deadline_seconds is None:
+            deadline_seconds = PIPELINE_SETTINGS.comment_batch_timeout_seconds
+
+        comments_by_link, misses = _lookup_cached(self._cache, link_fullnames)
+        if not misses:
+            return comments_by_link
+
+        tasks = {
+            link_fullname: self._shared_fetch(link_fullname, limit)
+            for link_fullname in misses
+        }
+        await asyncio.wait(tasks.values(), timeout=deadline_seconds)
+
+        # The shared tasks cache their own results when they finish.
+        _collect_fetched(None, tasks, comments_by_link)
+        return comments_by_link
+
+    def _shared_fetch(self, link_fullname: str, limit: int) -> "asyncio.Task[List[Dict[str, Any]]]":
+        return self._flights.task((link_fullname, limit), lambda: self._fetch_and_cache(link_fullname, limit))
+
+    async def _fetch_and_cache(self, link_fullname: str, limit: int) -> List[Dict[str, Any]]:
+        comments = await self.fetch(link_fullname, limit)
+        if self._cache is not None:
+            self._cache.set(link_fullname, comments)
+        return comments
+
+
+def _lookup_cached(
+    cache: Optional[CommentCache],
+    link_fullnames: Iterable[str],
+) -> Tuple[Dict[str, List[Dict[str, Any]]], List[str]]:
+    """
+    Splits the requested links into cached comments and links that still need a fetch.
+    """
+    cached: Dict[str, List[Dict[str, Any]]] = {}
+    misses: List[str] = []
+    for link_fullname in dict.fromkeys(link_fullnames):
+        comments = cache.get(link_fullname) if cache is not None else None
+        if comments is None:
+            misses.append(link_fullname)
+        else:
+            cached[link_fullname] = comments
+    return cached, misses
+
+
+def _collect_fetched(
+    cache: Optional[CommentCache],
+    futures: Dict[str, Any],
+    comments_by_link: Dict[str, List[Dict[str, Any]]],
+) -> None:
+    """
+    Reads finished fetches into comments_by_link and caches them. Unfinished, cancelled
+    or failed fetches are treated as no comments and are not cached.
+    """
+    for link_fullname, future in futures.items():
+        comments_by_link[link_fullname] = []
+        if not future.done() or future.cancelled():
+            logger.warning("ArcticShift fetch for %s missed the batch deadline.", link_fullname)
+            continue
+        error = future.exception()
+        if error is not None:
+            logger.warning("ArcticShift fetch for %s failed: %s", link_fullname, error)
+            continue
+        comments = future.result()
+        comments_by_link[link_fullname] = comments
+        if cache is not None:
+            cache.set(link_fullname, comments)
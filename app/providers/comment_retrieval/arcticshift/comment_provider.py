@@ -2,11 +2,15 @@
 Uses ArcticShift to retrieve top-level comments for a Reddit post.
 """
 
+import logging
 from typing import Any, Dict, List
 
-import requests
+from app.core.config import PIPELINE_SETTINGS
+from app.core.http_client import get_http_client
 
-ARCTIC_SHIFT_BASE = "https://arctic-shift.photon-reddit.com/api"
+logger = logging.getLogger(__name__)
+
+ARCTIC_SHIFT_BASE = PIPELINE_SETTINGS.arctic_shift_base_url.rstrip("/")
 
 
 def build_comments_block(
@@ -18,9 +22,28 @@ def build_comments_block(
     Given a list of ArcticShift comments, build a bullet list of the top N top-level comments.
     """
 
-    if not comments:
+    top_comments = select_top_level_comments(comments, link_fullname, top_n)
+
+    if not top_comments:
         return ""
 
+    bullets = "\n".join(f"- {c.get('body', '').strip()}" for c in top_comments)
+
+    return f"\n\nTop comments:\n{bullets}"
+
+
+def select_top_level_comments(
+    comments: List[Dict[str, Any]],
+    link_fullname: str,
+    top_n: int = 5,
+) -> List[Dict[str, Any]]:
+    """
+    Returns the top N non-deleted top-level comments, best score first.
+    """
+
+    if not comments:
+        return []
+
     top_level = [
         c for c in comments
         if c.get("parent_id") == link_fullname
@@ -31,9 +54,6 @@ def build_comments_block(
         if (c.get("body") or "").strip() not in ("", "[deleted]", "[removed]")
     ]
 
-    if not top_level:
-        return ""
-
     def score_of(c: Dict[str, Any]) -> int:
         return c.get("score", c.get("ups", 0))
 
@@ -45,11 +65,28 @@ def build_comments_block(
 
     top_level_sorted = sorted(top_level, key=sort_key, reverse=True)
 
-    top_comments = top_level_sorted[:top_n]
+    return top_level_sorted[:top_n]
 
-    bullets = "\n".join(f"- {c.get('body', '').strip()}" for c in top_comments)
 
-    return f"\n\nTop comments:\n{bullets}"
+def prune_top_level_comments(
+    comments: List[Dict[str, Any]],
+    link_fullname: str,
+    top_n: int = 5,
+) -> List[Dict[str, Any]]:
+    """
+    Keeps only the fields build_comments_block reads from the top N top-level comments.
+    The pruned list renders to the same block as the raw payload.
+    """
+
+    return [
+        {
+            "parent_id": c.get("parent_id"),
+            "body": c.get("body"),
+            "score": c.get("score", c.get("ups", 0)),
+            "created_utc": c.get("created_utc", 0),
+        }
+        for c in select_top_level_comments(comments, link_fullname, top_n)
+    ]
 
 
 def fetch_top_level_comments(
@@ -60,18 +97,30 @@ def fetch_top_level_comments(
     Gets the top-level comments for a given Reddit link.
     """
 
-    params: dict[str, object] = {
+    resp = get_http_client().get(
+        f"{ARCTIC_SHIFT_BASE}/comments/search",
+        params=comment_search_params(link_fullname, limit),
+        timeout=PIPELINE_SETTINGS.comment_request_timeout_seconds,
+    )
+    resp.raise_for_status()
+
+    return comments_from_payload(resp.json())
+
+
+def comment_search_params(link_fullname: str, limit: int) -> Dict[str, object]:
+    return {
         "limit": limit,
         "link_id": link_fullname,
     }
 
-    resp = requests.get(
-        f"{ARCTIC_SHIFT_BASE}/comments/search", params=params, timeout=15)
-    resp.raise_for_status()
-    data = resp.json()
+
+def comments_from_payload(data: Any) -> List[Dict[str, Any]]:
+    """
+    Extracts the comment list from an ArcticShift /comments/search response.
+    """
 
     comments = data.get("data", data)
-    print(f"ArcticShift returned {len(comments)} comments.")
+    logger.debug("ArcticShift returned %d comments.", len(comments))
     
     if not isinstance(comments, list):
         comments = []
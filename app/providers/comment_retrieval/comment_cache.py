@@ -0,0 +1,99 @@
+"""
+Two-level cache of Reddit comment threads keyed by link fullname (e.g. "t3_abc123").
+
+An in-process LRU sits in front of an on-disk SQLite store. Only the pruned top-level
+comments used by build_comments_block are stored. The TTL grows with the age of the
+post, since old threads rarely change. The ArcticShift clients share one process-wide
+cache (see shared_comment_cache), so sync and async providers see the same LRU and the
+store is opened once.
+"""
+
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from app.core.cache import LRUCache, SqliteCache
+from app.core.config import PIPELINE_SETTINGS, get_cache_path
+from app.providers.comment_retrieval.arcticshift.comment_provider import \
+    prune_top_level_comments
+
+HOUR = 60 * 60
+DAY = 24 * HOUR
+
+# (maximum post age in seconds, TTL in seconds), checked in order.
+TTL_BY_POST_AGE = [
+    (DAY, 15 * 60),
+    (7 * DAY, 6 * HOUR),
+    (30 * DAY, DAY),
+    (365 * DAY, 7 * DAY),
+]
+OLD_POST_TTL = 30 * DAY
+
+
+class CommentCache:
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        max_entries: int = PIPELINE_SETTINGS.comment_cache_max_entries,
+        top_n: int = 5,
+    ):
+        self.top_n = top_n
+        self._memory = LRUCache(max_entries)
+        self._disk = SqliteCache(path or get_cache_path("comments.sqlite3"), table="comments")
+
+    def get(self, link_fullname: str) -> Optional[List[Dict[str, Any]]]:
+        comments = self._memory.get(link_fullname)
+        if comments is not None:
+            return comments
+
+        entry = self._disk.get_with_expiry(link_fullname)
+        if entry is None:
+            return None
+
+        comments, expires_at = entry
+        remaining = expires_at - time.time() if expires_at is not None else None
+        self._memory.set(link_fullname, comments, remaining)
+        return comments
+
+    def set(self, link_fullname: str, comments: List[Dict[str, Any]]) -> None:
+        """
+        Prunes a raw ArcticShift payload and stores it in both levels.
+        """
+        ttl = ttl_for_comments(comments)
+        pruned = prune_top_level_comments(comments, link_fullname, self.top_n)
+        self._memory.set(link_fullname, pruned, ttl)
+        self._disk.set(link_fullname, pruned, ttl)
+
+
+def shared_comment_cache() -> Optional[CommentCache]:
+    """
+    The process-wide CommentCache, created on first use; None when
+    PIPELINE_SETTINGS.comment_cache_enabled is off.
+    """
+    global _shared_cache
+    if not PIPELINE_SETTINGS.comment_cache_enabled:
+        return None
+    with _shared_cache_lock:
+        if _shared_cache is None:
+            _shared_cache = CommentCache()
+        return _shared_cache
+
+
+def ttl_for_comments(comments: List[Dict[str, Any]], now: Optional[float] = None) -> float:
+    """
+    Picks a TTL from the post age, estimated by the oldest comment in the thread.
+    Threads with no comments get the shortest TTL so they are re-checked soon.
+    """
+    created = [c.get("created_utc") for c in comments if isinstance(c.get("created_utc"), (int, float))]
+    if not created:
+        return TTL_BY_POST_AGE[0][1]
+
+    age = (now or time.time()) - min(created)
+    for max_age, ttl in TTL_BY_POST_AGE:
+        if age <= max_age:
+            return ttl
+    return OLD_POST_TTL
+
+
+_shared_cache: Optional[CommentCache] = None
+_shared_cache_lock = threading.Lock()
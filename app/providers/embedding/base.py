@@ -0,0 +1,52 @@
+from abc import ABC, abstractmethod
+from typing import List
+
+import numpy as np
+
+from app.core.models import QuestionInput
+
+
+class EmbeddingProvider(ABC):
+    name: str = "base"
+
+    @abstractmethod
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """
+        Returns a float32 array of shape (len(texts), dimensions), one row per text.
+        """
+        raise NotImplementedError
+
+
+class AsyncEmbeddingProvider(ABC):
+    name: str = "base"
+
+    @abstractmethod
+    async def embed(self, texts: List[str]) -> np.ndarray:
+        """
+        Async variant of EmbeddingProvider.embed, returning the same array shape.
+        """
+        raise NotImplementedError
+
+    async def warm_up(self) -> None:
+        """
+        Prepares the provider for its first call, e.g. loads its model into Ollama.
+        Called in the background at server startup; the default does nothing.
+        """
+
+
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    """
+    Scales each row to unit length so a dot product is the cosine similarity.
+    """
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (vectors / norms).astype(np.float32)
+
+
+def question_text(question: QuestionInput) -> str:
+    """
+    The text used to embed a question: its title followed by its body.
+    """
+    if question.body:
+        return f"{question.title}\n\n{question.body}"
+    return question.title
@@ -0,0 +1,31 @@
+"""
+Async variant of the Ollama embedding provider, built on the async Ollama endpoint pool.
+"""
+from typing import List, Optional
+
+import numpy as np
+
+from app.providers.embedding.base import AsyncEmbeddingProvider
+from app.providers.embedding.ollama.embedding_provider import \
+    embeddings_from_response
+from app.providers.llm.ollama_pool import (AsyncOllamaPool,
+                                            async_ollama_pool_for)
+
+
+class AsyncOllamaEmbeddingProvider(AsyncEmbeddingProvider):
+    name = "ollama_embedding"
+
+    def __init__(self, model_name: str = "nomic-embed-text", client: Optional[AsyncOllamaPool] = None):
+        self.model_name = model_name
+        self._client = client or async_ollama_pool_for()
+
+    async def embed(self, texts: List[str]) -> np.ndarray:
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+
+        response = await self._client.embed(model=self.model_name, input=texts)
+
+        return embeddings_from_response(response)
+
+    async def warm_up(self) -> None:
+        await self._client.preload(self.model_name, embedding=True)
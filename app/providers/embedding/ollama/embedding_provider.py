@@ -0,0 +1,32 @@
+"""
+Embeds text with an Ollama embedding model.
+"""
+from typing import Any, List, Optional
+
+import numpy as np
+
+from app.providers.embedding.base import EmbeddingProvider
+from app.providers.llm.ollama_pool import OllamaPool, ollama_pool_for
+
+
+class OllamaEmbeddingProvider(EmbeddingProvider):
+    name = "ollama_embedding"
+
+    def __init__(self, model_name: str = "nomic-embed-text", client: Optional[OllamaPool] = None):
+        self.model_name = model_name
+        self._client = client or ollama_pool_for()
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+
+        response = self._client.embed(model=self.model_name, input=texts)
+
+        return embeddings_from_response(response)
+
+
+def embeddings_from_response(response: Any) -> np.ndarray:
+    """
+    Converts an Ollama /api/embed response into a float32 matrix.
+    """
+    return np.asarray(response["embeddings"], dtype=np.float32)
@@ -0,0 +1,176 @@
+"""
+Exact-match memoization of LLM chat calls.
+
+A call is keyed on its model, messages, options and, for a structured-output call, its
+JSON schema. Results are kept in a bounded in-process LRU and, when
+PIPELINE_SETTINGS.llm_cache_persist is set, in a SQLite store under the cache directory.
+Providers opt in through ProviderInfo.llm_cache.
+
+The async helpers take the admission stage of the call; only calls that miss the cache
+wait for a slot of that stage (see app.core.admission).
+"""
+
+import hashlib
+import json
+from contextlib import aclosing
+from typing import (Any, AsyncIterator, Awaitable, Callable, Dict, List,
+                    Mapping, Optional)
+
+from app.core.admission import admit
+from app.core.cache import LRUCache, SqliteCache
+from app.core.config import PIPELINE_SETTINGS, ProviderInfo, get_cache_path
+from app.core.telemetry import record_llm_response
+
+
+class LlmCallCache:
+    def __init__(
+        self,
+        max_entries: int = PIPELINE_SETTINGS.llm_cache_max_entries,
+        ttl_seconds: float = PIPELINE_SETTINGS.llm_cache_ttl_seconds,
+        path: Optional[str] = None,
+    ):
+        self.ttl_seconds = ttl_seconds
+        self._memory = LRUCache(max_entries)
+        self._disk = SqliteCache(path, table="llm_calls") if path else None
+
+    @staticmethod
+    def key(
+        model: str,
+        messages: List[Dict[str, Any]],
+        options: Optional[Mapping[str, Any]] = None,
+        format: Optional[Mapping[str, Any]] = None,
+    ) -> str:
+        call: Dict[str, Any] = {"model": model, "messages": messages, "options": dict(options or {})}
+        if format is not None:
+            call["format"] = format
+        payload = json.dumps(call, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        content = self._memory.get(key)
+        if content is None and self._disk is not None:
+            content = self._disk.get(key)
+            if content is not None:
+                self._memory.set(key, content, self.ttl_seconds)
+        return content
+
+    def set(self, key: str, content: str) -> None:
+        self._memory.set(key, content, self.ttl_seconds)
+        if self._disk is not None:
+            self._disk.set(key, content, self.ttl_seconds)
+
+
+def chat_with_cache(
+    cache: Optional[LlmCallCache],
+    chat_fn: Callable[..., Any],
+    *,
+    model: str,
+    messages: List[Dict[str, Any]],
+    options: Optional[Mapping[str, Any]] = None,
+    format: Optional[Mapping[str, Any]] = None,
+) -> Mapping[str, Any]:
+    """
+    Calls chat_fn unless an identical call is cached. Returns a response that supports
+    response["message"]["content"] either way. A format (JSON schema) asks Ollama for
+    structured output.
+    """
+    key = LlmCallCache.key(model, messages, options, format) if cache is not None else None
+    if cache is not None:
+        content = cache.get(key)
+        if content is not None:
+            record_llm_response(model, None, cached=True)
+            return _cached_response(content)
+
+    response = chat_fn(model=model, messages=messages, options=options, **_format_kwargs(format))
+    record_llm_response(model, response)
+    if cache is not None:
+        cache.set(key, response["message"]["content"])
+    return response
+
+
+async def chat_with_cache_async(
+    cache: Optional[LlmCallCache],
+    chat_fn: Callable[..., Awaitable[Any]],
+    *,
+    model: str,
+    messages: List[Dict[str, Any]],
+    options: Optional[Mapping[str, Any]] = None,
+    stage: Optional[str] = None,
+    format: Optional[Mapping[str, Any]] = None,
+) -> Mapping[str, Any]:
+    """
+    Async variant of chat_with_cache for ollama.AsyncClient.chat.
+    """
+    key = LlmCallCache.key(model, messages, options, format) if cache is not None else None
+    if cache is not None:
+        content = cache.get(key)
+        if content is not None:
+            record_llm_response(model, None, cached=True)
+            return _cached_response(content)
+
+    async with admit(stage):
+        response = await chat_fn(model=model, messages=messages, options=options, **_format_kwargs(format))
+    record_llm_response(model, response)
+    if cache is not None:
+        cache.set(key, response["message"]["content"])
+    return response
+
+
+async def chat_stream_with_cache_async(
+    cache: Optional[LlmCallCache],
+    chat_fn: Callable[..., Awaitable[Any]],
+    *,
+    model: str,
+    messages: List[Dict[str, Any]],
+    options: Optional[Mapping[str, Any]] = None,
+    stage: Optional[str] = None,
+) -> AsyncIterator[str]:
+    """
+    Streams the content of a chat call piece by piece. A cached call is yielded in one
+    piece; a fresh call is cached once the stream completes. Closing the iterator early
+    closes the Ollama stream and releases the admission slot at once.
+    """
+    key = LlmCallCache.key(model, messages, options) if cache is not None else None
+    if cache is not None:
+        content = cache.get(key)
+        if content is not None:
+            record_llm_response(model, None, cached=True)
+            yield content
+            return
+
+    pieces: List[str] = []
+    async with admit(stage):
+        stream = await chat_fn(model=model, messages=messages, options=options, stream=True)
+        async with aclosing(stream):
+            async for chunk in stream:
+                piece = chunk["message"]["content"]
+                if piece:
+                    pieces.append(piece)
+                    yield piece
+                if chunk.get("done"):
+                    # The final chunk carries the token counts and durations.
+                    record_llm_response(model, chunk)
+
+    if cache is not None:
+        cache.set(key, "".join(pieces))
+
+
+def llm_cache_for(provider_info: ProviderInfo) -> Optional[LlmCallCache]:
+    """
+    Returns the shared cache if the provider opted in, otherwise None.
+    """
+    return _shared_cache if provider_info.llm_cache else None
+
+
+def _format_kwargs(format: Optional[Mapping[str, Any]]) -> Dict[str, Any]:
+    # Only structured-output calls pass format, so plain calls keep the chat signature.
+    return {"format": dict(format)} if format is not None else {}
+
+
+def _cached_response(content: str) -> Dict[str, Any]:
+    return {"message": {"role": "assistant", "content": content}}
+
+
+_shared_cache = LlmCallCache(
+    path=get_cache_path("llm_calls.sqlite3") if PIPELINE_SETTINGS.llm_cache_persist else None,
+)
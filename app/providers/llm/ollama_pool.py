@@ -0,0 +1,383 @@
+"""
+Pools of Ollama endpoints shared by the LLM and embedding providers.
+
+A pool is built from a provider's ProviderInfo.endpoints, or PIPELINE_SETTINGS.ollama_hosts,
+or OLLAMA_HOST (default_ollama_host). It exposes chat() and embed() with the
+signatures of ollama.Client / ollama.AsyncClient, so providers and the call cache use it in
+place of a client. Every call:
+    - goes to the available endpoint with the fewest outstanding requests (ties rotate),
+      and waits for a slot when every endpoint has ollama_max_per_endpoint requests in flight;
+    - carries the model's keep_alive and num_ctx (config.OLLAMA_MODELS) unless the caller set
+      them, so models stay loaded and are never reloaded for a different context size;
+    - fails over to another endpoint on a connection error or a 5xx response. The failing
+      endpoint is skipped for ollama_down_seconds, or until a health check finds it up.
+A stream fails over only before its first chunk.
+
+check_health() probes every endpoint with /api/ps. The server runs it for the async pools
+every ollama_health_interval_seconds (see run_health_checks). preload() loads a model on
+every endpoint that is up; the server calls it through the providers' warm_up at startup.
+"""
+
+import asyncio
+import logging
+import os
+import threading
+import time
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+import httpx
+from ollama import AsyncClient, Client, ResponseError
+
+from app.core.config import PIPELINE_SETTINGS, ProviderInfo, model_runtime
+from app.core.telemetry import record_upstream_request
+
+logger = logging.getLogger(__name__)
+
+
+class OllamaEndpoint:
+    def __init__(self, host: str, client: Any):
+        self.client = client
+        self.host = host.rstrip("/")
+        self.in_flight = 0
+        self.down_until = 0.0
+
+    def is_up(self, now: float) -> bool:
+        return self.down_until <= now
+
+
+class _EndpointPool:
+    """
+    Endpoint selection and failure bookkeeping shared by the sync and async pools.
+    Callers hold the pool's condition lock around _pick and in_flight updates.
+    """
+
+    def __init__(self, endpoints: List[OllamaEndpoint], max_per_endpoint: int):
+        self.endpoints = endpoints
+        self.max_per_endpoint = max(1, max_per_endpoint)
+        self._turn = 0
+
+    def _pick(self, tried: List[OllamaEndpoint]) -> Optional[OllamaEndpoint]:
+        """
+        The least loaded untried endpoint with a free slot, or None if all are busy. Down
+        endpoints are only used when no untried endpoint is up.
+        """
+        now = time.monotonic()
+        candidates = [e for e in self.endpoints if e not in tried]
+        candidates = [e for e in candidates if e.is_up(now)] or candidates
+        free = [e for e in candidates if e.in_flight < self.max_per_endpoint]
+        if not free:
+            return None
+        least = min(e.in_flight for e in free)
+        ties = [e for e in free if e.in_flight == least]
+        self._turn += 1
+        return ties[self._turn % len(ties)]
+
+    def _succeeded(self, endpoint: OllamaEndpoint) -> None:
+        endpoint.down_until = 0.0
+        record_upstream_request(endpoint.host, "ok")
+
+    def _failed(self, endpoint: OllamaEndpoint, error: Exception, tried: List[OllamaEndpoint]) -> bool:
+        """
+        Marks the endpoint down if the error means it is unavailable. Returns whether the
+        call should be retried on another endpoint.
+        """
+        if isinstance(error, ResponseError) and not 500 <= error.status_code < 600:
+            record_upstream_request(endpoint.host, "ok")
+            return False
+
+        endpoint.down_until = time.monotonic() + PIPELINE_SETTINGS.ollama_down_seconds
+        tried.append(endpoint)
+        retry = len(tried) < len(self.endpoints)
+        record_upstream_request(endpoint.host, "failover" if retry else "error")
+        logger.warning("Ollama endpoint %s failed: %s", endpoint.host, error)
+        return retry
+
+    def _health_result(self, endpoint: OllamaEndpoint, error: Optional[Exception]) -> None:
+        # Any answer below 500 means the server is reachable and serving.
+        if error is None or (isinstance(error, ResponseError) and error.status_code < 500):
+            endpoint.down_until = 0.0
+        else:
+            endpoint.down_until = time.monotonic() + PIPELINE_SETTINGS.ollama_down_seconds
+            logger.warning("Ollama endpoint %s failed its health check: %s", endpoint.host, error)
+
+    def status(self) -> List[Dict[str, Any]]:
+        now = time.monotonic()
+        return [
+            {"host": e.host, "up": e.is_up(now), "in_flight": e.in_flight}
+            for e in self.endpoints
+        ]
+
+
+# Errors that mean the endpoint, not the request, is at fault. ResponseError is narrowed to
+# 5xx in _failed.
+FAILOVER_ERRORS = (ConnectionError, httpx.TransportError, ResponseError)
+
+
+class OllamaPool(_EndpointPool):
+    """
+    Thread-safe pool of ollama.Client endpoints.
+    """
+
+    def __init__(self, hosts: List[str], max_per_endpoint: int = PIPELINE_SETTINGS.ollama_max_per_endpoint):
+        super().__init__([OllamaEndpoint(h, Client(host=h)) for h in hosts], max_per_endpoint)
+        self._condition = threading.Condition()
+
+    def chat(self, **kwargs: Any) -> Any:
+        if kwargs.get("stream"):
+            return self._stream(_with_model_runtime(kwargs))
+        return self._call("chat", _with_model_runtime(kwargs))
+
+    def embed(self, **kwargs: Any) -> Any:
+        return self._call("embed", _with_model_runtime(kwargs))
+
+    def preload(self, model: str, embedding: bool = False) -> None:
+        now = time.monotonic()
+        for endpoint in [e for e in self.endpoints if e.is_up(now)]:
+            try:
+                _preload_call(endpoint.client, model, embedding)
+            except Exception as e:
+                logger.warning("Preloading %s on %s failed: %s", model, endpoint.host, e)
+
+    def check_health(self) -> None:
+        for endpoint in self.endpoints:
+            try:
+                endpoint.client.ps()
+            except Exception as e:
+                self._health_result(endpoint, e)
+            else:
+                self._health_result(endpoint, None)
+
+    def _call(self, method: str, kwargs: Dict[str, Any]) -> Any:
+        tried: List[OllamaEndpoint] = []
+        while True:
+            endpoint = self._acquire(tried)
+            try:
+                response = getattr(endpoint.client, method)(**kwargs)
+            except FAILOVER_ERRORS as e:
+                if not self._failed(endpoint, e, tried):
+                    raise
+                continue
+            finally:
+                self._release(endpoint)
+            self._succeeded(endpoint)
+            return response
+
+    def _stream(self, kwargs: Dict[str, Any]) -> Iterator[Any]:
+        tried: List[OllamaEndpoint] = []
+        while True:
+            endpoint = self._acquire(tried)
+            started = False
+            try:
+                for chunk in endpoint.client.chat(**kwargs):
+                    started = True
+                    yield chunk
+            except FAILOVER_ERRORS as e:
+                if started or not self._failed(endpoint, e, tried):
+                    raise
+                continue
+            finally:
+                self._release(endpoint)
+            self._succeeded(endpoint)
+            return
+
+    def _acquire(self, tried: List[OllamaEndpoint]) -> OllamaEndpoint:
+        with self._condition:
+            while True:
+                endpoint = self._pick(tried)
+                if endpoint is not None:
+                    endpoint.in_flight += 1
+                    return endpoint
+                self._condition.wait()
+
+    def _release(self, endpoint: OllamaEndpoint) -> None:
+        with self._condition:
+            endpoint.in_flight -= 1
+            self._condition.notify()
+
+
+class AsyncOllamaPool(_EndpointPool):
+    """
+    Pool of ollama.AsyncClient endpoints, used from the server's event loop.
+    """
+
+    def __init__(self, hosts: List[str], max_per_endpoint: int = PIPELINE_SETTINGS.ollama_max_per_endpoint):
+        super().__init__([OllamaEndpoint(h, AsyncClient(host=h)) for h in hosts], max_per_endpoint)
+        self._condition = asyncio.Condition()
+
+    async def chat(self, **kwargs: Any) -> Any:
+        if kwargs.get("stream"):
+            return self._stream(_with_model_runtime(kwargs))
+        return await self._call("chat", _with_model_runtime(kwargs))
+
+    async def embed(self, **kwargs: Any) -> Any:
+        return await self._call("embed", _with_model_runtime(kwargs))
+
+    async def preload(self, model: str, embedding: bool = False) -> None:
+        now = time.monotonic()
+        endpoints = [e for e in self.endpoints if e.is_up(now)]
+        results = await asyncio.gather(
+            *(_preload_call(endpoint.client, model, embedding) for endpoint in endpoints),
+            return_exceptions=True)
+        for endpoint, result in zip(endpoints, results):
+            if isinstance(result, Exception):
+                logger.warning("Preloading %s on %s failed: %s", model, endpoint.host, result)
+
+    async def check_health(self) -> None:
+        results = await asyncio.gather(
+            *(endpoint.client.ps() for endpoint in self.endpoints), return_exceptions=True)
+        for endpoint, result in zip(self.endpoints, results):
+            self._health_result(endpoint, result if isinstance(result, Exception) else None)
+
+    async def _call(self, method: str, kwargs: Dict[str, Any]) -> Any:
+        tried: List[OllamaEndpoint] = []
+        while True:
+            endpoint = await self._acquire(tried)
+            try:
+                response = await getattr(endpoint.client, method)(**kwargs)
+            except FAILOVER_ERRORS as e:
+                if not self._failed(endpoint, e, tried):
+                    raise
+                continue
+            finally:
+                await self._release(endpoint)
+            self._succeeded(endpoint)
+            return response
+
+    async def _stream(self, kwargs: Dict[str, Any]) -> AsyncIterator[Any]:
+        tried: List[OllamaEndpoint] = []
+        while True:
+            endpoint = await self._acquire(tried)
+            started = False
+            try:
+                async for chunk in await endpoint.client.chat(**kwargs):
+                    started = True
+                    yield chunk
+            except FAILOVER_ERRORS as e:
+                if started or not self._failed(endpoint, e, tried):
+                    raise
+                continue
+            finally:
+                await self._release(endpoint)
+            self._succeeded(endpoint)
+            return
+
+    async def _acquire(self, tried: List[OllamaEndpoint]) -> OllamaEndpoint:
+        async with self._condition:
+            while True:
+                endpoint = self._pick(tried)
+                if endpoint is not None:
+                    endpoint.in_flight += 1
+                    return endpoint
+                await self._condition.wait()
+
+    async def _release(self, endpoint: OllamaEndpoint) -> None:
+        async with self._condition:
+            endpoint.in_flight -= 1
+            self._condition.notify()
+
+
+_pools: Dict[Tuple[bool, Tuple[str, ...]], _EndpointPool] = {}
+_pools_lock = threading.Lock()
+
+
+def ollama_hosts(provider_info: Optional[ProviderInfo] = None) -> List[str]:
+    """
+    The endpoint hosts of a provider.
+    """
+    if provider_info is not None and provider_info.endpoints:
+        return list(provider_info.endpoints)
+    hosts = [h.strip() for h in PIPELINE_SETTINGS.ollama_hosts.split(",") if h.strip()]
+    return hosts or [default_ollama_host()]
+
+
+def default_ollama_host() -> str:
+    """
+    OLLAMA_HOST as a base URL, the way the ollama client reads it: "http://" is assumed
+    when there is no scheme and port 11434 when there is no port.
+    example: "gpu1" -> "http://gpu1:11434"
+    """
+    host = os.getenv("OLLAMA_HOST", "").strip() or "127.0.0.1"
+    if "://" not in host:
+        host = f"http://{host}"
+    parsed = urlsplit(host)
+    if parsed.port is None:
+        host = parsed._replace(netloc=f"{parsed.netloc}:11434").geturl()
+    return host.rstrip("/")
+
+
+def ollama_pool_for(provider_info: Optional[ProviderInfo] = None) -> OllamaPool:
+    """
+    The shared sync pool for the provider's endpoints. Providers on the same hosts share one.
+    """
+    return _pool(False, ollama_hosts(provider_info))
+
+
+def async_ollama_pool_for(provider_info: Optional[ProviderInfo] = None) -> AsyncOllamaPool:
+    """
+    The shared async pool for the provider's endpoints.
+    """
+    return _pool(True, ollama_hosts(provider_info))
+
+
+def pool_status() -> List[Dict[str, Any]]:
+    with _pools_lock:
+        pools = [pool for (is_async, _), pool in _pools.items() if is_async]
+    return [status for pool in pools for status in pool.status()]
+
+
+def pools_available() -> bool:
+    """
+    Whether every async pool has at least one endpoint that is up.
+    """
+    with _pools_lock:
+        pools = [pool for (is_async, _), pool in _pools.items() if is_async]
+    return all(any(status["up"] for status in pool.status()) for pool in pools)
+
+
+async def run_health_checks(interval_seconds: float = PIPELINE_SETTINGS.ollama_health_interval_seconds) -> None:
+    """
+    Checks every async pool's endpoints forever, every interval_seconds. Started by the
+    server on startup and cancelled on shutdown.
+    """
+    while True:
+        with _pools_lock:
+            pools = [pool for (is_async, _), pool in _pools.items() if is_async]
+        for pool in pools:
+            await pool.check_health()
+        await asyncio.sleep(interval_seconds)
+
+
+def _pool(is_async: bool, hosts: List[str]):
+    key = (is_async, tuple(hosts))
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = (AsyncOllamaPool if is_async else OllamaPool)(hosts)
+        return pool
+
+
+def _preload_call(client: Any, model: str, embedding: bool) -> Any:
+    """
+    A chat call without messages loads a model without generating; embedding models are
+    loaded by embedding a short text.
+    """
+    if embedding:
+        return client.embed(**_with_model_runtime({"model": model, "input": ["warm up"]}))
+    return client.chat(**_with_model_runtime({"model": model, "messages": []}))
+
+
+def _with_model_runtime(kwargs: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Adds the model's keep_alive and num_ctx (see config.OLLAMA_MODELS) where the caller did
+    not set them, so every call to a model asks for the same runner.
+    """
+    runtime = model_runtime(kwargs.get("model", ""))
+    kwargs = dict(kwargs)
+    if kwargs.get("keep_alive") is None and runtime.keep_alive:
+        kwargs["keep_alive"] = runtime.keep_alive
+    if runtime.num_ctx:
+        options = dict(kwargs.get("options") or {})
+        options.setdefault("num_ctx", runtime.num_ctx)
+        kwargs["options"] = options
+    return kwargs
@@ -0,0 +1,47 @@
+"""
+Chat message layout shared by the Ollama call sites (query, search, rerank, summary).
+
+Every prompt is a system message holding the call site's fixed instructions, followed by
+a user message holding everything that varies per request. The system message is the
+template's static text, byte-identical across requests, so Ollama can reuse the KV
+cache of the instructions and only evaluates the request's own tokens. Instruction
+templates therefore must not have fields; variable content goes in the user message,
+for rerank and summary through their own *_input.txt templates.
+"""
+
+from typing import Any, Dict, List
+
+from app.core.template_loader import get_template
+
+
+def prompt_messages(system_template: str, user_content: str) -> List[Dict[str, str]]:
+    """
+    The system message from a static template, then the user message.
+
+    Usage:
+        prompt_messages("llm_search_prompt.txt", user_content)
+    """
+    system = get_template(system_template)
+    if system.has_fields:
+        raise ValueError(f"Template {system.name} has fields; put request content in the user message.")
+    return [
+        {"role": "system", "content": system.static_prefix},
+        {"role": "user", "content": user_content},
+    ]
+
+
+def templated_messages(system_template: str, user_template: str, **values: Any) -> List[Dict[str, str]]:
+    """
+    prompt_messages with the user message rendered from a template.
+
+    Usage:
+        templated_messages("llm_rerank_prompt.txt", "llm_rerank_input.txt", question_text=..., ...)
+    """
+    return prompt_messages(system_template, get_template(user_template).render(**values))
+
+
+def static_prefix_hash(system_template: str) -> str:
+    """
+    Identifies the system message of a call site; it changes only when the template does.
+    """
+    return get_template(system_template).prefix_hash
@@ -11,8 +11,25 @@ class QueryProvider(ABC):
     def generate_queries(self, question: QuestionInput) -> Dict[str, Any]:
         """
         Given a QuestionInput, return a dict containing:
-          - keyword_query or keyword_queries
+          - keyword_query: the search engine query string
           - sub_questions
           - any other provider-specific metadata
         """
         raise NotImplementedError
+
+
+class AsyncQueryProvider(ABC):
+    name: str = "base"
+
+    @abstractmethod
+    async def generate_queries(self, question: QuestionInput) -> Dict[str, Any]:
+        """
+        Async variant of QueryProvider.generate_queries, returning the same dict shape.
+        """
+        raise NotImplementedError
+
+    async def warm_up(self) -> None:
+        """
+        Prepares the provider for its first call, e.g. loads its model into Ollama.
+        Called in the background at server startup; the default does nothing.
+        """
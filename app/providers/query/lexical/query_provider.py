@@ -0,0 +1,168 @@
+"""
+Builds search queries from the question's own words, without an LLM call.
+
+Candidate phrases are runs of content words (see phrase_candidates). Each word is weighted
+by TF-IDF: term frequency in the question, with title words counted twice, times inverse
+document frequency in the question's subreddit of the local corpus when one is available.
+The best phrases, in the order they appear in the question, form the keyword query.
+"""
+import asyncio
+import math
+import os
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.core.cache import LRUCache
+from app.core.models import QuestionInput
+from app.corpus.keyword_index import KeywordIndex
+from app.corpus.store import CorpusStore
+from app.corpus.text import phrase_candidates
+from app.providers.query.base import AsyncQueryProvider, QueryProvider
+
+# Request boilerplate that is not a stopword for indexing but never helps a search.
+QUERY_FILLER = frozenset("""
+looking recommendations recommendation recommend suggestions suggestion advice tips ideas
+thoughts opinions experience experiences anyone anybody appreciated edit update
+""".split())
+
+
+class CorpusVocabulary:
+    """
+    Document frequencies from the local corpus keyword index, optionally per subreddit.
+
+    The mask and post count of recently used subreddits are cached, and so are recent IDFs.
+    Subreddits that are not in the store are not cached, so client-supplied sources cannot
+    grow the caches past max_entries.
+    """
+
+    def __init__(self, directory: str, max_entries: int = 64):
+        self.store = CorpusStore(directory)
+        self.index = KeywordIndex(directory, len(self.store))
+        self._subreddits = LRUCache(max_entries)
+        self._idf = LRUCache(max_entries * 256)
+
+    def idf(self, term: str, subreddit: Optional[str] = None) -> float:
+        subreddit_stats = self._subreddit(subreddit) if subreddit else None
+        if subreddit_stats is None:
+            mask, document_count, key = None, len(self.store), term
+        else:
+            mask, document_count = subreddit_stats
+            key = f"{subreddit.strip().lower()}|{term}"
+
+        idf = self._idf.get(key)
+        if idf is None:
+            df = self.index.document_frequency(term, mask)
+            idf = math.log(1 + (document_count + 1) / (df + 1))
+            self._idf.set(key, idf)
+        return idf
+
+    def _subreddit(self, subreddit: str) -> Optional[Tuple[np.ndarray, int]]:
+        key = subreddit.strip().lower()
+        stats = self._subreddits.get(key)
+        if stats is None:
+            mask = self.store.subreddit_mask(key)
+            if mask is None:
+                return None
+            stats = (mask, int(np.count_nonzero(mask)))
+            self._subreddits.set(key, stats)
+        return stats
+
+
+class LexicalQueryProvider(QueryProvider):
+    name = "lexical"
+
+    def __init__(self, vocabulary: Optional[CorpusVocabulary] = None, max_terms: int = 6):
+        self.vocabulary = vocabulary
+        self.max_terms = max_terms
+
+    def generate_queries(self, question: QuestionInput) -> Dict[str, Any]:
+        return build_lexical_queries(question, self.vocabulary, self.max_terms)
+
+
+class AsyncLexicalQueryProvider(AsyncQueryProvider):
+    name = "lexical"
+
+    def __init__(self, vocabulary: Optional[CorpusVocabulary] = None, max_terms: int = 6):
+        self.vocabulary = vocabulary
+        self.max_terms = max_terms
+
+    async def generate_queries(self, question: QuestionInput) -> Dict[str, Any]:
+        if self.vocabulary is None:
+            # Pure CPU work of a few microseconds; runs on the event loop.
+            return build_lexical_queries(question, None, self.max_terms)
+        # Corpus lookups scan posting lists and subreddit masks, so they run off the loop.
+        return await asyncio.to_thread(build_lexical_queries, question, self.vocabulary, self.max_terms)
+
+
+def load_corpus_vocabulary(directory: str) -> Optional[CorpusVocabulary]:
+    """
+    Returns the vocabulary of the corpus store in directory, or None if there is no store.
+    """
+    if not os.path.exists(os.path.join(directory, "manifest.json")):
+        return None
+    return CorpusVocabulary(directory)
+
+
+def build_lexical_queries(
+    question: QuestionInput,
+    vocabulary: Optional[CorpusVocabulary],
+    max_terms: int = 6,
+) -> Dict[str, Any]:
+    """
+    Returns {"keyword_query", "sub_questions", "key_phrases"}, shaped like the LLM
+    provider's output. Without a vocabulary every word has the same IDF.
+    """
+    title_phrases = _content_phrases(question.title)
+    body_phrases = _content_phrases(question.body or "")
+
+    tf: Counter = Counter()
+    for phrase in title_phrases:
+        tf.update({word: 2 for word in phrase})
+    for phrase in body_phrases:
+        tf.update(phrase)
+
+    def weight(word: str) -> float:
+        idf = vocabulary.idf(word, question.source) if vocabulary is not None else 1.0
+        return tf[word] * idf
+
+    phrases = []
+    seen = set()
+    for position, phrase in enumerate(title_phrases + body_phrases):
+        key = tuple(phrase)
+        if key in seen:
+            continue
+        seen.add(key)
+        phrases.append((sum(weight(w) for w in phrase) / math.sqrt(len(phrase)), position, phrase))
+
+    chosen = []
+    used_words = set()
+    for score, position, phrase in sorted(phrases, key=lambda p: (-p[0], p[1])):
+        words = [w for w in phrase if w not in used_words]
+        if not words or len(used_words) + len(words) > max_terms:
+            continue
+        chosen.append((position, words))
+        used_words.update(words)
+
+    key_phrases = [" ".join(words) for _, words in sorted(chosen)]
+    keyword_query = " ".join(key_phrases) or question.title
+
+    source = (question.source or "").strip().lower()
+    if source and source not in used_words:
+        keyword_query = f"{keyword_query} {source}"
+
+    return {
+        "keyword_query": keyword_query,
+        "sub_questions": [],
+        "key_phrases": key_phrases,
+    }
+
+
+def _content_phrases(text: str) -> List[List[str]]:
+    phrases = []
+    for phrase in phrase_candidates(text):
+        words = [w for w in phrase if w not in QUERY_FILLER]
+        if words:
+            phrases.append(words)
+    return phrases
@@ -0,0 +1,41 @@
+"""
+Async variant of the Ollama query provider, built on the async Ollama endpoint pool.
+"""
+from typing import Any, Dict, Optional
+
+from app.core.models import QuestionInput
+from app.providers.llm.call_cache import (LlmCallCache,
+                                          chat_with_cache_async)
+from app.providers.llm.ollama_pool import (AsyncOllamaPool,
+                                            async_ollama_pool_for)
+from app.providers.query.base import AsyncQueryProvider
+from app.providers.query.ollama.query_provider import (build_query_messages,
+                                                      parse_query_response)
+
+
+class AsyncOllamaQueryProvider(AsyncQueryProvider):
+    name = "ollama_llm"
+
+    def __init__(
+        self,
+        model_name: str = "llama3.1",
+        llm_cache: Optional[LlmCallCache] = None,
+        client: Optional[AsyncOllamaPool] = None,
+    ):
+        self.model_name = model_name
+        self.llm_cache = llm_cache
+        self._client = client or async_ollama_pool_for()
+
+    async def generate_queries(self, question: QuestionInput) -> Dict[str, Any]:
+        response = await chat_with_cache_async(
+            self.llm_cache,
+            self._client.chat,
+            model=self.model_name,
+            messages=build_query_messages(question),
+            stage="query",
+        )
+
+        return parse_query_response(response["message"]["content"], question)
+
+    async def warm_up(self) -> None:
+        await self._client.preload(self.model_name)
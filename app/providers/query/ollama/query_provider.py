@@ -2,43 +2,72 @@
 Uses Ollama LLM to generate search queries based on a given question.
 """
 import json
-from typing import Any, Dict
-
-from ollama import chat
+from typing import Any, Dict, List, Optional
 
 from app.core.models import QuestionInput
-from app.core.template_loader import load_template
+from app.providers.llm.call_cache import LlmCallCache, chat_with_cache
+from app.providers.llm.ollama_pool import OllamaPool, ollama_pool_for
+from app.providers.llm.prompts import prompt_messages
 from app.providers.query.base import QueryProvider
 
 
 class OllamaQueryProvider(QueryProvider):
     name = "ollama_llm"
 
-    def __init__(self, model_name: str = "llama3.1"):
+    def __init__(
+        self,
+        model_name: str = "llama3.1",
+        llm_cache: Optional[LlmCallCache] = None,
+        client: Optional[OllamaPool] = None,
+    ):
         self.model_name = model_name
-        self.prompt_template = load_template("llm_query_prompt.txt")
+        self.llm_cache = llm_cache
+        self._client = client or ollama_pool_for()
 
     def generate_queries(self, question: QuestionInput) -> Dict[str, Any]:
-        user_text = (
-            f"Title: {question.title}\n"
-            f"Body: {question.body or ''}\n"
-            f"Source: {question.source or ''}\n"
-            f"URL: {question.url or ''}"
-        )
-
-        response = chat(
+        response = chat_with_cache(
+            self.llm_cache,
+            self._client.chat,
             model=self.model_name,
-            messages=[
-                {"role": "system", "content": self.prompt_template},
-                {"role": "user", "content": user_text},
-            ],
+            messages=build_query_messages(question),
         )
 
-        content = response["message"]["content"]
-        try:
-            return json.loads(content)
-        except Exception:
-            return {
-                "keyword_queries": [question.title],
-                "sub_questions": []
-            }
+        return parse_query_response(response["message"]["content"], question)
+
+
+def build_query_messages(question: QuestionInput) -> List[Dict[str, str]]:
+    """
+    Builds the chat messages for query generation. Shared by the sync and async providers.
+    """
+    user_text = (
+        f"Title: {question.title}\n"
+        f"Body: {question.body or ''}\n"
+        f"Source: {question.source or ''}\n"
+        f"URL: {question.url or ''}"
+    )
+
+    return prompt_messages("llm_query_prompt.txt", user_text)
+
+
+def parse_query_response(content: str, question: QuestionInput) -> Dict[str, Any]:
+    """
+    Parses the model output as JSON, falling back to the question title. The result always
+    has a "keyword_query" string and a "sub_questions" list.
+    """
+    try:
+        queries = json.loads(content)
+    except Exception:
+        queries = None
+    if not isinstance(queries, dict):
+        queries = {}
+
+    keyword_query = queries.get("keyword_query")
+    if not keyword_query and queries.get("keyword_queries"):
+        # Some models pluralize the key and return a list.
+        keyword_queries = queries.pop("keyword_queries")
+        keyword_query = keyword_queries[0] if isinstance(keyword_queries, list) else keyword_queries
+    queries["keyword_query"] = str(keyword_query or question.title)
+
+    if not isinstance(queries.get("sub_questions"), list):
+        queries["sub_questions"] = []
+    return queries
@@ -0,0 +1,270 @@
+"""
+Lazy construction of the providers configured in app.core.config.SECTIONS.
+
+A provider's classes are named by ProviderInfo.entry_point and async_entry_point
+("module:Class") and imported only when the provider is first built, so importing the
+services imports neither Ollama nor any provider module. Each section has a
+ProviderRegistry that builds an instance on first use and keeps it: the default providers
+for good, others (chosen per request through QuestionInput.providers) in a bounded LRU,
+so switching between models costs nothing after the first use. A provider that fails to
+build fails only the calls that need it, and is built again on the next one. Builds of
+different providers run in parallel, and async code gets providers through get_async and
+friends, which build in a worker thread so loading an index never blocks the event loop.
+
+On startup the server runs warm_up_providers() in the background: it builds the default
+async providers and preloads their models (see AsyncQueryProvider.warm_up and friends).
+readiness() reports its progress for /health/ready.
+"""
+
+import asyncio
+import importlib
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from app.core.cache import LRUCache
+from app.core.config import (PIPELINE_SETTINGS, SECTIONS, ProviderInfo,
+                             SectionName, check_provider_choice)
+from app.core.models import ProviderChoice
+
+logger = logging.getLogger(__name__)
+
+# (provider class, provider info, model, is_async) -> provider instance
+ProviderBuilder = Callable[[Any, ProviderInfo, Optional[str], bool], Any]
+
+
+def load_entry_point(spec: str) -> Any:
+    """
+    Imports "module:attribute" and returns the attribute.
+    """
+    module_name, _, attribute = spec.partition(":")
+    return getattr(importlib.import_module(module_name), attribute)
+
+
+def provider_class(provider_info: ProviderInfo, is_async: bool) -> Any:
+    spec = provider_info.async_entry_point if is_async else provider_info.entry_point
+    if not spec:
+        kind = "async entry point" if is_async else "entry point"
+        raise ValueError(f"Provider '{provider_info.id}' has no {kind}.")
+    return load_entry_point(spec)
+
+
+def ollama_client(provider_info: ProviderInfo, is_async: bool) -> Any:
+    """
+    The shared Ollama endpoint pool for the provider. Imports ollama on first use.
+    """
+    from app.providers.llm.ollama_pool import (async_ollama_pool_for,
+                                               ollama_pool_for)
+    return async_ollama_pool_for(provider_info) if is_async else ollama_pool_for(provider_info)
+
+
+class ProviderRegistry:
+    """
+    Built providers of one section, keyed on (provider id, model, sync or async).
+    """
+
+    def __init__(self, section_name: SectionName, build: ProviderBuilder, warm_ids: Optional[List[str]] = None):
+        """
+        warm_ids are providers warmed up at startup besides the default selection.
+        """
+        self.section_name = section_name
+        self.warm_ids = warm_ids or []
+        self._build = build
+        self._lock = threading.Lock()
+        # One lock per key, so a slow build does not hold up the other providers.
+        self._build_locks: Dict[str, threading.Lock] = {}
+        self._pinned: Dict[str, Any] = {}
+        self._instances = LRUCache(PIPELINE_SETTINGS.provider_cache_max_entries)
+        self._errors: Dict[str, str] = {}
+        _registries.append(self)
+
+    @property
+    def section(self):
+        return SECTIONS[self.section_name.name]
+
+    def default_ids(self) -> List[str]:
+        selection = self.section.default_selection
+        return list(selection) if isinstance(selection, list) else [selection]
+
+    def get(self, provider_id: Optional[str] = None, model: Optional[str] = None, is_async: bool = True) -> Any:
+        """
+        The provider instance, built on first use. provider_id and model default to the
+        section's default selection and the provider's default model. Raises ValueError
+        for a provider or model that is not in SECTIONS.
+        """
+        provider_id, model = check_provider_choice(self.section_name, provider_id or self.default_ids()[0], model)
+        key = _key(provider_id, model, is_async)
+        instance = self._cached(key)
+        if instance is not None:
+            return instance
+
+        with self._lock:
+            build_lock = self._build_locks.setdefault(key, threading.Lock())
+        with build_lock:
+            instance = self._cached(key)
+            if instance is None:
+                provider_info = self.section.providers[provider_id]
+                started = time.perf_counter()
+                try:
+                    instance = self._build(provider_class(provider_info, is_async), provider_info, model, is_async)
+                except Exception as e:
+                    self._errors[key] = str(e) or type(e).__name__
+                    logger.error("Building %s provider %s failed: %s", self.section_name.text, provider_id, e)
+                    raise
+                self._errors.pop(key, None)
+                if self._is_pinned(provider_id, model):
+                    self._pinned[key] = instance
+                else:
+                    self._instances.set(key, instance)
+                logger.info(
+                    "Built %s provider %s (%s) in %.0f ms",
+                    self.section_name.text, provider_id, model or "no model", (time.perf_counter() - started) * 1000,
+                )
+        return instance
+
+    async def get_async(self, provider_id: Optional[str] = None, model: Optional[str] = None) -> Any:
+        """
+        get() for async code: the async provider, built in a worker thread on first use.
+        """
+        provider_id, model = check_provider_choice(self.section_name, provider_id or self.default_ids()[0], model)
+        instance = self._cached(_key(provider_id, model, True))
+        if instance is not None:
+            return instance
+        return await asyncio.to_thread(self.get, provider_id, model, True)
+
+    async def select_async(self, choice: Optional[ProviderChoice]) -> Any:
+        """
+        select() for async code, building off the event loop.
+        """
+        if choice is None:
+            return await self.get_async()
+        return await self.get_async(choice.provider, choice.model)
+
+    async def select_many_async(
+        self,
+        choices: Optional[List[ProviderChoice]],
+        skip_failed: bool = False,
+    ) -> List[Any]:
+        """
+        select_many() for async code, building off the event loop.
+        """
+        if choices is None:
+            choices = [ProviderChoice(provider=provider_id) for provider_id in self.default_ids()]
+        providers = []
+        for choice in choices:
+            try:
+                providers.append(await self.select_async(choice))
+            except Exception:
+                if not skip_failed:
+                    raise
+        return providers
+
+    def select(self, choice: Optional[ProviderChoice], is_async: bool = True) -> Any:
+        """
+        The provider a request chose, or the default one.
+        """
+        if choice is None:
+            return self.get(is_async=is_async)
+        return self.get(choice.provider, choice.model, is_async)
+
+    def select_many(
+        self,
+        choices: Optional[List[ProviderChoice]],
+        is_async: bool = True,
+        skip_failed: bool = False,
+    ) -> List[Any]:
+        """
+        The providers a request chose, or the default selection. With skip_failed,
+        providers that cannot be built are left out instead of raising.
+        """
+        if choices is None:
+            choices = [ProviderChoice(provider=provider_id) for provider_id in self.default_ids()]
+        providers = []
+        for choice in choices:
+            try:
+                providers.append(self.select(choice, is_async))
+            except Exception:
+                if not skip_failed:
+                    raise
+        return providers
+
+    def _cached(self, key: str) -> Any:
+        instance = self._pinned.get(key)
+        return instance if instance is not None else self._instances.get(key)
+
+    def _is_pinned(self, provider_id: str, model: Optional[str]) -> bool:
+        return (
+            provider_id in self.default_ids() + self.warm_ids
+            and model == self.section.providers[provider_id].default_model
+        )
+
+    def status(self, is_async: bool = True) -> Dict[str, str]:
+        """
+        "ready", "pending" or "failed: <error>" for each provider of the default selection.
+        """
+        statuses = {}
+        for provider_id in self.default_ids():
+            key = _key(provider_id, self.section.providers[provider_id].default_model, is_async)
+            if key in self._pinned:
+                statuses[provider_id] = "ready"
+            elif key in self._errors:
+                statuses[provider_id] = f"failed: {self._errors[key]}"
+            else:
+                statuses[provider_id] = "pending"
+        return statuses
+
+
+def _key(provider_id: str, model: Optional[str], is_async: bool) -> str:
+    return f"{provider_id}|{model or ''}|{'async' if is_async else 'sync'}"
+
+
+_registries: List[ProviderRegistry] = []
+_warm_up_state = "pending" if PIPELINE_SETTINGS.provider_warm_up else "disabled"
+
+
+async def warm_up_providers() -> None:
+    """
+    Builds the default async providers and warm_ids of every registry, off the event loop,
+    then warms them up concurrently. Failures are logged and reported by readiness().
+    """
+    global _warm_up_state
+    _warm_up_state = "running"
+    started = time.perf_counter()
+
+    providers = []
+    for registry in list(_registries):
+        for provider_id in dict.fromkeys(registry.default_ids() + registry.warm_ids):
+            try:
+                providers.append(await registry.get_async(provider_id))
+            except Exception:
+                pass  # Logged and recorded by the registry.
+
+    await asyncio.gather(*(_warm_up(provider) for provider in providers))
+    _warm_up_state = "done"
+    logger.info("Providers warmed up in %.2fs", time.perf_counter() - started)
+
+
+async def _warm_up(provider: Any) -> None:
+    try:
+        await asyncio.wait_for(provider.warm_up(), PIPELINE_SETTINGS.provider_warm_up_timeout_seconds)
+    except Exception as e:
+        logger.warning("Warming up provider %s failed: %s", provider.name, e)
+
+
+def readiness() -> Dict[str, Any]:
+    """
+    Whether the server is ready for traffic: warm-up has finished (or is disabled), no
+    default provider failed to build, and every Ollama pool has an endpoint that is up.
+    """
+    from app.providers.llm.ollama_pool import pool_status, pools_available
+
+    providers = {registry.section_name.text: registry.status() for registry in _registries}
+    failed = any(s.startswith("failed") for statuses in providers.values() for s in statuses.values())
+    ready = _warm_up_state in ("done", "disabled") and not failed and pools_available()
+    return {
+        "ready": ready,
+        "warm_up": _warm_up_state,
+        "providers": providers,
+        "ollama_endpoints": pool_status(),
+    }
@@ -1,10 +1,54 @@
+import contextvars
 from abc import ABC, abstractmethod
-from typing import List
+from typing import List, Optional
 from app.core.models import PerSourceResult, QuestionInput
 
+# Title of the result SearXNG returns in place of its results when the search failed.
+SEARXNG_ERROR_TITLE = "SearXNG search error"
+
+# Set while the fused summary pipeline searches: the summary call picks the sources, so
+# providers that rerank with an LLM call return their top candidates unranked instead.
+_rerank_deferred: contextvars.ContextVar[bool] = contextvars.ContextVar("rerank_deferred", default=False)
+
+
+def defer_rerank(deferred: bool = True) -> contextvars.Token:
+    """
+    Defers LLM reranking for the searches of the current request. Returns a token for
+    reset_rerank.
+    """
+    return _rerank_deferred.set(deferred)
+
+
+def reset_rerank(token: contextvars.Token) -> None:
+    _rerank_deferred.reset(token)
+
+
+def rerank_deferred() -> bool:
+    return _rerank_deferred.get()
+
+
+def is_searxng_error_result(result: PerSourceResult) -> bool:
+    return result.source == "searxng" and result.title == SEARXNG_ERROR_TITLE
+
+
+def is_reusable_answer(per_source_results: List[PerSourceResult]) -> bool:
+    """
+    Whether an answer built from these results may be stored and served again (semantic
+    cache, history index): it has results, none came from the history index and none
+    stands for a failed SearXNG search.
+    """
+    if not per_source_results:
+        return False
+    return not any(r.source == "history" or is_searxng_error_result(r) for r in per_source_results)
+
 
 class SearchProvider(ABC):
     name: str = "base"
+    # Deadline used by the concurrent fan-out; set from ProviderInfo.timeout_seconds.
+    timeout_seconds: Optional[float] = None
+    # Providers that short-circuit run before the others; when they return results the
+    # remaining providers are skipped.
+    short_circuits: bool = False
 
     @abstractmethod
     def search(
@@ -16,3 +60,29 @@ class SearchProvider(ABC):
         Returns a list of PerSourceResult
         """
         raise NotImplementedError
+
+
+class AsyncSearchProvider(ABC):
+    name: str = "base"
+    # Deadline used by the concurrent fan-out; set from ProviderInfo.timeout_seconds.
+    timeout_seconds: Optional[float] = None
+    # Providers that short-circuit run before the others; when they return results the
+    # remaining providers are skipped.
+    short_circuits: bool = False
+
+    @abstractmethod
+    async def search(
+        self,
+        question: QuestionInput,
+        keyword_queries: str,
+    ) -> List[PerSourceResult]:
+        """
+        Async variant of SearchProvider.search, returning a list of PerSourceResult
+        """
+        raise NotImplementedError
+
+    async def warm_up(self) -> None:
+        """
+        Prepares the provider for its first call, e.g. loads its model into Ollama.
+        Called in the background at server startup; the default does nothing.
+        """
@@ -0,0 +1,78 @@
+"""
+BM25 search over the local Reddit corpus.
+
+The index is loaded from its snapshot (memory-mapped postings) at startup. When no snapshot
+exists yet but a corpus store does, the index is built from the store and saved once.
+"""
+import os
+from typing import List
+
+from app.core.models import PerSourceResult, QuestionInput
+from app.corpus.bm25 import BM25Index, build_from_corpus
+from app.corpus.store import CorpusStore
+from app.providers.comment_retrieval.arcticshift.comment_provider import \
+    build_comments_block
+from app.providers.search.base import AsyncSearchProvider, SearchProvider
+
+
+class BM25SearchProvider(SearchProvider):
+    name = "bm25"
+
+    def __init__(self, index: BM25Index, top_k: int = 3):
+        self.top_k = top_k
+        self.index = index
+
+    def search(self, question: QuestionInput, keyword_query: str) -> List[PerSourceResult]:
+        return bm25_results(self.index, question, keyword_query, self.top_k)
+
+
+class AsyncBM25SearchProvider(AsyncSearchProvider):
+    name = "bm25"
+
+    def __init__(self, index: BM25Index, top_k: int = 3):
+        self.top_k = top_k
+        self.index = index
+
+    async def search(self, question: QuestionInput, keyword_query: str) -> List[PerSourceResult]:
+        # In-memory scoring over memory-mapped postings; fast enough to run on the event loop.
+        return bm25_results(self.index, question, keyword_query, self.top_k)
+
+
+def load_bm25_index(directory: str, corpus_dir: str, sharded: bool = True) -> BM25Index:
+    """
+    Loads the snapshot in directory, building it from the corpus store when missing.
+    """
+    if os.path.exists(os.path.join(directory, "shards.json")):
+        return BM25Index.load(directory)
+    if not os.path.exists(os.path.join(corpus_dir, "manifest.json")):
+        return BM25Index(sharded=sharded)
+
+    index = build_from_corpus(CorpusStore(corpus_dir), sharded=sharded)
+    index.save(directory)
+    return BM25Index.load(directory)
+
+
+def bm25_results(
+    index: BM25Index,
+    question: QuestionInput,
+    keyword_query: str,
+    top_k: int,
+) -> List[PerSourceResult]:
+    """
+    Ranks keyword_query (or the title) within the question's subreddit shard when there is one.
+    """
+    matches = index.search(keyword_query or question.title, k=top_k, subreddit=question.source)
+
+    results: List[PerSourceResult] = []
+    for payload, _ in matches:
+        base_text = payload["selftext"] or payload["title"]
+        comments_block = build_comments_block(payload["comments"], payload["fullname"], top_n=5)
+        results.append(
+            PerSourceResult(
+                source="bm25:reddit",
+                url=payload["url"],
+                title=payload["title"],
+                summary=base_text + comments_block,
+            )
+        )
+    return results
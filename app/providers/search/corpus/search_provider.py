@@ -0,0 +1,70 @@
+"""
+Searches a local Reddit corpus built by app.corpus.ingest.
+
+Keyword lookups use the store's inverted index and top comments come from the store's
+comment columns, so no network calls are made.
+"""
+from typing import List, Optional
+
+import numpy as np
+
+from app.core.models import PerSourceResult, QuestionInput
+from app.corpus.keyword_index import KeywordIndex
+from app.corpus.store import CorpusStore
+from app.providers.comment_retrieval.arcticshift.comment_provider import \
+    build_comments_block
+from app.providers.search.base import AsyncSearchProvider, SearchProvider
+
+
+class CorpusSearchProvider(SearchProvider):
+    name = "corpus"
+
+    def __init__(self, directory: str, top_k: int = 3):
+        self.top_k = top_k
+        self.store = CorpusStore(directory)
+        self.index = KeywordIndex(directory, len(self.store))
+
+    def search(self, question: QuestionInput, keyword_query: str) -> List[PerSourceResult]:
+        return corpus_results(self.store, self.index, question, keyword_query, self.top_k)
+
+
+class AsyncCorpusSearchProvider(AsyncSearchProvider):
+    name = "corpus"
+
+    def __init__(self, directory: str, top_k: int = 3):
+        self.top_k = top_k
+        self.store = CorpusStore(directory)
+        self.index = KeywordIndex(directory, len(self.store))
+
+    async def search(self, question: QuestionInput, keyword_query: str) -> List[PerSourceResult]:
+        # Local memory-mapped reads; fast enough to run on the event loop.
+        return corpus_results(self.store, self.index, question, keyword_query, self.top_k)
+
+
+def corpus_results(
+    store: CorpusStore,
+    index: KeywordIndex,
+    question: QuestionInput,
+    keyword_query: str,
+    top_k: int,
+) -> List[PerSourceResult]:
+    """
+    Looks up keyword_query, restricted to the question's subreddit when the store has it.
+    """
+    mask: Optional[np.ndarray] = store.subreddit_mask(question.source) if question.source else None
+    matches = index.search(keyword_query or question.title, k=top_k, mask=mask)
+
+    results: List[PerSourceResult] = []
+    for row, _ in matches:
+        post = store.post(row)
+        base_text = post["selftext"] or post["title"]
+        comments_block = build_comments_block(store.top_comments(row), post["fullname"], top_n=5)
+        results.append(
+            PerSourceResult(
+                source="corpus:reddit",
+                url=post["url"],
+                title=post["title"],
+                summary=base_text + comments_block,
+            )
+        )
+    return results
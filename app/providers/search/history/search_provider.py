@@ -0,0 +1,121 @@
+"""
+Searches the local index of previously answered questions.
+
+A past question whose embedding is close enough to the new one is returned together
+with its final summary and the sources that answered it. The provider is marked as a
+short-circuit tier, so the search service skips the external providers when it finds
+a match. Only past questions from the same source are considered, as in the semantic cache.
+"""
+import logging
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from app.core.models import PerSourceResult, QuestionInput
+from app.providers.embedding.base import (AsyncEmbeddingProvider,
+                                          EmbeddingProvider, normalize_rows,
+                                          question_text)
+from app.providers.search.base import AsyncSearchProvider, SearchProvider
+from app.providers.search.history.vector_index import VectorIndex
+
+logger = logging.getLogger(__name__)
+
+
+class HistorySearchProvider(SearchProvider):
+    name = "history"
+    short_circuits = True
+
+    def __init__(self, index: VectorIndex, embedding_provider: EmbeddingProvider, threshold: float):
+        self.index = index
+        self.embedding_provider = embedding_provider
+        self.threshold = threshold
+
+    def search(self, question: QuestionInput, keyword_queries: str) -> List[PerSourceResult]:
+        if len(self.index) == 0:
+            return []
+
+        vector = normalize_rows(self.embedding_provider.embed([question_text(question)]))[0]
+
+        return history_results(self.index, vector, self.threshold, question.source)
+
+
+class AsyncHistorySearchProvider(AsyncSearchProvider):
+    name = "history"
+    short_circuits = True
+
+    def __init__(self, index: VectorIndex, embedding_provider: AsyncEmbeddingProvider, threshold: float):
+        self.index = index
+        self.embedding_provider = embedding_provider
+        self.threshold = threshold
+
+    async def search(self, question: QuestionInput, keyword_queries: str) -> List[PerSourceResult]:
+        if len(self.index) == 0:
+            return []
+
+        vector = normalize_rows(await self.embedding_provider.embed([question_text(question)]))[0]
+
+        return history_results(self.index, vector, self.threshold, question.source)
+
+    async def warm_up(self) -> None:
+        await self.embedding_provider.warm_up()
+
+
+def history_partition(source: Optional[str]) -> str:
+    """
+    The index partition of a question's source; the index is built with
+    partition_of=lambda record: history_partition(record.get("source")).
+    """
+    return (source or "").strip().lower()
+
+
+def history_results(
+    index: VectorIndex,
+    vector: np.ndarray,
+    threshold: float,
+    source: Optional[str],
+) -> List[PerSourceResult]:
+    """
+    Returns the best past match from the same source and its sources, or nothing if it is
+    below threshold.
+    """
+    matches = index.search(vector, k=1, partition=history_partition(source))
+    if not matches:
+        return []
+
+    record, similarity = matches[0]
+    if similarity < threshold:
+        return []
+
+    logger.info("History index matched a past question with similarity %.3f", similarity)
+
+    results = [
+        PerSourceResult(
+            source="history",
+            url=record.get("url"),
+            title=record.get("title"),
+            summary=record.get("final_summary", ""),
+        )
+    ]
+    results.extend(PerSourceResult(**r) for r in record.get("per_source_results", []))
+    return results
+
+
+def build_history_record(
+    question: QuestionInput,
+    final_summary: str,
+    per_source_results: List[PerSourceResult],
+) -> Dict[str, Any]:
+    """
+    The record stored next to a question's vector. Results that themselves came from the
+    history index are left out so records do not nest.
+    """
+    return {
+        "title": question.title,
+        "body": question.body,
+        "source": question.source,
+        "url": question.url,
+        "final_summary": final_summary,
+        "per_source_results": [
+            r.model_dump(mode="json") for r in per_source_results if r.source != "history"
+        ],
+    }
@@ -0,0 +1,260 @@
+"""
+Persistent approximate-nearest-neighbour index of unit vectors with a JSON record per vector.
+
+Layout of the index directory:
+    vectors.npy    float32 matrix opened as a memory map; rows past `count` are unused capacity
+    records.jsonl  one JSON record per vector, in the same order
+    meta.json      dimensions, count and the LSH parameters
+
+Lookups use random-hyperplane LSH: each of `num_tables` tables hashes a vector to
+`num_bits` sign bits, and candidates from matching buckets are scored exactly. Small
+indexes (below `exact_below` vectors) are scanned exhaustively instead.
+
+With a partition_of function, every record belongs to the partition it names (e.g. its
+source subreddit), and a search given a partition only scores vectors of that partition.
+
+Only one writer at a time: the first VectorIndex to open a directory takes an exclusive
+lock on writer.lock and keeps it while it lives. Indexes opened after it (e.g. by other
+uvicorn workers) are read-only snapshots; their add() raises ReadOnlyIndexError. Where
+file locks are not available (Windows), every process writes, so run a single worker.
+"""
+
+import json
+import logging
+import os
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+from numpy.lib.format import open_memmap
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+
+class ReadOnlyIndexError(RuntimeError):
+    """
+    add() was called on an index another process writes.
+    """
+
+
+class VectorIndex:
+    def __init__(
+        self,
+        directory: str,
+        num_tables: int = 8,
+        num_bits: int = 12,
+        exact_below: int = 4096,
+        seed: int = 42,
+        partition_of: Optional[Callable[[Dict[str, Any]], str]] = None,
+    ):
+        self.directory = directory
+        self.partition_of = partition_of
+        self.num_tables = num_tables
+        self.num_bits = num_bits
+        self.exact_below = exact_below
+        self.seed = seed
+
+        self.dimensions: Optional[int] = None
+        self.count = 0
+        self._vectors: Optional[np.memmap] = None
+        self._records: List[Dict[str, Any]] = []
+        self._planes: Optional[np.ndarray] = None
+        self._buckets: List[Dict[int, List[int]]] = [dict() for _ in range(num_tables)]
+        self._partitions: Dict[str, List[int]] = {}
+        self._lock = threading.Lock()
+
+        os.makedirs(directory, exist_ok=True)
+        self._writer_lock = self._lock_writer()
+        self.writable = self._writer_lock is not None or fcntl is None
+        if not self.writable:
+            logger.info("Index %s is written by another process; opened read-only", directory)
+        self._load()
+
+    def __len__(self) -> int:
+        return self.count
+
+    def add(self, vector: np.ndarray, record: Dict[str, Any]) -> int:
+        """
+        Appends a unit vector with its record and returns its id.
+        """
+        if not self.writable:
+            raise ReadOnlyIndexError(f"Index {self.directory} is written by another process.")
+        vector = np.asarray(vector, dtype=np.float32)
+        with self._lock:
+            if self.dimensions is None:
+                self._initialize(vector.shape[0])
+            if vector.shape[0] != self.dimensions:
+                raise ValueError(
+                    f"Vector has {vector.shape[0]} dimensions, index expects {self.dimensions}.")
+
+            self._ensure_capacity(self.count + 1)
+
+            with open(self._path("records.jsonl"), "a", encoding="utf-8") as f:
+                f.write(json.dumps(record) + "\n")
+            self._vectors[self.count] = vector
+            self._vectors.flush()
+
+            item_id = self.count
+            self._records.append(record)
+            self.count += 1
+            self._write_meta()
+            self._insert_buckets(item_id, vector[np.newaxis, :])
+            self._insert_partitions(item_id, [record])
+            return item_id
+
+    def search(
+        self,
+        vector: np.ndarray,
+        k: int = 1,
+        partition: Optional[str] = None,
+    ) -> List[Tuple[Dict[str, Any], float]]:
+        """
+        Returns up to k (record, cosine similarity) pairs, best first. With a partition,
+        only records of that partition are considered.
+        """
+        vector = np.asarray(vector, dtype=np.float32)
+        with self._lock:
+            if self.count == 0 or vector.shape[0] != self.dimensions:
+                return []
+
+            members = None
+            if partition is not None:
+                members = np.asarray(self._partitions.get(partition, ()), dtype=np.int64)
+                if members.size == 0:
+                    return []
+
+            if self.count < self.exact_below:
+                candidates = members if members is not None else np.arange(self.count)
+            else:
+                candidates = self._candidates(vector)
+                if members is not None:
+                    candidates = candidates[np.isin(candidates, members)]
+            if candidates.size == 0:
+                return []
+
+            scores = self._vectors[candidates] @ vector
+            order = np.argsort(-scores, kind="stable")[:k]
+            return [(self._records[int(candidates[i])], float(scores[i])) for i in order]
+
+    def _candidates(self, vector: np.ndarray) -> np.ndarray:
+        codes = self._hash(vector[np.newaxis, :])[0]
+        ids = set()
+        for table, code in enumerate(codes):
+            ids.update(self._buckets[table].get(int(code), ()))
+        return np.fromiter(sorted(ids), dtype=np.int64, count=len(ids))
+
+    def _hash(self, vectors: np.ndarray) -> np.ndarray:
+        """
+        Returns a (len(vectors), num_tables) array of integer bucket codes.
+        """
+        bits = (np.einsum("nd,tbd->ntb", vectors, self._planes) > 0).astype(np.int64)
+        weights = 1 << np.arange(self.num_bits, dtype=np.int64)
+        return bits @ weights
+
+    def _insert_buckets(self, first_id: int, vectors: np.ndarray) -> None:
+        codes = self._hash(vectors)
+        for offset, row in enumerate(codes):
+            for table, code in enumerate(row):
+                self._buckets[table].setdefault(int(code), []).append(first_id + offset)
+
+    def _insert_partitions(self, first_id: int, records: List[Dict[str, Any]]) -> None:
+        if self.partition_of is None:
+            return
+        for offset, record in enumerate(records):
+            self._partitions.setdefault(self.partition_of(record), []).append(first_id + offset)
+
+    def _initialize(self, dimensions: int) -> None:
+        self._initialize_planes(dimensions)
+        self._vectors = open_memmap(
+            self._path("vectors.npy"), mode="w+", dtype=np.float32, shape=(64, dimensions))
+
+    def _ensure_capacity(self, needed: int) -> None:
+        capacity = self._vectors.shape[0]
+        if needed <= capacity:
+            return
+
+        while capacity < needed:
+            capacity *= 2
+        tmp_path = self._path("vectors.npy.tmp")
+        grown = open_memmap(tmp_path, mode="w+", dtype=np.float32, shape=(capacity, self.dimensions))
+        grown[: self.count] = self._vectors[: self.count]
+        grown.flush()
+        del grown
+        self._vectors = None
+        os.replace(tmp_path, self._path("vectors.npy"))
+        self._vectors = np.load(self._path("vectors.npy"), mmap_mode="r+")
+
+    def _load(self) -> None:
+        meta_path = self._path("meta.json")
+        if not os.path.exists(meta_path):
+            return
+
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        self.num_tables = meta["num_tables"]
+        self.num_bits = meta["num_bits"]
+        self.seed = meta["seed"]
+        self._buckets = [dict() for _ in range(self.num_tables)]
+        self._initialize_planes(meta["dimensions"])
+        self._vectors = np.load(self._path("vectors.npy"), mmap_mode="r+" if self.writable else "r")
+
+        with open(self._path("records.jsonl"), "r", encoding="utf-8") as f:
+            records = [json.loads(line) for line in f if line.strip()]
+
+        # A crash between writing a record and updating meta.json leaves extra records.
+        # They are dropped from the file too, so the next add() lines up with its vector.
+        self.count = min(meta["count"], len(records))
+        self._records = records[: self.count]
+        if len(records) > self.count and self.writable:
+            self._write_records()
+        if self.count:
+            self._insert_buckets(0, np.asarray(self._vectors[: self.count]))
+            self._insert_partitions(0, self._records)
+
+    def _lock_writer(self) -> Optional[Any]:
+        """
+        Takes the index's writer lock without waiting. Returns the open lock file, or None
+        if another process holds the lock or file locks are not available.
+        """
+        if fcntl is None:
+            return None
+        lock_file = open(self._path("writer.lock"), "a")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return None
+        return lock_file
+
+    def _initialize_planes(self, dimensions: int) -> None:
+        self.dimensions = dimensions
+        rng = np.random.default_rng(self.seed)
+        self._planes = rng.standard_normal(
+            (self.num_tables, self.num_bits, dimensions)).astype(np.float32)
+
+    def _write_records(self) -> None:
+        tmp_path = self._path("records.jsonl.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.writelines(json.dumps(record) + "\n" for record in self._records)
+        os.replace(tmp_path, self._path("records.jsonl"))
+
+    def _write_meta(self) -> None:
+        meta = {
+            "dimensions": self.dimensions,
+            "count": self.count,
+            "num_tables": self.num_tables,
+            "num_bits": self.num_bits,
+            "seed": self.seed,
+        }
+        tmp_path = self._path("meta.json.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, self._path("meta.json"))
+
+    def _path(self, filename: str) -> str:
+        return os.path.join(self.directory, filename)
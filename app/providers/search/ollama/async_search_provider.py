@@ -0,0 +1,41 @@
+"""
+Async variant of the Ollama LLM search provider, built on the async Ollama endpoint pool.
+"""
+from typing import List, Optional
+
+from app.core.models import PerSourceResult, QuestionInput
+from app.providers.llm.call_cache import (LlmCallCache,
+                                          chat_with_cache_async)
+from app.providers.llm.ollama_pool import (AsyncOllamaPool,
+                                            async_ollama_pool_for)
+from app.providers.search.base import AsyncSearchProvider
+from app.providers.search.ollama.search_provider import (
+    build_llm_answer_results, build_search_messages)
+
+
+class AsyncOllamaLlmSearchProvider(AsyncSearchProvider):
+    name = "ollama_llm"
+
+    def __init__(
+        self,
+        model_name: str = "llama3.1",
+        llm_cache: Optional[LlmCallCache] = None,
+        client: Optional[AsyncOllamaPool] = None,
+    ):
+        self.model_name = model_name
+        self.llm_cache = llm_cache
+        self._client = client or async_ollama_pool_for()
+
+    async def search(self, question: QuestionInput, keyword_queries: str) -> List[PerSourceResult]:
+        resp = await chat_with_cache_async(
+            self.llm_cache,
+            self._client.chat,
+            model=self.model_name,
+            messages=build_search_messages(question, keyword_queries),
+            stage="search_llm",
+        )
+
+        return build_llm_answer_results(resp["message"]["content"])
+
+    async def warm_up(self) -> None:
+        await self._client.preload(self.model_name)
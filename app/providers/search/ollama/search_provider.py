@@ -1,45 +1,62 @@
 """
 Generates answers using an Ollama LLM model based on the provided question and keyword queries.
 """
-from typing import List
-
-from ollama import chat
+from typing import Dict, List, Optional
 
 from app.core.models import PerSourceResult, QuestionInput
-from app.core.template_loader import load_template
+from app.providers.llm.call_cache import LlmCallCache, chat_with_cache
+from app.providers.llm.ollama_pool import OllamaPool, ollama_pool_for
+from app.providers.llm.prompts import prompt_messages
 from app.providers.search.base import SearchProvider
 
 
 class OllamaLlmSearchProvider(SearchProvider):
     name = "ollama_llm"
 
-    def __init__(self, model_name: str = "llama3.1"):
+    def __init__(
+        self,
+        model_name: str = "llama3.1",
+        llm_cache: Optional[LlmCallCache] = None,
+        client: Optional[OllamaPool] = None,
+    ):
         self.model_name = model_name
-        self.prompt_template = load_template("llm_search_prompt.txt")
+        self.llm_cache = llm_cache
+        self._client = client or ollama_pool_for()
 
     def search(self, question: QuestionInput, keyword_queries: str) -> List[PerSourceResult]:
-        user_content = (
-            f"Title: {question.title}\n"
-            f"Body: {question.body or ''}\n\n"
-            f"Keyword queries:\n{keyword_queries}\n\n"
-            "Answer this question as best as you can based on your own knowledge."
-        )
-
-        resp = chat(
+        resp = chat_with_cache(
+            self.llm_cache,
+            self._client.chat,
             model=self.model_name,
-            messages=[
-                {"role": "system", "content": self.prompt_template},
-                {"role": "user", "content": user_content},
-            ],
+            messages=build_search_messages(question, keyword_queries),
         )
 
-        answer = resp["message"]["content"]
-
-        return [
-            PerSourceResult(
-                source="llm:ollama",
-                url=None,
-                title="LLM internal answer",
-                summary=answer,
-            )
-        ]
+        return build_llm_answer_results(resp["message"]["content"])
+
+
+def build_search_messages(
+    question: QuestionInput,
+    keyword_queries: str,
+) -> List[Dict[str, str]]:
+    """
+    Builds the chat messages for the LLM answer. Shared by the sync and async providers.
+    """
+    user_content = (
+        f"Title: {question.title}\n"
+        f"Body: {question.body or ''}\n\n"
+        f"Keyword queries:\n{keyword_queries}\n\n"
+        "Answer this question as best as you can based on your own knowledge."
+    )
+
+    return prompt_messages("llm_search_prompt.txt", user_content)
+
+
+def build_llm_answer_results(answer: str) -> List[PerSourceResult]:
+    return [
+        PerSourceResult(
+            source="llm:ollama",
+            url=None,
+            title="LLM internal answer",
+            summary=answer,
+        )
+    ]
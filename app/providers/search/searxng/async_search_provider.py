@@ -0,0 +1,113 @@
+"""
+Async variant of the SearXNG search provider, built on the shared async HTTP client and
+the async Ollama rerankers.
+"""
+import logging
+from typing import Any, Dict, List, Optional
+
+from app.core.config import PIPELINE_SETTINGS
+from app.core.http_client import get_async_http_client
+from app.core.models import PerSourceResult, QuestionInput
+from app.core.single_flight import AsyncSingleFlight
+from app.core.telemetry import timed
+from app.providers.comment_retrieval.arcticshift.comment_client import \
+    AsyncArcticShiftCommentClient
+from app.providers.embedding.base import AsyncEmbeddingProvider
+from app.providers.llm.call_cache import LlmCallCache
+from app.providers.llm.ollama_pool import (AsyncOllamaPool,
+                                            async_ollama_pool_for)
+from app.providers.search.base import AsyncSearchProvider, rerank_deferred
+from app.providers.search.searxng.embedding_ranker import \
+    rerank_reddit_results_by_embedding_async
+from app.providers.search.searxng.ollama_ranker import \
+    rerank_reddit_results_async
+from app.providers.search.searxng.search_provider import (
+    SEARXNG_BASE_URL, build_reddit_result, link_reddit_items,
+    searx_results_from_payload, searxng_error_result, searxng_search_params)
+
+logger = logging.getLogger(__name__)
+
+# Identical concurrent queries (e.g. from "searxng" and "searxng_embedding") share one request.
+_searx_flights: AsyncSingleFlight[List[Dict[str, Any]]] = AsyncSingleFlight()
+
+
+class AsyncSearXNGSearchProvider(AsyncSearchProvider):
+    name = "searxng"
+
+    def __init__(
+        self,
+        model_name: str = "llama3.1",
+        llm_cache: Optional[LlmCallCache] = None,
+        embedding_provider: Optional[AsyncEmbeddingProvider] = None,
+        client: Optional[AsyncOllamaPool] = None,
+    ):
+        """
+        Results are reranked by an LLM call to model_name, or by embedding similarity when
+        an embedding_provider is given.
+        """
+        self.model_name = model_name
+        self.llm_cache = llm_cache
+        self.embedding_provider = embedding_provider
+        self._client = client or async_ollama_pool_for()
+        self._comment_client = AsyncArcticShiftCommentClient()
+
+    async def search(self, question: QuestionInput, keyword_query: str) -> List[PerSourceResult]:
+        results: List[PerSourceResult] = []
+
+        try:
+            searx_results = await _searx_flights.do(keyword_query, lambda: self._fetch_results(keyword_query))
+
+            with timed("rerank"):
+                top_raw = await self._rerank(question, searx_results)
+
+            logger.debug("SearXNG kept %d results after reranking.", len(top_raw))
+
+            linked = link_reddit_items(top_raw)
+            with timed("comments"):
+                comments_by_link = await self._comment_client.fetch_many(
+                    link_fullname for link_fullname, _ in linked
+                )
+            for link_fullname, item in linked:
+                results.append(build_reddit_result(item, link_fullname, comments_by_link[link_fullname]))
+
+        except Exception as e:
+            results.append(searxng_error_result(e))
+
+        return results
+
+    async def warm_up(self) -> None:
+        if self.embedding_provider is not None:
+            await self.embedding_provider.warm_up()
+        else:
+            await self._client.preload(self.model_name)
+
+    async def _fetch_results(self, keyword_query: str) -> List[Dict[str, Any]]:
+        resp = await get_async_http_client().get(
+            f"{SEARXNG_BASE_URL}/search",
+            params=searxng_search_params(keyword_query),
+        )
+        resp.raise_for_status()
+        return searx_results_from_payload(resp.json())
+
+    async def _rerank(
+        self,
+        question: QuestionInput,
+        searx_results: List[Dict[str, Any]],
+    ) -> List[Dict[str, Any]]:
+        if self.embedding_provider is None and rerank_deferred():
+            # The fused summary call picks the posts; it gets the top candidates instead.
+            return searx_results[:PIPELINE_SETTINGS.fused_max_candidates]
+        if self.embedding_provider is not None:
+            return await rerank_reddit_results_by_embedding_async(
+                question=question,
+                raw_results=searx_results,
+                embedding_provider=self.embedding_provider,
+            )
+
+        return await rerank_reddit_results_async(
+            question=question,
+            raw_results=searx_results,
+            model=self.model_name,
+            client=self._client,
+            llm_cache=self.llm_cache,
+        )
@@ -0,0 +1,81 @@
+"""
+Reranks Reddit search results from SearXNG by embedding similarity to the question.
+
+The question and every result's title + snippet are embedded in one batched call and
+scored with cosine similarity. Ties keep SearXNG's order, so the output is deterministic.
+"""
+
+import logging
+from typing import Any, Dict, List
+
+import numpy as np
+
+from app.core.models import QuestionInput
+from app.providers.embedding.base import (AsyncEmbeddingProvider,
+                                          EmbeddingProvider, normalize_rows)
+
+logger = logging.getLogger(__name__)
+
+
+def rerank_reddit_results_by_embedding(
+    question: QuestionInput,
+    raw_results: List[Dict[str, Any]],
+    embedding_provider: EmbeddingProvider,
+    top_k: int = 3,
+) -> List[Dict[str, Any]]:
+    if not raw_results:
+        return []
+
+    vectors = embedding_provider.embed(build_rank_texts(question, raw_results))
+
+    return select_by_similarity(vectors, raw_results, top_k)
+
+
+async def rerank_reddit_results_by_embedding_async(
+    question: QuestionInput,
+    raw_results: List[Dict[str, Any]],
+    embedding_provider: AsyncEmbeddingProvider,
+    top_k: int = 3,
+) -> List[Dict[str, Any]]:
+    """
+    Async variant of rerank_reddit_results_by_embedding.
+    """
+    if not raw_results:
+        return []
+
+    vectors = await embedding_provider.embed(build_rank_texts(question, raw_results))
+
+    return select_by_similarity(vectors, raw_results, top_k)
+
+
+def build_rank_texts(question: QuestionInput, raw_results: List[Dict[str, Any]]) -> List[str]:
+    """
+    The question text first, followed by one text per result.
+    """
+    question_text = question.title
+    if question.body:
+        question_text += "\n\n" + question.body
+
+    texts = [question_text]
+    for item in raw_results:
+        title = item.get("title") or ""
+        snippet = item.get("content") or ""
+        texts.append(f"{title}\n{snippet}".strip())
+    return texts
+
+
+def select_by_similarity(
+    vectors: np.ndarray,
+    raw_results: List[Dict[str, Any]],
+    top_k: int,
+) -> List[Dict[str, Any]]:
+    if vectors.shape[0] != len(raw_results) + 1:
+        return raw_results[:top_k]
+
+    unit = normalize_rows(vectors)
+    scores = unit[1:] @ unit[0]
+    order = np.argsort(-scores, kind="stable")[:top_k]
+
+    logger.debug("Embedding reranker selected indices: %s", [int(i) + 1 for i in order])
+
+    return [raw_results[int(i)] for i in order]
@@ -3,24 +3,84 @@ Uses Ollama LLM to rerank Reddit search results from SearXNG.
 """
 
 import json
-from typing import Any, Dict, List
-
-from ollama import chat
+import logging
+from typing import Any, Dict, List, Optional
 
+from app.core.admission import Overloaded
 from app.core.models import QuestionInput
-from app.core.template_loader import load_template
+from app.providers.llm.call_cache import (LlmCallCache, chat_with_cache,
+                                          chat_with_cache_async)
+from app.providers.llm.ollama_pool import AsyncOllamaPool, OllamaPool
+from app.providers.llm.prompts import templated_messages
+
+logger = logging.getLogger(__name__)
 
-MODEL_NAME = "llama3.1"  # or whatever you use in your project
+RERANK_OPTIONS: Dict[str, Any] = {
+    "temperature": 0,
+    "top_p": 1,
+    "top_k": 0,
+    "seed": 42,
+}
 
 
 def rerank_reddit_results(
     question: QuestionInput,
     raw_results: List[Dict[str, Any]],
+    model: str,
+    client: OllamaPool,
+    top_k: int = 3,
+    llm_cache: Optional[LlmCallCache] = None,
+) -> List[Dict[str, Any]]:
+    if not raw_results:
+        return []
+
+    resp = chat_with_cache(
+        llm_cache,
+        client.chat,
+        model=model,
+        messages=build_rerank_messages(question, raw_results, top_k),
+        options=RERANK_OPTIONS,
+    )
+
+    return parse_rerank_response(resp["message"]["content"], raw_results, top_k)
+
+
+async def rerank_reddit_results_async(
+    question: QuestionInput,
+    raw_results: List[Dict[str, Any]],
+    model: str,
+    client: AsyncOllamaPool,
     top_k: int = 3,
+    llm_cache: Optional[LlmCallCache] = None,
 ) -> List[Dict[str, Any]]:
+    """
+    Async variant of rerank_reddit_results, built on the async Ollama endpoint pool.
+    """
     if not raw_results:
         return []
 
+    try:
+        resp = await chat_with_cache_async(
+            llm_cache,
+            client.chat,
+            model=model,
+            messages=build_rerank_messages(question, raw_results, top_k),
+            options=RERANK_OPTIONS,
+            stage="rerank",
+        )
+    except Overloaded as e:
+        # Reranking only improves the order; under overload keep the search engine's.
+        logger.info("Skipping rerank: %s", e)
+        return raw_results[:top_k]
+
+    return parse_rerank_response(resp["message"]["content"], raw_results, top_k)
+
+
+def build_rerank_messages(
+    question: QuestionInput,
+    raw_results: List[Dict[str, Any]],
+    top_k: int,
+) -> List[Dict[str, str]]:
     question_text = question.title
     if getattr(question, "body", None):
         question_text += "\n\n" + question.body
@@ -37,26 +97,21 @@ def rerank_reddit_results(
         )
     items_text = "\n\n".join(items_text_lines)
 
-    template = load_template("llm_rerank_prompt.txt")
-
-    prompt = template.format(
+    return templated_messages(
+        "llm_rerank_prompt.txt",
+        "llm_rerank_input.txt",
         question_text=question_text,
         items_text=items_text,
         top_k=top_k,
     )
 
-    resp = chat(
-        model=MODEL_NAME,
-        messages=[{"role": "user", "content": prompt}],
-        options={
-            "temperature": 0,
-            "top_p": 1,
-            "top_k": 0,
-            "seed": 42,
-        },
-    )
 
-    text = resp["message"]["content"].strip()
+def parse_rerank_response(
+    content: str,
+    raw_results: List[Dict[str, Any]],
+    top_k: int,
+) -> List[Dict[str, Any]]:
+    text = content.strip()
 
     try:
         indices = json.loads(text)
@@ -65,7 +120,7 @@ def rerank_reddit_results(
     except Exception:
         return raw_results[:top_k]
 
-    print(f"Reranker selected indices: {indices}")
+    logger.debug("Reranker selected indices: %s", indices)
 
     chosen = []
     for idx in indices:
@@ -1,86 +1,173 @@
 """
-Searches Reddit topics using a SearXNG instance, ranks them with Ollama,
-and fetches top-level comments with ArcticShift.
+Searches Reddit topics using a SearXNG instance, ranks them with Ollama
+(either an LLM pick or embedding similarity), and fetches top-level comments
+with ArcticShift.
 """
-from typing import List, Optional
+import logging
+from typing import Any, Dict, List, Optional, Tuple
 from urllib.parse import urlparse
 
-import requests
-
+from app.core.config import PIPELINE_SETTINGS
+from app.core.http_client import get_http_client
 from app.core.models import PerSourceResult, QuestionInput
-from app.providers.comment_retrieval.arcticshift.comment_provider import (
-    build_comments_block, fetch_top_level_comments)
-from app.providers.search.base import SearchProvider
+from app.core.single_flight import SingleFlight
+from app.core.telemetry import timed
+from app.providers.comment_retrieval.arcticshift.comment_client import \
+    ArcticShiftCommentClient
+from app.providers.comment_retrieval.arcticshift.comment_provider import \
+    build_comments_block
+from app.providers.embedding.base import EmbeddingProvider
+from app.providers.llm.call_cache import LlmCallCache
+from app.providers.llm.ollama_pool import OllamaPool, ollama_pool_for
+from app.providers.search.base import (SEARXNG_ERROR_TITLE, SearchProvider,
+                                       rerank_deferred)
+from app.providers.search.searxng.embedding_ranker import \
+    rerank_reddit_results_by_embedding
 from app.providers.search.searxng.ollama_ranker import rerank_reddit_results
 
-SEARXNG_BASE_URL = "http://localhost:8888"
+logger = logging.getLogger(__name__)
+
+SEARXNG_BASE_URL = PIPELINE_SETTINGS.searxng_base_url.rstrip("/")
+# Source of the results built from Reddit posts.
+REDDIT_SOURCE = "searxng:reddit"
+
+# Identical concurrent queries (e.g. from "searxng" and "searxng_embedding") share one request.
+_searx_flights: SingleFlight[List[Dict[str, Any]]] = SingleFlight()
+
 
 class SearXNGSearchProvider(SearchProvider):
     name = "searxng"
 
+    def __init__(
+        self,
+        model_name: str = "llama3.1",
+        llm_cache: Optional[LlmCallCache] = None,
+        embedding_provider: Optional[EmbeddingProvider] = None,
+        client: Optional[OllamaPool] = None,
+    ):
+        """
+        Results are reranked by an LLM call to model_name, or by embedding similarity when
+        an embedding_provider is given.
+        """
+        self.model_name = model_name
+        self.llm_cache = llm_cache
+        self.embedding_provider = embedding_provider
+        self._client = client or ollama_pool_for()
+        self._comment_client = ArcticShiftCommentClient()
+
     def search(self, question: QuestionInput, keyword_query: str) -> List[PerSourceResult]:
         results: List[PerSourceResult] = []
 
         try:
-            resp = requests.get(
-                f"{SEARXNG_BASE_URL}/search",
-                params={
-                    "q": keyword_query,
-                    "format": "json",
-                    "engines": "reddit",
-                },
-                timeout=15,
-            )
-            resp.raise_for_status()
-            data = resp.json()
+            searx_results = _searx_flights.do(keyword_query, lambda: self._fetch_results(keyword_query))
 
-            searx_results = data.get("results", [])
-            
-            print(f"SearXNG returned {len(searx_results)} searx_results results.")
+            with timed("rerank"):
+                top_raw = self._rerank(question, searx_results)
             
-            if not isinstance(searx_results, list):
-                searx_results = []
+            logger.debug("SearXNG kept %d results after reranking.", len(top_raw))
 
-            top_raw = rerank_reddit_results(
-                question=question,
-                raw_results=searx_results,
-            )
-            
-            print(f"SearXNG returned {len(top_raw)} top_raw results.")
-
-            for item in top_raw:
-                url = item.get("url")
-                topic_id = extract_reddit_topic_id(url or "")
-                if topic_id:
-                    link_fullname = reddit_post_id_to_fullname(topic_id)
-                    comments = fetch_top_level_comments(link_fullname)
-
-                    comments_block = build_comments_block(comments, link_fullname, top_n=5)
-
-                    base_text = item.get("content") or item.get("title") or ""
-                    summary_text = base_text + comments_block
-                    
-                    results.append(
-                        PerSourceResult(
-                            source="searxng:reddit",
-                            url=url,
-                            title=item.get("title"),
-                            summary=summary_text,
-                        )
-                    )
+            linked = link_reddit_items(top_raw)
+            with timed("comments"):
+                comments_by_link = self._comment_client.fetch_many(
+                    link_fullname for link_fullname, _ in linked
+                )
+            for link_fullname, item in linked:
+                results.append(build_reddit_result(item, link_fullname, comments_by_link[link_fullname]))
 
         except Exception as e:
-            results.append(
-                PerSourceResult(
-                    source="searxng",
-                    url=None,
-                    title="SearXNG search error",
-                    summary=str(e),
-                )
-            )
+            results.append(searxng_error_result(e))
 
         return results
 
+    def _fetch_results(self, keyword_query: str) -> List[Dict[str, Any]]:
+        resp = get_http_client().get(
+            f"{SEARXNG_BASE_URL}/search",
+            params=searxng_search_params(keyword_query),
+        )
+        resp.raise_for_status()
+        return searx_results_from_payload(resp.json())
+
+    def _rerank(self, question: QuestionInput, searx_results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        if self.embedding_provider is None and rerank_deferred():
+            # The fused summary call picks the posts; it gets the top candidates instead.
+            return searx_results[:PIPELINE_SETTINGS.fused_max_candidates]
+        if self.embedding_provider is not None:
+            return rerank_reddit_results_by_embedding(
+                question=question,
+                raw_results=searx_results,
+                embedding_provider=self.embedding_provider,
+            )
+
+        return rerank_reddit_results(
+            question=question,
+            raw_results=searx_results,
+            model=self.model_name,
+            client=self._client,
+            llm_cache=self.llm_cache,
+        )
+
+
+def searxng_search_params(keyword_query: str) -> Dict[str, str]:
+    return {
+        "q": keyword_query,
+        "format": "json",
+        "engines": "reddit",
+    }
+
+
+def searx_results_from_payload(data: Dict[str, Any]) -> List[Dict[str, Any]]:
+    searx_results = data.get("results", [])
+
+    logger.debug("SearXNG returned %d results.", len(searx_results))
+
+    if not isinstance(searx_results, list):
+        searx_results = []
+
+    return searx_results
+
+
+def link_reddit_items(items: List[Dict[str, Any]]) -> List[Tuple[str, Dict[str, Any]]]:
+    """
+    Pairs each SearXNG result that points at a Reddit post with the post's fullname.
+    Results that are not Reddit posts are dropped.
+    """
+    linked = []
+    for item in items:
+        topic_id = extract_reddit_topic_id(item.get("url") or "")
+        if topic_id:
+            linked.append((reddit_post_id_to_fullname(topic_id), item))
+    return linked
+
+
+def build_reddit_result(
+    item: Dict[str, Any],
+    link_fullname: str,
+    comments: List[Dict[str, Any]],
+) -> PerSourceResult:
+    """
+    Combines a SearXNG result with its top-level comments into a PerSourceResult.
+    """
+    comments_block = build_comments_block(comments, link_fullname, top_n=5)
+
+    base_text = item.get("content") or item.get("title") or ""
+    summary_text = base_text + comments_block
+
+    return PerSourceResult(
+        source=REDDIT_SOURCE,
+        url=item.get("url"),
+        title=item.get("title"),
+        summary=summary_text,
+    )
+
+
+def searxng_error_result(e: Exception) -> PerSourceResult:
+    return PerSourceResult(
+        source="searxng",
+        url=None,
+        title=SEARXNG_ERROR_TITLE,
+        summary=str(e),
+    )
+
 def reddit_post_id_to_fullname(post_id: str) -> str:
     return f"t3_{post_id}"
 
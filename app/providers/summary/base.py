@@ -1,7 +1,7 @@
 from abc import ABC, abstractmethod
-from typing import Any, Dict, List, Optional
+from typing import Any, AsyncIterator, Dict, List, Optional
 
-from app.core.models import AggregatedAnswer, PerSourceResult
+from app.core.models import AggregatedAnswer, FusedAnswer, PerSourceResult
 
 
 class SummaryProvider(ABC):
@@ -22,3 +22,66 @@ class SummaryProvider(ABC):
           - per_source_results: the same list we received (or enriched)
         """
         raise NotImplementedError
+
+
+class AsyncSummaryProvider(ABC):
+    name: str = "base"
+
+    @abstractmethod
+    async def summarize(
+        self,
+        question: Dict[str, Any],
+        queries: Dict[str, Any],
+        per_source_results: List[PerSourceResult],
+        *,
+        extra_context: Optional[Dict[str, Any]] = None,
+    ) -> AggregatedAnswer:
+        """
+        Async variant of SummaryProvider.summarize, returning an AggregatedAnswer.
+        """
+        raise NotImplementedError
+
+    async def summarize_stream(
+        self,
+        question: Dict[str, Any],
+        queries: Dict[str, Any],
+        per_source_results: List[PerSourceResult],
+        *,
+        extra_context: Optional[Dict[str, Any]] = None,
+    ) -> AsyncIterator[str]:
+        """
+        Yields the final summary in pieces as it is generated.
+
+        Providers that cannot stream inherit this version, which yields the whole
+        summary once.
+        """
+        aggregated = await self.summarize(
+            question, queries, per_source_results, extra_context=extra_context)
+        yield aggregated.final_summary
+
+    async def summarize_fused(
+        self,
+        question: Dict[str, Any],
+        queries: Dict[str, Any],
+        per_source_results: List[PerSourceResult],
+        *,
+        top_k: int = 3,
+    ) -> FusedAnswer:
+        """
+        Selects at most top_k of the unranked Reddit posts and summarizes in one call
+        (PIPELINE_SETTINGS.summary_mode "fused").
+
+        Providers without structured output inherit this version, which summarizes and
+        keeps every source.
+        """
+        aggregated = await self.summarize(question, queries, per_source_results)
+        return FusedAnswer(
+            final_summary=aggregated.final_summary,
+            per_source_results=aggregated.per_source_results,
+        )
+
+    async def warm_up(self) -> None:
+        """
+        Prepares the provider for its first call, e.g. loads its model into Ollama.
+        Called in the background at server startup; the default does nothing.
+        """
@@ -0,0 +1,240 @@
+"""
+Packs search evidence into a token budget for the summary prompt.
+
+Each PerSourceResult.summary is split into sentences (its snippet) and comments (the
+"Top comments" bullets). Sentences that repeat another source nearly word for word are
+dropped, the rest are ranked by TF-IDF overlap with the question and keyword query, and
+the best are kept until the budget is used: first the best sentence of every source, then
+the highest scoring remainder. A source's header counts against the budget once its first
+sentence is kept, and the best sentence of the top-scoring source is always kept, so a
+tight budget still yields some evidence. Kept sentences are written back in their original
+order under their source's header, so the prompt reads like the unpacked evidence, only
+shorter.
+
+Token counts are estimated (about four characters per token); no tokenizer is loaded.
+"""
+
+import math
+import re
+from collections import Counter
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+from app.core.models import PerSourceResult
+from app.corpus.text import index_terms, tokenize
+
+COMMENTS_MARKER = "\n\nTop comments:\n"
+NO_EVIDENCE = "No detailed results were available to summarize."
+
+_SENTENCE_BREAK = re.compile(r"(?<=[.!?])\s+|\n+")
+
+
+@dataclass
+class _Sentence:
+    source_index: int
+    position: int
+    text: str
+    group: int  # 0 for the snippet, n for the n-th comment
+    tokens: int
+    terms: Set[str]
+    score: float = 0.0
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + 3) // 4
+
+
+def format_evidence(per_source_results: Sequence[PerSourceResult], numbered: bool = False) -> str:
+    """
+    The unpacked evidence: one "[source] header: summary" line per result, prefixed with
+    "#n " (from 1, in list order) when numbered.
+    """
+    headers = _headers(per_source_results, numbered)
+    lines = [f"{header} {src.summary}" for header, src in zip(headers, per_source_results)]
+    combined = "\n".join(lines)
+    return combined if combined.strip() else NO_EVIDENCE
+
+
+def pack_evidence(
+    question_text: str,
+    per_source_results: Sequence[PerSourceResult],
+    token_budget: int,
+    duplicate_threshold: float = 0.8,
+    numbered: bool = False,
+) -> str:
+    """
+    Returns the evidence text for the prompt, at most about token_budget tokens, or just
+    the single best sentence when that alone exceeds it. A budget of 0 or less disables
+    packing. Numbers stay those of the unpacked evidence
+    when a source is left out.
+    """
+    unpacked = format_evidence(per_source_results, numbered)
+    if token_budget <= 0 or estimate_tokens(unpacked) <= token_budget:
+        return unpacked
+
+    headers = _headers(per_source_results, numbered)
+    sentences = _deduplicate(_split_sentences(per_source_results), duplicate_threshold)
+    _score(sentences, question_text)
+
+    header_tokens = [estimate_tokens(h) + 1 for h in headers]
+    remaining = token_budget
+    kept: Set[Tuple[int, int]] = set()
+    kept_sources: Set[int] = set()
+
+    best_per_source: Dict[int, _Sentence] = {}
+    for sentence in sentences:
+        best = best_per_source.get(sentence.source_index)
+        if best is None or sentence.score > best.score:
+            best_per_source[sentence.source_index] = sentence
+
+    first_pass = sorted(best_per_source.values(), key=lambda s: -s.score)
+    rest = sorted(sentences, key=lambda s: -s.score)
+    for sentence in first_pass + rest:
+        key = (sentence.source_index, sentence.position)
+        cost = sentence.tokens
+        if sentence.source_index not in kept_sources:
+            cost += header_tokens[sentence.source_index]
+        if key in kept or (cost > remaining and kept):
+            continue
+        kept.add(key)
+        kept_sources.add(sentence.source_index)
+        remaining -= cost
+
+    return _assemble(headers, [s for s in sentences if (s.source_index, s.position) in kept])
+
+
+def _headers(per_source_results: Sequence[PerSourceResult], numbered: bool) -> List[str]:
+    headers = [f"[{src.source}] {_header(src)}:" for src in per_source_results]
+    if numbered:
+        headers = [f"#{i} {header}" for i, header in enumerate(headers, start=1)]
+    return headers
+
+
+def _header(src: PerSourceResult) -> str:
+    parts: List[str] = []
+    if src.title:
+        parts.append(src.title)
+    if src.url:
+        parts.append(f"({src.url})")
+    return " ".join(parts) if parts else src.source
+
+
+def _split_sentences(per_source_results: Sequence[PerSourceResult]) -> List[_Sentence]:
+    sentences: List[_Sentence] = []
+    for source_index, src in enumerate(per_source_results):
+        body, _, comments_text = src.summary.partition(COMMENTS_MARKER)
+        pieces = [(text, 0) for text in _SENTENCE_BREAK.split(body)]
+        for group, comment in enumerate(comments_text.split("\n- "), start=1):
+            comment = comment[2:] if comment.startswith("- ") else comment
+            pieces.extend((text, group) for text in _SENTENCE_BREAK.split(comment))
+
+        position = 0
+        for text, group in pieces:
+            text = text.strip()
+            if not text:
+                continue
+            sentences.append(_Sentence(
+                source_index=source_index,
+                position=position,
+                text=text,
+                group=group,
+                tokens=estimate_tokens(text) + 1,
+                terms=set(index_terms(text)),
+            ))
+            position += 1
+    return sentences
+
+
+def _deduplicate(sentences: List[_Sentence], threshold: float) -> List[_Sentence]:
+    """
+    Drops sentences whose word set overlaps an earlier sentence from another source by at
+    least threshold (Jaccard). Exact repeats are dropped within a source as well.
+    """
+    kept: List[_Sentence] = []
+    seen_exact: Set[Tuple[str, ...]] = set()
+    by_term: Dict[str, List[int]] = {}
+    for sentence in sentences:
+        exact = tuple(tokenize(sentence.text))
+        if exact in seen_exact:
+            continue
+
+        candidates: Counter = Counter()
+        for term in sentence.terms:
+            for i in by_term.get(term, ()):
+                candidates[i] += 1
+        duplicate = False
+        for i, shared in candidates.items():
+            other = kept[i]
+            union = len(sentence.terms) + len(other.terms) - shared
+            if other.source_index != sentence.source_index and union and shared / union >= threshold:
+                duplicate = True
+                break
+        if duplicate:
+            continue
+
+        seen_exact.add(exact)
+        for term in sentence.terms:
+            by_term.setdefault(term, []).append(len(kept))
+        kept.append(sentence)
+    return kept
+
+
+def _score(sentences: List[_Sentence], question_text: str) -> None:
+    """
+    TF-IDF overlap with the question terms, IDF taken over the evidence sentences.
+    Leading snippet sentences get a small bonus; very short fragments a penalty.
+    """
+    question_terms = Counter(index_terms(question_text))
+    document_frequency: Counter = Counter()
+    for sentence in sentences:
+        document_frequency.update(sentence.terms)
+
+    count = len(sentences)
+    for sentence in sentences:
+        overlap = sum(
+            weight * math.log(1 + count / document_frequency[term])
+            for term, weight in question_terms.items()
+            if term in sentence.terms
+        )
+        lead_bonus = 0.5 if sentence.position == 0 and sentence.group == 0 else 0.0
+        length_factor = min(1.0, len(sentence.terms) / 4)
+        sentence.score = (overlap + lead_bonus) * length_factor
+
+
+def _assemble(headers: List[str], kept: List[_Sentence]) -> str:
+    by_source: Dict[int, List[_Sentence]] = {}
+    for sentence in kept:
+        by_source.setdefault(sentence.source_index, []).append(sentence)
+
+    lines: List[str] = []
+    for source_index, header in enumerate(headers):
+        groups: Dict[int, List[str]] = {}
+        for sentence in sorted(by_source.get(source_index, []), key=lambda s: s.position):
+            groups.setdefault(sentence.group, []).append(sentence.text)
+        if not groups:
+            continue
+        body = " ".join(groups.pop(0, []))
+        comments = [" ".join(texts) for _, texts in sorted(groups.items())]
+        line = f"{header} {body}".rstrip()
+        if comments:
+            line += COMMENTS_MARKER + "\n".join(f"- {c}" for c in comments)
+        lines.append(line)
+
+    return "\n".join(lines) if lines else NO_EVIDENCE
+
+
+def compact_queries(queries: Dict[str, object]) -> Dict[str, object]:
+    """
+    The parts of the query dict the summary uses; provider metadata is left out.
+    """
+    return {key: queries[key] for key in ("keyword_query", "sub_questions") if key in queries}
+
+
+def relevance_text(question: Dict[str, object], queries: Optional[Dict[str, object]] = None) -> str:
+    """
+    The text evidence is ranked against: question title, body and keyword query.
+    """
+    text = f"{question.get('title', '')} {question.get('body') or ''}"
+    if queries:
+        text += f" {queries.get('keyword_query', '')}"
+    return text
@@ -0,0 +1,94 @@
+"""
+Async variant of the Ollama summary provider, built on the async Ollama endpoint pool.
+"""
+import os
+from contextlib import aclosing
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from app.core.config import PIPELINE_SETTINGS
+from app.core.models import AggregatedAnswer, FusedAnswer, PerSourceResult
+from app.providers.llm.call_cache import (LlmCallCache,
+                                          chat_stream_with_cache_async,
+                                          chat_with_cache_async)
+from app.providers.llm.ollama_pool import (AsyncOllamaPool,
+                                            async_ollama_pool_for)
+from app.providers.summary.base import AsyncSummaryProvider
+from app.providers.summary.ollama.summary_provider import (
+    FUSED_FORMAT, build_fused_messages, build_summary_messages,
+    parse_fused_response)
+
+
+class AsyncOllamaSummaryProvider(AsyncSummaryProvider):
+    name = "ollama_llm"
+
+    def __init__(
+        self,
+        model_name: str = "llama3.1",
+        llm_cache: Optional[LlmCallCache] = None,
+        client: Optional[AsyncOllamaPool] = None,
+    ):
+        self.model_name = model_name or os.getenv("SUMMARY_MODEL", "llama3.1")
+        self.llm_cache = llm_cache
+        self._client = client or async_ollama_pool_for()
+
+    async def summarize(
+        self,
+        question: Dict[str, Any],
+        queries: Dict[str, Any],
+        per_source_results: List[PerSourceResult],
+        *,
+        extra_context: Optional[Dict[str, Any]] = None,
+    ) -> AggregatedAnswer:
+        response = await chat_with_cache_async(
+            self.llm_cache,
+            self._client.chat,
+            model=self.model_name,
+            messages=build_summary_messages(question, queries, per_source_results),
+            stage="summary",
+        )
+
+        return AggregatedAnswer(
+            final_summary=response["message"]["content"],
+            per_source_results=per_source_results,
+        )
+
+    async def summarize_stream(
+        self,
+        question: Dict[str, Any],
+        queries: Dict[str, Any],
+        per_source_results: List[PerSourceResult],
+        *,
+        extra_context: Optional[Dict[str, Any]] = None,
+    ) -> AsyncIterator[str]:
+        stream = chat_stream_with_cache_async(
+            self.llm_cache,
+            self._client.chat,
+            model=self.model_name,
+            messages=build_summary_messages(question, queries, per_source_results),
+            stage="summary",
+        )
+        async with aclosing(stream):
+            async for piece in stream:
+                yield piece
+
+    async def summarize_fused(
+        self,
+        question: Dict[str, Any],
+        queries: Dict[str, Any],
+        per_source_results: List[PerSourceResult],
+        *,
+        top_k: int = PIPELINE_SETTINGS.fused_top_k,
+    ) -> FusedAnswer:
+        response = await chat_with_cache_async(
+            self.llm_cache,
+            self._client.chat,
+            model=self.model_name,
+            messages=build_fused_messages(question, queries, per_source_results, top_k),
+            stage="summary",
+            format=FUSED_FORMAT,
+        )
+
+        return parse_fused_response(response["message"]["content"], per_source_results, top_k)
+
+    async def warm_up(self) -> None:
+        await self._client.preload(self.model_name)
@@ -2,22 +2,49 @@
 Provides a summary provider implementation using the Ollama LLM.
 """
 import json
+import logging
 import os
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
-import ollama
+from pydantic import BaseModel, ValidationError
 
-from app.core.models import AggregatedAnswer, PerSourceResult
-from app.core.template_loader import load_template
+from app.core.config import PIPELINE_SETTINGS
+from app.core.models import AggregatedAnswer, FusedAnswer, PerSourceResult
+from app.providers.llm.call_cache import LlmCallCache, chat_with_cache
+from app.providers.llm.ollama_pool import OllamaPool, ollama_pool_for
+from app.providers.llm.prompts import templated_messages
+from app.providers.search.searxng.search_provider import REDDIT_SOURCE
 from app.providers.summary.base import SummaryProvider
+from app.providers.summary.evidence import (compact_queries, pack_evidence,
+                                            relevance_text)
+
+logger = logging.getLogger(__name__)
+
+
+class FusedSummaryOutput(BaseModel):
+    """
+    What the fused rerank and summary call returns. Its JSON schema is sent as Ollama's
+    format, so the model's output is constrained to it.
+    """
+    selected_sources: List[int]
+    final_summary: str
+
+
+FUSED_FORMAT: Dict[str, Any] = FusedSummaryOutput.model_json_schema()
 
 
 class OllamaSummaryProvider(SummaryProvider):
     name = "ollama_llm"
 
-    def __init__(self, model_name: str = "llama3.1"):
+    def __init__(
+        self,
+        model_name: str = "llama3.1",
+        llm_cache: Optional[LlmCallCache] = None,
+        client: Optional[OllamaPool] = None,
+    ):
         self.model_name = model_name or os.getenv("SUMMARY_MODEL", "llama3.1")
-        self.prompt_template = load_template("llm_summary_prompt.txt")
+        self.llm_cache = llm_cache
+        self._client = client or ollama_pool_for()
 
     def summarize(
         self,
@@ -27,45 +54,11 @@ class OllamaSummaryProvider(SummaryProvider):
         *,
         extra_context: Optional[Dict[str, Any]] = None,
     ) -> AggregatedAnswer:
-        all_texts: List[str] = []
-
-        for src in per_source_results:
-            header_parts: List[str] = []
-            if src.title:
-                header_parts.append(src.title)
-            if src.url:
-                header_parts.append(f"({src.url})")
-
-            header = " ".join(header_parts) if header_parts else src.source
-            evidence_line = f"{header}: {src.summary}"
-
-            all_texts.append(f"[{src.source}] {evidence_line}")
-
-        combined_text = "\n".join(all_texts)
-
-        if not combined_text.strip():
-            combined_text = "No detailed results were available to summarize."
-
-        title = question.get("title", "")
-        body = question.get("body", "")
-
-        template_values = {
-            "question_title": title,
-            "question_body": body,
-            "generated_queries": json.dumps(queries, indent=2),
-            "combined_evidence": combined_text,
-        }
-
-        prompt = self.prompt_template.format(**template_values)
-
-        response = ollama.chat(
+        response = chat_with_cache(
+            self.llm_cache,
+            self._client.chat,
             model=self.model_name,
-            messages=[
-                {
-                    "role": "user",
-                    "content": prompt,
-                }
-            ],
+            messages=build_summary_messages(question, queries, per_source_results),
         )
 
         content = response["message"]["content"]
@@ -93,3 +86,97 @@ class OllamaSummaryProvider(SummaryProvider):
             return str(item)
 
         return str(item)
+
+
+def build_summary_messages(
+    question: Dict[str, Any],
+    queries: Dict[str, Any],
+    per_source_results: List[PerSourceResult],
+    token_budget: int = PIPELINE_SETTINGS.summary_token_budget,
+) -> List[Dict[str, str]]:
+    """
+    Builds the chat messages for the summary: the fixed instructions, then the question and
+    the combined evidence, packed into token_budget estimated tokens. Shared by the sync and
+    async providers.
+    """
+    title = question.get("title", "")
+    body = question.get("body", "")
+
+    template_values = {
+        "question_title": title,
+        "question_body": body,
+        "generated_queries": json.dumps(compact_queries(queries), indent=2),
+        "combined_evidence": pack_evidence(
+            relevance_text(question, queries),
+            per_source_results,
+            token_budget,
+        ),
+    }
+
+    return templated_messages("llm_summary_prompt.txt", "llm_summary_input.txt", **template_values)
+
+
+def build_fused_messages(
+    question: Dict[str, Any],
+    queries: Dict[str, Any],
+    per_source_results: List[PerSourceResult],
+    top_k: int = PIPELINE_SETTINGS.fused_top_k,
+    token_budget: int = PIPELINE_SETTINGS.summary_token_budget,
+) -> List[Dict[str, str]]:
+    """
+    Builds the chat messages for the fused call: like build_summary_messages, with the
+    evidence numbered so the model can select Reddit posts by number.
+    """
+    template_values = {
+        "question_title": question.get("title", ""),
+        "question_body": question.get("body", ""),
+        "generated_queries": json.dumps(compact_queries(queries), indent=2),
+        "combined_evidence": pack_evidence(
+            relevance_text(question, queries),
+            per_source_results,
+            token_budget,
+            numbered=True,
+        ),
+        "top_k": top_k,
+    }
+
+    return templated_messages("llm_fused_prompt.txt", "llm_fused_input.txt", **template_values)
+
+
+def parse_fused_response(
+    content: str,
+    per_source_results: List[PerSourceResult],
+    top_k: int,
+) -> FusedAnswer:
+    """
+    Validates the model output against FusedSummaryOutput. Output that does not match is
+    used as the summary text as is, and the posts are kept as without a selection.
+    """
+    try:
+        output = FusedSummaryOutput.model_validate_json(content)
+    except ValidationError as e:
+        logger.warning("Fused summary output did not match its schema: %s", e.errors()[:1])
+        output = FusedSummaryOutput(selected_sources=[], final_summary=content.strip())
+
+    kept, selected = select_sources(per_source_results, output.selected_sources, top_k)
+    return FusedAnswer(final_summary=output.final_summary, per_source_results=kept, selected_sources=selected)
+
+
+def select_sources(
+    per_source_results: List[PerSourceResult],
+    selected: List[int],
+    top_k: int,
+) -> Tuple[List[PerSourceResult], List[int]]:
+    """
+    Keeps the results that are not Reddit posts, followed by the Reddit posts whose numbers
+    (from 1, in list order) were selected, best first, at most top_k. Like a failed rerank,
+    a selection without any valid post keeps the first top_k posts. Returns the kept
+    results and the numbers of the kept posts.
+    """
+    posts = {n: r for n, r in enumerate(per_source_results, start=1) if r.source == REDDIT_SOURCE}
+    numbers = list(dict.fromkeys(n for n in selected if n in posts))[:top_k]
+    if not numbers:
+        numbers = list(posts)[:top_k]
+
+    others = [r for r in per_source_results if r.source != REDDIT_SOURCE]
+    return others + [posts[n] for n in numbers], numbers
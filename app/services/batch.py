@@ -0,0 +1,113 @@
+"""
+Runs a pipeline over many questions and streams the results back as NDJSON.
+
+Identical questions (same source and same normalized title and body) and near-identical
+ones (embedding similarity at or above PIPELINE_SETTINGS.batch_dedup_threshold within the
+same source) are grouped, and each group runs the pipeline once. Groups run concurrently
+up to a parallelism cap, and a line is emitted for every item as soon as its group finishes.
+"""
+
+import asyncio
+import logging
+import re
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from app.core.config import PIPELINE_SETTINGS
+from app.core.models import BatchItemResult, QuestionInput
+from app.services.embedding import embed_texts_async, question_text
+
+logger = logging.getLogger(__name__)
+
+_NON_WORD = re.compile(r"[^\w]+")
+
+
+async def stream_batch(
+    questions: List[QuestionInput],
+    run_item: Callable[[QuestionInput], Awaitable[Any]],
+    max_concurrency: Optional[int] = None,
+) -> AsyncIterator[str]:
+    """
+    Yields one BatchItemResult JSON line per question, in completion order.
+    """
+    groups = await group_duplicates(questions)
+    logger.info("Batch of %d questions reduced to %d pipeline runs.", len(questions), len(groups))
+
+    semaphore = asyncio.Semaphore(max_concurrency or PIPELINE_SETTINGS.batch_max_concurrency)
+
+    async def run_group(group: List[int]) -> Tuple[List[int], Any, Optional[Exception]]:
+        async with semaphore:
+            try:
+                return group, await run_item(questions[group[0]]), None
+            except Exception as e:
+                return group, None, e
+
+    tasks = [asyncio.ensure_future(run_group(group)) for group in groups]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            group, result, error = await next_done
+            for index in group:
+                item = BatchItemResult(
+                    index=index,
+                    status="error" if error is not None else "ok",
+                    duplicate_of=group[0] if index != group[0] else None,
+                    result=result,
+                    detail=str(error) if error is not None else None,
+                )
+                yield item.model_dump_json() + "\n"
+    finally:
+        # Stop outstanding work if the client goes away mid-stream.
+        for task in tasks:
+            task.cancel()
+
+
+async def group_duplicates(questions: List[QuestionInput]) -> List[List[int]]:
+    """
+    Groups question indexes so each group can share one pipeline run.
+    The first index of each group is the question that is actually run.
+    """
+    groups_by_key: Dict[Tuple[str, str], List[int]] = {}
+    for index, question in enumerate(questions):
+        groups_by_key.setdefault(_exact_key(question), []).append(index)
+    groups = list(groups_by_key.values())
+
+    if len(groups) < 2 or PIPELINE_SETTINGS.batch_dedup_threshold > 1.0:
+        return groups
+
+    try:
+        vectors = await embed_texts_async([question_text(questions[g[0]]) for g in groups])
+    except Exception as e:
+        logger.warning("Batch near-duplicate detection skipped, embedding failed: %s", e)
+        return groups
+
+    similarities = vectors @ vectors.T
+    merged: List[List[int]] = []
+    representatives: List[int] = []
+    for i, group in enumerate(groups):
+        source = _exact_key(questions[group[0]])[0]
+        target = next(
+            (
+                position for position, rep in enumerate(representatives)
+                if _exact_key(questions[groups[rep][0]])[0] == source
+                and similarities[i, rep] >= PIPELINE_SETTINGS.batch_dedup_threshold
+            ),
+            None,
+        )
+        if target is None:
+            representatives.append(i)
+            merged.append(list(group))
+        else:
+            merged[target].extend(group)
+
+    return merged
+
+
+def _exact_key(question: QuestionInput) -> Tuple[str, str]:
+    """
+    (partition, normalized text). Only questions of the same source and provider
+    selection can share a run.
+    """
+    text = f"{question.title} {question.body or ''}".lower()
+    partition = (question.source or "").strip().lower()
+    if question.providers is not None:
+        partition += "|" + question.providers.key()
+    return partition, _NON_WORD.sub(" ", text).strip()
@@ -0,0 +1,32 @@
+"""
+Loads and initializes the embedding provider based on configuration.
+
+Providers are built on first use by the registry (see app.providers.registry).
+"""
+
+from typing import List, Optional
+
+import numpy as np
+
+from app.core.config import ProviderInfo, SectionName
+from app.providers.embedding.base import normalize_rows, question_text
+from app.providers.registry import ProviderRegistry, ollama_client
+
+
+def build_embedding_provider(provider_class, provider_info: ProviderInfo, provider_model: Optional[str], is_async: bool):
+    if provider_info.id == "ollama_embedding":
+        return provider_class(provider_model, client=ollama_client(provider_info, is_async))
+
+    raise ValueError(f"Unknown EMBEDDING_PROVIDER: {provider_info.id}")
+
+
+def embed_texts(texts: List[str]) -> np.ndarray:
+    return normalize_rows(_registry.get(is_async=False).embed(texts))
+
+
+async def embed_texts_async(texts: List[str]) -> np.ndarray:
+    provider = await _registry.get_async()
+    return normalize_rows(await provider.embed(texts))
+
+
+_registry = ProviderRegistry(SectionName.EMBEDDING, build_embedding_provider)
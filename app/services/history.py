@@ -0,0 +1,57 @@
+"""
+Maintains the local index of previously answered questions used by the history search provider.
+"""
+
+import asyncio
+import logging
+from typing import Optional
+
+import numpy as np
+
+from app.core.config import PIPELINE_SETTINGS, get_cache_path
+from app.core.models import AggregatedAnswer, QuestionInput
+from app.providers.embedding.base import question_text
+from app.providers.search.history.search_provider import (build_history_record,
+                                                          history_partition)
+from app.providers.search.base import is_reusable_answer
+from app.providers.search.history.vector_index import VectorIndex
+from app.services.embedding import embed_texts_async
+
+logger = logging.getLogger(__name__)
+
+
+def get_history_index() -> VectorIndex:
+    return _index
+
+
+async def record_answer_async(
+    question: QuestionInput,
+    aggregated: AggregatedAnswer,
+    vector: Optional[np.ndarray] = None,
+) -> None:
+    """
+    Adds an answered question to the history index. A vector already computed for the
+    question (e.g. by the semantic cache) is reused; otherwise the question is embedded.
+    Answers that came from the history index themselves, or that were built after a
+    search error or without any results, are not recorded. Neither is anything in a
+    process that does not hold the index's writer lock (see VectorIndex). Failures are
+    logged and never fail the request.
+    """
+    if not PIPELINE_SETTINGS.history_record or not _index.writable:
+        return
+    if not is_reusable_answer(aggregated.per_source_results):
+        return
+
+    try:
+        if vector is None:
+            vector = (await embed_texts_async([question_text(question)]))[0]
+        record = build_history_record(question, aggregated.final_summary, aggregated.per_source_results)
+        await asyncio.to_thread(_index.add, vector, record)
+    except Exception as e:
+        logger.warning("Recording answer in history index failed: %s", e)
+
+
+_index = VectorIndex(
+    get_cache_path("history"),
+    partition_of=lambda record: history_partition(record.get("source")),
+)
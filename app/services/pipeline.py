@@ -0,0 +1,217 @@
+"""
+End-to-end pipelines shared by the HTTP endpoints: query -> search, and
+query -> search -> summary with the semantic cache and history index around it.
+
+Concurrent requests for the same question (see question_key) share one pipeline run.
+"""
+
+import asyncio
+import hashlib
+import logging
+import re
+import time
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+from app.core.config import PIPELINE_SETTINGS
+from app.core.models import (AggregatedAnswer, PerSourceResult,
+                             ProviderChoice, QuestionInput)
+from app.core.single_flight import AsyncSingleFlight
+from app.core.telemetry import timed
+from app.providers.search.base import defer_rerank, reset_rerank
+from app.services.history import record_answer_async
+from app.services.query import (generate_lexical_queries_async,
+                                generate_queries_async)
+from app.services.search import search_across_providers_async
+from app.services.semantic_cache import (lookup_cached_summary,
+                                         store_cached_summary)
+from app.services.summary import (generate_fused_summary_async,
+                                  generate_summary_async)
+
+logger = logging.getLogger(__name__)
+
+_NON_WORD = re.compile(r"[^\w]+")
+_REDDIT_POST = re.compile(r"/comments/([a-z0-9]+)")
+
+# Coalesced runs serve several requests, so they run in a context of their own.
+_search_flights: AsyncSingleFlight[List[PerSourceResult]] = AsyncSingleFlight(isolated=True)
+_summary_flights: AsyncSingleFlight[AggregatedAnswer] = AsyncSingleFlight(isolated=True)
+
+
+async def run_search_pipeline(question: QuestionInput) -> List[PerSourceResult]:
+    if not PIPELINE_SETTINGS.request_coalescing:
+        return await _run_search_pipeline(question)
+    return await _search_flights.do(question_key(question), lambda: _run_search_pipeline(question))
+
+
+async def run_summary_pipeline(question: QuestionInput) -> AggregatedAnswer:
+    if not PIPELINE_SETTINGS.request_coalescing:
+        return await _run_summary_pipeline(question)
+    return await _summary_flights.do(question_key(question), lambda: _run_summary_pipeline(question))
+
+
+def question_key(question: QuestionInput) -> str:
+    """
+    Identifies the post a question is about: the Reddit post id or normalized URL when
+    there is a URL, otherwise a hash of the source and the normalized title and body.
+    Requests that chose other providers get a key of their own.
+    """
+    key = _post_key(question)
+    if question.providers is not None:
+        key += "|" + question.providers.key()
+    return key
+
+
+def _post_key(question: QuestionInput) -> str:
+    if question.url:
+        parts = urlsplit(question.url.strip().lower())
+        host = parts.netloc.split("@")[-1].split(":")[0]
+        if host == "redd.it" or host.endswith(".redd.it"):
+            return f"reddit:{parts.path.strip('/')}"
+        post = _REDDIT_POST.search(parts.path)
+        if host.endswith("reddit.com") and post:
+            return f"reddit:{post.group(1)}"
+        return f"url:{host.removeprefix('www.')}{parts.path.rstrip('/')}"
+
+    text = _NON_WORD.sub(" ", f"{question.title} {question.body or ''}".lower()).strip()
+    source = (question.source or "").strip().lower()
+    return "text:" + hashlib.sha256(f"{source}\n{text}".encode("utf-8")).hexdigest()
+
+
+async def generate_queries_and_search(
+    question: QuestionInput,
+) -> Tuple[Dict[str, Any], List[PerSourceResult]]:
+    """
+    Generates the queries and searches with them, speculatively when
+    PIPELINE_SETTINGS.query_mode is "speculative".
+    """
+    if PIPELINE_SETTINGS.query_mode == "speculative":
+        return await _speculative_queries_and_search(question)
+
+    with timed("query"):
+        queries = await generate_queries_async(question)
+    logger.info("Generated queries: %s", queries)
+
+    with timed("search"):
+        per_source_results: List[PerSourceResult] = await search_across_providers_async(
+            question,
+            queries.get("keyword_query", ""),
+        )
+    logger.info("Returning %d search results", len(per_source_results))
+
+    return queries, per_source_results
+
+
+async def _speculative_queries_and_search(
+    question: QuestionInput,
+) -> Tuple[Dict[str, Any], List[PerSourceResult]]:
+    """
+    Searches with the lexical query straight away while the default query provider runs.
+    If its query arrives within the wait budget and differs, a second search starts at
+    once and its results are merged in ahead of the lexical ones. Otherwise the lexical
+    results are returned and the provider call finishes in the background.
+    """
+    started = time.monotonic()
+    model_queries = asyncio.ensure_future(_timed_queries(question))
+    model_queries.add_done_callback(_discard_late_error)
+
+    lexical = await generate_lexical_queries_async(question)
+    lexical_search = asyncio.ensure_future(_timed_search(question, lexical["keyword_query"], "search"))
+
+    queries, second_search = lexical, None
+    budget = PIPELINE_SETTINGS.speculative_query_wait_seconds
+    try:
+        queries = await asyncio.wait_for(asyncio.shield(model_queries), budget)
+        if _normalized_query(queries["keyword_query"]) != _normalized_query(lexical["keyword_query"]):
+            second_search = asyncio.ensure_future(
+                _timed_search(question, queries["keyword_query"], "search_model_query"))
+    except asyncio.TimeoutError:
+        logger.info("Query provider missed the %ss speculative budget, using the lexical query.", budget)
+    except Exception as e:
+        logger.warning("Query provider failed, using the lexical query: %s", e)
+    logger.info("Generated queries: %s (lexical: %s)", queries, lexical["keyword_query"])
+
+    per_source_results = await lexical_search
+    if second_search is not None:
+        per_source_results = merge_results(await second_search, per_source_results)
+    logger.info("Returning %d search results after %.2fs", len(per_source_results), time.monotonic() - started)
+
+    return queries, per_source_results
+
+
+def merge_results(
+    primary: List[PerSourceResult],
+    secondary: List[PerSourceResult],
+) -> List[PerSourceResult]:
+    """
+    primary followed by the results of secondary it does not already contain.
+    """
+    seen = {(r.source, r.url or r.title) for r in primary}
+    return primary + [r for r in secondary if (r.source, r.url or r.title) not in seen]
+
+
+async def _timed_queries(question: QuestionInput) -> Dict[str, Any]:
+    with timed("query"):
+        return await generate_queries_async(question)
+
+
+async def _timed_search(question: QuestionInput, keyword_query: str, stage: str) -> List[PerSourceResult]:
+    with timed(stage):
+        return await search_across_providers_async(question, keyword_query)
+
+
+def _normalized_query(keyword_query: str) -> str:
+    return " ".join(sorted(set(_NON_WORD.sub(" ", keyword_query.lower()).split())))
+
+
+def _discard_late_error(task: "asyncio.Task[Any]") -> None:
+    # Nothing awaits a call that missed the budget; retrieve its error so it is not reported.
+    if not task.cancelled():
+        task.exception()
+
+
+async def _run_search_pipeline(question: QuestionInput) -> List[PerSourceResult]:
+    _, per_source_results = await generate_queries_and_search(question)
+    return per_source_results
+
+
+async def _run_summary_pipeline(question: QuestionInput) -> AggregatedAnswer:
+    with timed("semantic_cache"):
+        cached, question_vector = await lookup_cached_summary(question)
+    if cached is not None:
+        return cached
+
+    fused = PIPELINE_SETTINGS.summary_mode == "fused"
+    # In fused mode SearXNG passes its candidates unranked; the summary call selects among them.
+    token = defer_rerank(fused)
+    try:
+        queries, per_source_results = await generate_queries_and_search(question)
+    finally:
+        reset_rerank(token)
+
+    summarize = generate_fused_summary_async if fused else generate_summary_async
+    with timed("summary"):
+        aggregated: AggregatedAnswer = await summarize(
+            question=question_dict(question),
+            queries=queries,
+            per_source_results=per_source_results,
+            provider=summary_choice(question),
+        )
+    logger.debug("Returning aggregated answer: %s", aggregated)
+
+    with timed("record"):
+        store_cached_summary(question, question_vector, aggregated)
+        await record_answer_async(question, aggregated, question_vector)
+
+    return aggregated
+
+
+def summary_choice(question: QuestionInput) -> Optional[ProviderChoice]:
+    return question.providers.summary if question.providers is not None else None
+
+
+def question_dict(question: QuestionInput) -> Dict[str, Any]:
+    return {
+        "title": question.title,
+        "body": question.body,
+    }
@@ -1,26 +1,62 @@
 """
-Loads and initializes the query provider based on configuration.
+Loads and initializes the query provider based on configuration, or the one a
+request chose (see QuestionInput.providers).
+
+Providers are built on first use by the registry (see app.providers.registry).
 """
 
-from typing import Any, Dict
+from functools import lru_cache
+from typing import Any, Dict, Optional
+
+from app.core.config import (PIPELINE_SETTINGS, ProviderInfo, SectionName,
+                             get_corpus_dir)
+from app.core.models import ProviderChoice, QuestionInput
+from app.providers.llm.call_cache import llm_cache_for
+from app.providers.registry import ProviderRegistry, ollama_client
 
-from app.core.config import get_default_query_provider
-from app.core.models import QuestionInput
-from app.providers.query.base import QueryProvider
-from app.providers.query.ollama.query_provider import OllamaQueryProvider
 
+def build_query_provider(provider_class, provider_info: ProviderInfo, provider_model: Optional[str], is_async: bool):
+    if provider_info.id == "ollama_query":
+        return provider_class(
+            provider_model, llm_cache=llm_cache_for(provider_info), client=ollama_client(provider_info, is_async))
+    if provider_info.id == "lexical":
+        return provider_class(_vocabulary())
 
-def build_query_provider() -> QueryProvider:
-    provider_name, provider_model = get_default_query_provider()
+    raise ValueError(f"Unknown QUERY_PROVIDER: {provider_info.id}")
 
-    if provider_name == "ollama_query":
-        return OllamaQueryProvider(provider_model)
 
-    raise ValueError(f"Unknown QUERY_PROVIDER: {provider_name}")
+@lru_cache(maxsize=None)
+def _vocabulary():
+    # Shared by the sync, async and speculative lexical providers.
+    from app.providers.query.lexical.query_provider import \
+        load_corpus_vocabulary
+    return load_corpus_vocabulary(get_corpus_dir())
 
 
 def generate_queries(question: QuestionInput) -> Dict[str, Any]:
-    return _provider.generate_queries(question)
+    return _registry.select(_query_choice(question), is_async=False).generate_queries(question)
+
+
+async def generate_queries_async(question: QuestionInput) -> Dict[str, Any]:
+    provider = await _registry.select_async(_query_choice(question))
+    return await provider.generate_queries(question)
+
+
+def _query_choice(question: QuestionInput) -> Optional[ProviderChoice]:
+    return question.providers.query if question.providers is not None else None
+
+
+async def generate_lexical_queries_async(question: QuestionInput) -> Dict[str, Any]:
+    """
+    The lexical provider's queries, used as the speculative first query.
+    """
+    provider = await _registry.get_async("lexical")
+    return await provider.generate_queries(question)
 
 
-_provider = build_query_provider()
+_registry = ProviderRegistry(
+    SectionName.QUERY,
+    build_query_provider,
+    # Speculative mode starts every search with the lexical query.
+    warm_ids=["lexical"] if PIPELINE_SETTINGS.query_mode == "speculative" else [],
+)
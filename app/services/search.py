@@ -1,38 +1,220 @@
 """
-Loads and initializes the search providers based on configuration.
+Loads and initializes the search providers based on configuration, or the ones a
+request chose (see QuestionInput.providers).
+
+Providers are built on first use by the registry (see app.providers.registry).
 """
 
-from typing import List
+import asyncio
+import contextvars
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from functools import lru_cache
+from typing import List, Optional, Tuple, TypeVar
+
+from app.core.config import (PIPELINE_SETTINGS, ProviderInfo, SectionName,
+                             get_bm25_dir, get_corpus_dir, get_provider_info,
+                             get_search_provider_timeout)
+from app.core.models import PerSourceResult, ProviderChoice, QuestionInput
+from app.core.telemetry import record_search_provider
+from app.providers.llm.call_cache import llm_cache_for
+from app.providers.registry import (ProviderRegistry, ollama_client,
+                                    provider_class)
+from app.providers.search.base import AsyncSearchProvider, SearchProvider
+from app.services.history import get_history_index
+
+T = TypeVar("T", SearchProvider, AsyncSearchProvider)
+
+logger = logging.getLogger(__name__)
+
 
-from app.core.config import get_default_search_providers
-from app.core.models import PerSourceResult, QuestionInput
-from app.providers.search.base import SearchProvider
-from app.providers.search.ollama.search_provider import OllamaLlmSearchProvider
-from app.providers.search.searxng.search_provider import SearXNGSearchProvider
+def build_search_provider(provider_class, provider_info: ProviderInfo, provider_model: Optional[str], is_async: bool):
+    provider_name = provider_info.id
+    if provider_name == "history":
+        provider = provider_class(
+            get_history_index(),
+            _embedding_provider(provider_info, provider_model, is_async),
+            PIPELINE_SETTINGS.history_match_threshold,
+        )
+    elif provider_name in ("ollama_search", "searxng"):
+        provider = provider_class(
+            provider_model, llm_cache=llm_cache_for(provider_info), client=ollama_client(provider_info, is_async))
+    elif provider_name == "corpus":
+        provider = provider_class(get_corpus_dir())
+    elif provider_name == "bm25":
+        provider = provider_class(_bm25_index())
+    elif provider_name == "searxng_embedding":
+        provider = provider_class(embedding_provider=_embedding_provider(provider_info, provider_model, is_async))
+    else:
+        raise ValueError(f"Unknown SEARCH_PROVIDER: {provider_name}")
 
+    provider.timeout_seconds = get_search_provider_timeout(provider_name)
+    return provider
 
-def build_search_providers() -> List[SearchProvider]:
-    providers = get_default_search_providers()
-    search_providers: List[SearchProvider] = []
 
-    for provider_name, provider_model in providers:
-        if provider_name == "ollama_search":
-            search_providers.append(OllamaLlmSearchProvider(provider_model))
-        elif provider_name == "searxng":
-            search_providers.append(SearXNGSearchProvider())
-        else:
-            raise ValueError(f"Unknown SEARCH_PROVIDER: {provider_name}")
+def _embedding_provider(provider_info: ProviderInfo, provider_model: Optional[str], is_async: bool):
+    # The Ollama embedding provider, on the endpoints of the search provider that uses it.
+    embedding_class = provider_class(get_provider_info(SectionName.EMBEDDING, "ollama_embedding"), is_async)
+    return embedding_class(provider_model, client=ollama_client(provider_info, is_async))
 
-    return search_providers
+
+@lru_cache(maxsize=None)
+def _bm25_index():
+    # Shared by the sync and async providers so the snapshot is mapped once.
+    from app.providers.search.bm25.search_provider import load_bm25_index
+    return load_bm25_index(get_bm25_dir(), get_corpus_dir(), PIPELINE_SETTINGS.bm25_sharded)
 
 
 def search_across_providers(question: QuestionInput, keyword_queries: str) -> List[PerSourceResult]:
+    first_tier, remaining = _split_tiers(_registry.select_many(_search_choices(question), False, skip_failed=True))
+
+    all_results = _search_providers(first_tier, question, keyword_queries)
+    if all_results:
+        logger.info("Short-circuit providers returned %d results, skipping the rest.", len(all_results))
+    else:
+        all_results = _search_providers(remaining, question, keyword_queries)
+
+    logger.info("Total results from all providers: %d", len(all_results))
+    return all_results
+
+
+def _search_providers(
+    providers: List[SearchProvider],
+    question: QuestionInput,
+    keyword_queries: str,
+) -> List[PerSourceResult]:
+    if PIPELINE_SETTINGS.search_fanout == "sequential":
+        return _search_sequential(providers, question, keyword_queries)
+    return _search_concurrent(providers, question, keyword_queries)
+
+
+def _search_sequential(
+    providers: List[SearchProvider],
+    question: QuestionInput,
+    keyword_queries: str,
+) -> List[PerSourceResult]:
     all_results: List[PerSourceResult] = []
-    for search_provider in _providers:
+    for search_provider in providers:
+        started = time.perf_counter()
         all_results.extend(search_provider.search(question, keyword_queries))
+        record_search_provider(search_provider.name, "ok", time.perf_counter() - started)
+    return all_results
+
+
+def _search_concurrent(
+    providers: List[SearchProvider],
+    question: QuestionInput,
+    keyword_queries: str,
+) -> List[PerSourceResult]:
+    """
+    Starts every provider at once and waits for each one up to its own deadline.
+
+    Results are concatenated in provider order. A provider that times out or raises is
+    skipped; a timed out call keeps running in the pool but its result is discarded.
+    """
+    started = time.monotonic()
+    # Each call runs in a copy of this context so stage timings reach the current request.
+    futures = [
+        (search_provider, _executor.submit(
+            contextvars.copy_context().run, search_provider.search, question, keyword_queries))
+        for search_provider in providers
+    ]
 
-    print(f"Total results from all providers: {len(all_results)}")
+    all_results: List[PerSourceResult] = []
+    for search_provider, future in futures:
+        timeout = search_provider.timeout_seconds or PIPELINE_SETTINGS.search_timeout_seconds
+        deadline = started + timeout
+        try:
+            results = future.result(timeout=max(0.0, deadline - time.monotonic()))
+        except FutureTimeoutError:
+            record_search_provider(search_provider.name, "timeout", time.monotonic() - started)
+            logger.warning("Search provider %s missed its %ss deadline, skipping.", search_provider.name, timeout)
+            continue
+        except Exception as e:
+            record_search_provider(search_provider.name, "error", time.monotonic() - started)
+            logger.warning("Search provider %s failed, skipping: %s", search_provider.name, e)
+            continue
+        record_search_provider(search_provider.name, "ok", time.monotonic() - started)
+        all_results.extend(results)
+
+    return all_results
+
+
+async def search_across_providers_async(
+    question: QuestionInput,
+    keyword_queries: str,
+) -> List[PerSourceResult]:
+    first_tier, remaining = _split_tiers(await _registry.select_many_async(_search_choices(question), skip_failed=True))
+
+    all_results = await _search_providers_async(first_tier, question, keyword_queries)
+    if all_results:
+        logger.info("Short-circuit providers returned %d results, skipping the rest.", len(all_results))
+    else:
+        all_results = await _search_providers_async(remaining, question, keyword_queries)
+
+    logger.info("Total results from all providers: %d", len(all_results))
     return all_results
 
 
-_providers = build_search_providers()
+async def _search_providers_async(
+    providers: List[AsyncSearchProvider],
+    question: QuestionInput,
+    keyword_queries: str,
+) -> List[PerSourceResult]:
+    if PIPELINE_SETTINGS.search_fanout == "sequential":
+        all_results: List[PerSourceResult] = []
+        for search_provider in providers:
+            started = time.perf_counter()
+            all_results.extend(await search_provider.search(question, keyword_queries))
+            record_search_provider(search_provider.name, "ok", time.perf_counter() - started)
+        return all_results
+
+    per_provider = await asyncio.gather(
+        *(_search_with_deadline(p, question, keyword_queries) for p in providers)
+    )
+    return [result for results in per_provider for result in results]
+
+
+async def _search_with_deadline(
+    search_provider: AsyncSearchProvider,
+    question: QuestionInput,
+    keyword_queries: str,
+) -> List[PerSourceResult]:
+    """
+    Awaits one provider up to its own deadline. Timeouts and errors yield no results.
+    """
+    timeout = search_provider.timeout_seconds or PIPELINE_SETTINGS.search_timeout_seconds
+    started = time.perf_counter()
+    try:
+        results = await asyncio.wait_for(search_provider.search(question, keyword_queries), timeout)
+        record_search_provider(search_provider.name, "ok", time.perf_counter() - started)
+        return results
+    except asyncio.TimeoutError:
+        record_search_provider(search_provider.name, "timeout", time.perf_counter() - started)
+        logger.warning("Search provider %s missed its %ss deadline, skipping.", search_provider.name, timeout)
+    except Exception as e:
+        record_search_provider(search_provider.name, "error", time.perf_counter() - started)
+        logger.warning("Search provider %s failed, skipping: %s", search_provider.name, e)
+    return []
+
+
+def _search_choices(question: QuestionInput) -> Optional[List[ProviderChoice]]:
+    return question.providers.search if question.providers is not None else None
+
+
+def _split_tiers(providers: List[T]) -> Tuple[List[T], List[T]]:
+    """
+    Separates short-circuit providers, which run first, from the rest.
+    """
+    first_tier = [p for p in providers if p.short_circuits]
+    remaining = [p for p in providers if not p.short_circuits]
+    return first_tier, remaining
+
+
+_registry = ProviderRegistry(SectionName.SEARCH, build_search_provider)
+_executor = ThreadPoolExecutor(
+    max_workers=PIPELINE_SETTINGS.search_max_workers,
+    thread_name_prefix="search",
+)
@@ -0,0 +1,160 @@
+"""
+Semantic cache of /generate_summary answers.
+
+Questions are embedded (title + body) and compared with previously answered questions
+from the same source subreddit. When the cosine similarity of the nearest neighbour is
+at or above PIPELINE_SETTINGS.semantic_cache_threshold, its stored AggregatedAnswer is
+returned instead of running the query -> search -> summary chain. Answers expire after
+PIPELINE_SETTINGS.semantic_cache_max_age_seconds, and answers that do not rest on real
+search results (see is_reusable_answer) are never stored.
+"""
+
+import logging
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.core.config import PIPELINE_SETTINGS
+from app.core.models import AggregatedAnswer, QuestionInput
+from app.providers.search.base import is_reusable_answer
+from app.services.embedding import embed_texts_async, question_text
+
+logger = logging.getLogger(__name__)
+
+
+class SemanticCache:
+    """
+    In-memory nearest-neighbour index of unit vectors, partitioned by source.
+
+    Each partition keeps a preallocated float32 matrix that doubles when full. Once a
+    partition reaches max_entries the oldest entry is overwritten. Entries older than
+    max_age_seconds are never returned.
+    """
+
+    def __init__(
+        self,
+        threshold: float = PIPELINE_SETTINGS.semantic_cache_threshold,
+        max_entries: int = PIPELINE_SETTINGS.semantic_cache_max_entries,
+        max_age_seconds: float = PIPELINE_SETTINGS.semantic_cache_max_age_seconds,
+    ):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.max_age_seconds = max_age_seconds
+        self._partitions: Dict[str, "_Partition"] = {}
+        self._lock = threading.Lock()
+
+    def lookup(self, source: str, vector: np.ndarray) -> Optional[Tuple[AggregatedAnswer, float]]:
+        """
+        Returns the stored answer and its similarity, or None when nothing is close enough.
+        """
+        with self._lock:
+            partition = self._partitions.get(source)
+            if partition is None:
+                return None
+            best = partition.nearest(vector, time.time() - self.max_age_seconds)
+        if best is None or best[1] < self.threshold:
+            return None
+        return best
+
+    def add(self, source: str, vector: np.ndarray, answer: AggregatedAnswer) -> None:
+        with self._lock:
+            partition = self._partitions.get(source)
+            if partition is None:
+                partition = _Partition(vector.shape[0], self.max_entries)
+                self._partitions[source] = partition
+            partition.add(vector, answer, time.time())
+
+
+class _Partition:
+    def __init__(self, dimensions: int, max_entries: int):
+        self.max_entries = max_entries
+        self._vectors = np.zeros((min(64, max_entries), dimensions), dtype=np.float32)
+        self._answers: List[Optional[AggregatedAnswer]] = [None] * self._vectors.shape[0]
+        self._added = np.zeros(self._vectors.shape[0], dtype=np.float64)
+        self._count = 0
+        self._oldest = 0
+
+    def nearest(self, vector: np.ndarray, added_after: float) -> Optional[Tuple[AggregatedAnswer, float]]:
+        if self._count == 0 or vector.shape[0] != self._vectors.shape[1]:
+            return None
+        similarities = self._vectors[: self._count] @ vector
+        similarities[self._added[: self._count] < added_after] = -np.inf
+        index = int(np.argmax(similarities))
+        if similarities[index] == -np.inf:
+            return None
+        return self._answers[index], float(similarities[index])
+
+    def add(self, vector: np.ndarray, answer: AggregatedAnswer, added_at: float) -> None:
+        if vector.shape[0] != self._vectors.shape[1]:
+            return
+
+        if self._count < self.max_entries:
+            if self._count == self._vectors.shape[0]:
+                self._grow()
+            position = self._count
+            self._count += 1
+        else:
+            position = self._oldest
+            self._oldest = (self._oldest + 1) % self.max_entries
+
+        self._vectors[position] = vector
+        self._answers[position] = answer
+        self._added[position] = added_at
+
+    def _grow(self) -> None:
+        capacity = min(self._vectors.shape[0] * 2, self.max_entries)
+        grown = np.zeros((capacity, self._vectors.shape[1]), dtype=np.float32)
+        grown[: self._count] = self._vectors[: self._count]
+        self._vectors = grown
+        self._answers.extend([None] * (capacity - len(self._answers)))
+        self._added = np.concatenate([self._added, np.zeros(capacity - len(self._added))])
+
+
+async def lookup_cached_summary(
+    question: QuestionInput,
+) -> Tuple[Optional[AggregatedAnswer], Optional[np.ndarray]]:
+    """
+    Embeds the question and looks it up. Returns (answer or None, question vector or None).
+
+    Embedding failures disable the cache for this request rather than failing it. The cache
+    holds answers of the configured providers, so requests that chose others skip it.
+    """
+    if not PIPELINE_SETTINGS.semantic_cache_enabled or question.providers is not None:
+        return None, None
+
+    try:
+        vector = (await embed_texts_async([question_text(question)]))[0]
+    except Exception as e:
+        logger.warning("Semantic cache embedding failed, skipping cache: %s", e)
+        return None, None
+
+    hit = _cache.lookup(_source_key(question), vector)
+    if hit is None:
+        return None, vector
+
+    answer, similarity = hit
+    logger.info("Semantic cache hit with similarity %.3f", similarity)
+    return answer, vector
+
+
+def store_cached_summary(
+    question: QuestionInput,
+    vector: Optional[np.ndarray],
+    answer: AggregatedAnswer,
+) -> None:
+    """
+    Stores an answer for later near-duplicate questions, unless it came from the history
+    index or was built after a search error or without any results.
+    """
+    if vector is None or not is_reusable_answer(answer.per_source_results):
+        return
+    _cache.add(_source_key(question), vector, answer)
+
+
+def _source_key(question: QuestionInput) -> str:
+    return (question.source or "").strip().lower()
+
+
+_cache = SemanticCache()
@@ -1,30 +1,77 @@
 """
-Loads and initializes the summary provider based on configuration.
-"""
+Loads and initializes the summary provider based on configuration, or the provider a
+request chose (see QuestionInput.providers).
 
-from typing import Any, Dict, List
+Providers are built on first use by the registry (see app.providers.registry).
+"""
 
-from app.core.config import get_default_summary_provider
-from app.core.models import AggregatedAnswer, PerSourceResult
-from app.providers.summary.base import SummaryProvider
-from app.providers.summary.ollama.summary_provider import OllamaSummaryProvider
+from contextlib import aclosing
+from typing import Any, AsyncIterator, Dict, List, Optional
 
+from app.core.config import PIPELINE_SETTINGS, ProviderInfo, SectionName
+from app.core.models import (AggregatedAnswer, FusedAnswer, PerSourceResult,
+                             ProviderChoice)
+from app.providers.llm.call_cache import llm_cache_for
+from app.providers.registry import ProviderRegistry, ollama_client
 
-def build_summary_provider() -> SummaryProvider:
-    provider_name, provider_model = get_default_summary_provider()
 
-    if provider_name == "ollama_summary":
-        return OllamaSummaryProvider(provider_model)
+def build_summary_provider(provider_class, provider_info: ProviderInfo, provider_model: Optional[str], is_async: bool):
+    if provider_info.id == "ollama_summary":
+        return provider_class(
+            provider_model, llm_cache=llm_cache_for(provider_info), client=ollama_client(provider_info, is_async))
 
-    raise ValueError(f"Unknown SUMMARY_PROVIDER: {provider_name}")
+    raise ValueError(f"Unknown SUMMARY_PROVIDER: {provider_info.id}")
 
 
 def generate_summary(
     question: Dict[str, Any],
     queries: Dict[str, Any],
     per_source_results: List[PerSourceResult],
+    provider: Optional[ProviderChoice] = None,
 ) -> AggregatedAnswer:
-    return _provider.summarize(question=question, queries=queries, per_source_results=per_source_results)
+    return _registry.select(provider, is_async=False).summarize(
+        question=question, queries=queries, per_source_results=per_source_results)
+
+
+async def generate_summary_async(
+    question: Dict[str, Any],
+    queries: Dict[str, Any],
+    per_source_results: List[PerSourceResult],
+    provider: Optional[ProviderChoice] = None,
+) -> AggregatedAnswer:
+    summary_provider = await _registry.select_async(provider)
+    return await summary_provider.summarize(
+        question=question, queries=queries, per_source_results=per_source_results)
+
+
+async def generate_fused_summary_async(
+    question: Dict[str, Any],
+    queries: Dict[str, Any],
+    per_source_results: List[PerSourceResult],
+    provider: Optional[ProviderChoice] = None,
+) -> FusedAnswer:
+    """
+    Selects the sources among unranked candidates and summarizes in one call (see
+    PIPELINE_SETTINGS.summary_mode).
+    """
+    summary_provider = await _registry.select_async(provider)
+    return await summary_provider.summarize_fused(
+        question=question, queries=queries, per_source_results=per_source_results,
+        top_k=PIPELINE_SETTINGS.fused_top_k)
+
+
+async def generate_summary_stream(
+    question: Dict[str, Any],
+    queries: Dict[str, Any],
+    per_source_results: List[PerSourceResult],
+    provider: Optional[ProviderChoice] = None,
+) -> AsyncIterator[str]:
+    summary_provider = await _registry.select_async(provider)
+    stream = summary_provider.summarize_stream(
+        question=question, queries=queries, per_source_results=per_source_results)
+    async with aclosing(stream):
+        async for piece in stream:
+            yield piece
 
 
-_provider = build_summary_provider()
+_registry = ProviderRegistry(SectionName.SUMMARY, build_summary_provider)
@@ -57,6 +57,86 @@ async function callBackend(postData) {
     };
 }
 
+/**
+ * Calls the streaming endpoint and reports partial results as they arrive.
+ * onUpdate is called with an aggregated answer each time sources or summary text change.
+ * Falls back to the non-streaming endpoint if the stream cannot be opened.
+ */
+async function callBackendStream(postData, onUpdate) {
+    console.log("[bg] Calling streaming backend with:", postData);
+
+    let resp;
+    try {
+        resp = await fetch("http://localhost:8000/generate_summary/stream", {
+            method: "POST",
+            headers: { "Content-Type": "application/json" },
+            body: JSON.stringify(postData)
+        });
+    } catch (e) {
+        console.error("[bg] STREAM FETCH FAILED, falling back:", e);
+        return await callBackend(postData);
+    }
+
+    if (!resp.ok || !resp.body) {
+        console.warn("[bg] Stream unavailable (status", resp.status, "), falling back");
+        return await callBackend(postData);
+    }
+
+    const aggregated = { final_summary: "", per_source_results: [] };
+    const reader = resp.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = "";
+
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) {
+            break;
+        }
+        buffer += decoder.decode(value, { stream: true });
+
+        let boundary;
+        while ((boundary = buffer.indexOf("\n\n")) !== -1) {
+            const rawEvent = buffer.slice(0, boundary);
+            buffer = buffer.slice(boundary + 2);
+
+            let eventName = "message";
+            let dataText = "";
+            for (const line of rawEvent.split("\n")) {
+                if (line.startsWith("event:")) {
+                    eventName = line.slice(6).trim();
+                } else if (line.startsWith("data:")) {
+                    dataText += line.slice(5).trim();
+                }
+            }
+
+            let data = null;
+            try {
+                data = JSON.parse(dataText);
+            } catch (e) {
+                console.error("[bg] Bad SSE payload:", dataText);
+                continue;
+            }
+
+            if (eventName === "sources") {
+                aggregated.per_source_results = Array.isArray(data) ? data : [];
+                await onUpdate(aggregated);
+            } else if (eventName === "token") {
+                aggregated.final_summary += data.text ?? "";
+                await onUpdate(aggregated);
+            } else if (eventName === "done") {
+                aggregated.final_summary = data.final_summary ?? aggregated.final_summary;
+                aggregated.per_source_results = Array.isArray(data.per_source_results)
+                    ? data.per_source_results
+                    : aggregated.per_source_results;
+            } else if (eventName === "error") {
+                aggregated.final_summary = `Backend error: ${data.detail}`;
+            }
+        }
+    }
+
+    return aggregated;
+}
+
 browser.runtime.onMessage.addListener((message, sender) => {
     if (message.action === "RUN_ANALYSIS") {
         const tabId = message.tabId;
@@ -72,7 +152,12 @@ browser.runtime.onMessage.addListener((message, sender) => {
                     return;
                 }
 
-                const aggregated = await callBackend(postData);
+                const aggregated = await callBackendStream(postData, async partial => {
+                    await browser.tabs.sendMessage(tabId, {
+                        action: "INJECT_RESULT",
+                        aggregated: partial
+                    });
+                });
                 console.log("[bg] Got aggregated answer, sending to content script");
 
                 await browser.tabs.sendMessage(tabId, {
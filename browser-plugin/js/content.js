@@ -74,6 +74,7 @@ function escapeHtml(str) {
 
 function buildPluginBox(bodyEl, final_summary, per_source_results) {
     const container = document.createElement("div");
+    container.id = "reddit-duplicate-finder-result";
 
     const parent = bodyEl?.parentElement;
     if (parent && parent.className) {
@@ -102,7 +103,7 @@ function buildPluginBox(bodyEl, final_summary, per_source_results) {
         console.error("[content] Failed to init markdown-it:", e);
     }
 
-    const cleanSummary = final_summary.trim();
+    const cleanSummary = (final_summary || "").trim();
     let htmlSummary;
     if (md) {
         htmlSummary = md.render(cleanSummary);
@@ -156,6 +157,9 @@ function injectPluginBox(aggregated) {
         return;
     }
 
+    // Streaming updates re-inject the box; replace the previous one.
+    document.getElementById("reddit-duplicate-finder-result")?.remove();
+
     const bodyEl =
         document.querySelector('div[property="schema:articleBody"]') ||
         document.querySelector('div[id$="-post-rtjson-content"]') ||